@@ -1,16 +1,38 @@
-from flask import Flask, render_template, request, jsonify, Response, send_file, url_for
+from flask import Flask, render_template, request, jsonify, Response, send_file, send_from_directory, url_for
 import json
+import mimetypes
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
-from urllib import parse, request as urlrequest
-from queue import Queue, Empty
+from urllib import parse
+import atexit
+import itertools
 import logging
 import functools
+import heapq
 from copy import deepcopy
+import os
 import re
 import secrets
-
+import signal
+import sys
+import threading
+
+from archive import IncidentArchiver, archive_candidates
+from compression import COMPRESS_MIN_SIZE, FILE_SUFFIX, compress, is_compressible, negotiate, precompress_static
+from events import EVENT_TYPES, EventBroadcaster, event_collection, format_event
+from gazetteer import Gazetteer
+from geocode_store import GeocodeStore, forward_key, reverse_key, search_key
+from geocode_worker import GeocodeWorker
+from incident_export import EXPORT_FORMATS, export_csv, export_ndjson
+from incident_index import IdSequence, IncidentIndex
+from incident_journal import IncidentJournal
+from incident_search import IncidentSearchIndex
 from pager_service import PagerConfig, PagerService, pager_payload
+from persistence import WriteBehindPersister
+from response_cache import ResponseCache
+from storage import create_storage, incident_matches
+from ttl_cache import TTLCache
+from upstream import CLIENTS as UPSTREAM_CLIENTS, UpstreamRequest, run_lookup
 
 app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = False
@@ -35,6 +57,7 @@ def inject_template_globals():
         'accent_color_rgb': accent_rgb,
         'monitor_defaults': deepcopy(DEFAULT_SETTINGS['monitor']),
         'gong_sound_url': resolve_gong_sound_url(),
+        'event_types': EVENT_TYPES,
     }
 
 
@@ -67,7 +90,7 @@ def format_local(value, fmt='%d.%m.%Y %H:%M:%S'):
 
 app.jinja_env.filters['format_local'] = format_local
 
-LOG_FILE = Path('app.log')
+LOG_FILE = Path(os.environ.get('ALARMMONITOR_LOG', 'app.log'))
 LOG_FILE.touch(exist_ok=True)
 file_handler = logging.FileHandler(LOG_FILE)
 file_handler.setLevel(logging.INFO)
@@ -82,10 +105,38 @@ app.logger.setLevel(logging.INFO)
 DATA_FILE = Path('data/vehicles.json')
 INCIDENT_FILE = Path('data/incidents.json')
 TEMPLATE_FILE = Path('data/templates.json')
+SEQUENCE_FILE = Path('data/sequences.json')
 PRIORITY_FILE = Path('data/priorities.json')
 ANNOUNCEMENTS_FILE = Path('data/announcements.json')
 MAX_ANNOUNCEMENTS = 100
+MAX_BATCH_OPERATIONS = 200
 SETTINGS_FILE = Path('data/settings.json')
+DATABASE_FILE = Path(os.environ.get('ALARMMONITOR_DB', 'data/alarmmonitor.db'))
+GEOCODE_DB_FILE = Path(os.environ.get('ALARMMONITOR_GEOCODE_DB', 'data/geocode.db'))
+GEOCODE_CACHE_MAX_ENTRIES = 5000
+GAZETTEER_FILE = Path(os.environ.get('ALARMMONITOR_GAZETTEER', 'data/gazetteer.json'))
+STORAGE_BACKEND = os.environ.get('ALARMMONITOR_STORAGE', 'json')
+WRITE_BEHIND_DELAY = 0.25
+# Revisions restart with every process; the boot id keeps ETags from an
+# earlier run from matching a coincidentally equal revision.
+BOOT_ID = secrets.token_hex(4)
+_revision_sequence = itertools.count(1)
+revisions = dict.fromkeys(
+    ('vehicles', 'incidents', 'templates', 'priorities', 'announcements', 'settings'),
+    0,
+)
+
+
+response_cache = ResponseCache()
+
+
+def bump_revision(name):
+    """Mark a collection as changed for ETag based conditional requests."""
+
+    revisions[name] = next(_revision_sequence)
+    response_cache.invalidate(name)
+
+
 DEFAULT_VEHICLES = {
     'RTW1': {
         'name': 'Rettungswagen 1',
@@ -193,6 +244,10 @@ DEFAULT_SETTINGS = {
         'repeats': 30,
         'inverted': True,
     },
+    'archive': {
+        'enabled': True,
+        'after_hours': 48,
+    },
 }
 
 
@@ -376,13 +431,26 @@ def load_settings():
                     except (TypeError, ValueError):
                         pass
             settings['pager'] = merged_pager
+        archive_settings = data.get('archive') or {}
+        if isinstance(archive_settings, dict):
+            merged_archive = settings['archive'].copy()
+            if 'enabled' in archive_settings:
+                merged_archive['enabled'] = parse_bool(archive_settings.get('enabled'), merged_archive['enabled'])
+            if 'after_hours' in archive_settings:
+                try:
+                    merged_archive['after_hours'] = max(1, int(archive_settings.get('after_hours')))
+                except (TypeError, ValueError):
+                    pass
+            settings['archive'] = merged_archive
     return settings
 
 
 def save_settings():
+    bump_revision('settings')
     SETTINGS_FILE.parent.mkdir(exist_ok=True)
     with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
         json.dump(settings, f, ensure_ascii=False, indent=2)
+    queue_event('settings.updated', settings)
     notify_change()
 
 
@@ -397,37 +465,63 @@ def normalise_pager_number(value):
     return pager
 
 
+def collection_file(name):
+    """Return the JSON file backing a collection for the JSON storage backend."""
+
+    return {
+        'vehicles': DATA_FILE,
+        'incidents': INCIDENT_FILE,
+        'templates': TEMPLATE_FILE,
+        'priorities': PRIORITY_FILE,
+        'announcements': ANNOUNCEMENTS_FILE,
+        'sequences': SEQUENCE_FILE,
+    }[name]
+
+
+storage = create_storage(STORAGE_BACKEND, path_for=collection_file, db_path=DATABASE_FILE, logger=app.logger)
+# Shared by the journal compactor and archive_ended_incidents.
+incident_snapshot_lock = threading.Lock()
+# Vehicles and incidents change on every status press; they are written
+# behind the request and listeners are notified once per flush.
+persister = WriteBehindPersister(
+    app.logger,
+    delay=WRITE_BEHIND_DELAY,
+    on_flush=lambda names: notify_change(),
+)
+
+
 def load_vehicles():
-    if DATA_FILE.exists():
-        with open(DATA_FILE, encoding='utf-8') as f:
-            data = json.load(f)
-            for unit, info in data.items():
-                info.setdefault('name', unit)
-                info.setdefault('callsign', unit)
-                info.setdefault('crew', [])
-                info.setdefault('status', 2)
-                info.setdefault('note', '')
-                info.setdefault('location', '')
-                info.setdefault('lat', None)
-                info.setdefault('lon', None)
-                info.setdefault('icon', None)
-                info.setdefault('tts', '')
-                info.setdefault('base', '')
-                if 'alarm_time' not in info:
-                    info['alarm_time'] = info.pop('alarm', None)
-                info.setdefault('incident_id', None)
-                info.setdefault('priority', '')
-                info['pager'] = normalise_pager_number(info.get('pager'))
-            return data
+    data = storage.load_collection('vehicles')
+    if data is not None:
+        for unit, info in data.items():
+            info.setdefault('name', unit)
+            info.setdefault('callsign', unit)
+            info.setdefault('crew', [])
+            info.setdefault('status', 2)
+            info.setdefault('note', '')
+            info.setdefault('location', '')
+            info.setdefault('lat', None)
+            info.setdefault('lon', None)
+            info.setdefault('icon', None)
+            info.setdefault('tts', '')
+            info.setdefault('base', '')
+            if 'alarm_time' not in info:
+                info['alarm_time'] = info.pop('alarm', None)
+            info.setdefault('incident_id', None)
+            info.setdefault('priority', '')
+            info['pager'] = normalise_pager_number(info.get('pager'))
+        return data
     data = DEFAULT_VEHICLES.copy()
     return data
 
 
 def save_vehicles():
-    DATA_FILE.parent.mkdir(exist_ok=True)
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(vehicles, f, ensure_ascii=False, indent=2)
-    notify_change()
+    bump_revision('vehicles')
+    persister.mark_dirty('vehicles')
+
+
+def write_vehicles(fsync=False):
+    storage.save_collection('vehicles', vehicles, fsync=fsync)
 
 
 def normalise_incident(incident):
@@ -450,6 +544,9 @@ def normalise_incident(incident):
         lon = incident.get('lon')
 
     incident['location'] = {'name': name, 'lat': lat, 'lon': lon}
+    if isinstance(loc, dict) and loc.get('pending'):
+        # coordinates are still being looked up, see geocode_incident_later
+        incident['location']['pending'] = True
     incident.setdefault('vehicles', [])
     incident.setdefault('notes', [])
     incident.setdefault('log', [])
@@ -472,19 +569,119 @@ def normalise_incident(incident):
     return incident
 
 
+pending_incident_records = []
+incident_search = IncidentSearchIndex(lambda: storage.query_incidents(archived=True))
+incident_index = IncidentIndex(search=incident_search)
+
+
+def indexed_incidents():
+    """Return the incident index, rebuilt if ``incidents`` was replaced."""
+
+    return incident_index.sync(incidents)
+
+
+def find_incident(inc_id):
+    return indexed_incidents().get(inc_id)
+
+
+def load_incident_sequence():
+    """Restore the id sequence; archived ids count even if the sequence file is older."""
+
+    stored = (storage.load_collection('sequences') or {}).get('incidents')
+    last = stored if isinstance(stored, int) else 0
+    return IdSequence(max(last, storage.archived_max_id()))
+
+
+def record_incident_change(incident):
+    """Queue a journal record for an added or modified incident."""
+
+    incident_index.update(incident)
+    indexed_incidents()
+    pending_incident_records.append(IncidentJournal.put_record(incident))
+    queue_event('incident.updated', incident)
+
+
+def record_incident_removal(incident):
+    incident_index.remove(incident)
+    indexed_incidents()
+    pending_incident_records.append(IncidentJournal.delete_record(incident['id']))
+    queue_event('incident.removed', {'id': incident['id']})
+
+
 def load_incidents():
-    if INCIDENT_FILE.exists():
-        with open(INCIDENT_FILE, encoding='utf-8') as f:
-            data = json.load(f)
-            return [normalise_incident(inc) for inc in data]
-    return []
+    return [normalise_incident(inc) for inc in storage.load_incidents()]
 
 
 def save_incidents():
-    INCIDENT_FILE.parent.mkdir(exist_ok=True)
-    with open(INCIDENT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(incidents, f, ensure_ascii=False, indent=2)
+    bump_revision('incidents')
+    persister.mark_dirty('incidents')
+
+
+def write_incidents(fsync=False):
+    """Hand the queued incident changes to the storage backend."""
+
+    sequence = incident_sequence.last
+    if sequence != incident_sequence.saved:
+        # Written before the incidents so that a stored id is never handed out again.
+        storage.save_collection('sequences', {'incidents': sequence}, fsync=fsync)
+        incident_sequence.saved = sequence
+    records = pending_incident_records[:]
+    del pending_incident_records[:len(records)]
+    if not records:
+        return
+    # Several mutations of the same incident within one flush collapse
+    # into a single record carrying its final state.
+    seen = set()
+    collapsed = []
+    for record in reversed(records):
+        if record['op'] == 'put':
+            if id(record['incident']) in seen:
+                continue
+            seen.add(id(record['incident']))
+        collapsed.append(record)
+    try:
+        storage.save_incident_changes(reversed(collapsed), fsync=fsync)
+    except Exception:
+        pending_incident_records[:0] = records
+        raise
+
+
+persister.register('vehicles', write_vehicles)
+persister.register('incidents', write_incidents)
+
+
+def next_incident_id():
+    """Allocate an id that was never used by a loaded, deleted or archived incident."""
+
+    return incident_sequence.allocate(indexed_incidents().max_id)
+
+
+def archive_ended_incidents(now=None):
+    """Move ended incidents older than the configured age into the archive."""
+
+    archive_settings = settings.get('archive') or {}
+    if not archive_settings.get('enabled', True):
+        return 0
+    older_than = timedelta(hours=archive_settings.get('after_hours', DEFAULT_SETTINGS['archive']['after_hours']))
+    candidates = archive_candidates(incidents, older_than=older_than, now=now)
+    if not candidates:
+        return 0
+    # Queued journal records must reach the storage before the incidents
+    # leave the hot set, otherwise a later flush would resurrect them.
+    persister.flush()
+    # The journal compactor must not snapshot the incidents between the
+    # delete records and their removal from the hot set.
+    with incident_snapshot_lock:
+        storage.archive_incidents(candidates)
+        archived = {id(inc) for inc in candidates}
+        incidents[:] = [inc for inc in incidents if id(inc) not in archived]
+    for incident in candidates:
+        incident_index.remove(incident)
+        incident_search.add(incident, archived=True)
+    bump_revision('incidents')
+    queue_event('incident.archived', {'ids': [inc.get('id') for inc in candidates]})
     notify_change()
+    return len(candidates)
 
 
 DEFAULT_TEMPLATES = [
@@ -512,90 +709,86 @@ DEFAULT_PRIORITIES = ['R0', 'R1', 'R2', 'R3']
 
 
 def load_templates():
-    if TEMPLATE_FILE.exists():
-        with open(TEMPLATE_FILE, encoding='utf-8') as f:
-            return json.load(f)
+    data = storage.load_collection('templates')
+    if data is not None:
+        return data
     return DEFAULT_TEMPLATES.copy()
 
 
 def save_templates():
-    TEMPLATE_FILE.parent.mkdir(exist_ok=True)
-    with open(TEMPLATE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(templates, f, ensure_ascii=False, indent=2)
+    bump_revision('templates')
+    storage.save_collection('templates', templates)
+    queue_event('templates.updated', templates)
     notify_change()
 
 
 def load_priorities():
-    if PRIORITY_FILE.exists():
-        with open(PRIORITY_FILE, encoding='utf-8') as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                cleaned = []
-                seen = set()
-                for item in data:
-                    if item is None:
-                        continue
-                    value = str(item).strip()
-                    if not value or value in seen:
-                        continue
-                    cleaned.append(value)
-                    seen.add(value)
-                return cleaned
-            elif isinstance(data, dict):
-                # Support legacy dict-based storage where priorities
-                # were stored as mapping keys or under a 'priorities' field.
-                items = data.get('priorities') if 'priorities' in data else data.keys()
-                cleaned = []
-                seen = set()
-                for item in items:
-                    if item is None:
-                        continue
-                    value = str(item).strip()
-                    if not value or value in seen:
-                        continue
-                    cleaned.append(value)
-                    seen.add(value)
-                return cleaned
+    data = storage.load_collection('priorities')
+    if isinstance(data, list):
+        cleaned = []
+        seen = set()
+        for item in data:
+            if item is None:
+                continue
+            value = str(item).strip()
+            if not value or value in seen:
+                continue
+            cleaned.append(value)
+            seen.add(value)
+        return cleaned
+    elif isinstance(data, dict):
+        # Support legacy dict-based storage where priorities
+        # were stored as mapping keys or under a 'priorities' field.
+        items = data.get('priorities') if 'priorities' in data else data.keys()
+        cleaned = []
+        seen = set()
+        for item in items:
+            if item is None:
+                continue
+            value = str(item).strip()
+            if not value or value in seen:
+                continue
+            cleaned.append(value)
+            seen.add(value)
+        return cleaned
     return DEFAULT_PRIORITIES.copy()
 
 
 def save_priorities():
-    PRIORITY_FILE.parent.mkdir(exist_ok=True)
-    with open(PRIORITY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(priorities, f, ensure_ascii=False, indent=2)
+    bump_revision('priorities')
+    storage.save_collection('priorities', priorities)
+    queue_event('priorities.updated', priorities)
     notify_change()
 
 
 def load_announcements():
-    if ANNOUNCEMENTS_FILE.exists():
-        try:
-            with open(ANNOUNCEMENTS_FILE, encoding='utf-8') as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    cleaned = []
-                    for entry in data:
-                        if not isinstance(entry, dict):
-                            continue
-                        text = (entry.get('text') or '').strip()
-                        if not text:
-                            continue
-                        cleaned.append(
-                            {
-                                'id': entry.get('id') or 0,
-                                'time': entry.get('time') or now_local_iso(),
-                                'text': text,
-                            }
-                        )
-                    return cleaned
-        except json.JSONDecodeError:
-            pass
+    try:
+        data = storage.load_collection('announcements')
+    except json.JSONDecodeError:
+        data = None
+    if isinstance(data, list):
+        cleaned = []
+        for entry in data:
+            if not isinstance(entry, dict):
+                continue
+            text = (entry.get('text') or '').strip()
+            if not text:
+                continue
+            cleaned.append(
+                {
+                    'id': entry.get('id') or 0,
+                    'time': entry.get('time') or now_local_iso(),
+                    'text': text,
+                }
+            )
+        return cleaned
     return []
 
 
 def save_announcements():
-    ANNOUNCEMENTS_FILE.parent.mkdir(exist_ok=True)
-    with open(ANNOUNCEMENTS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(announcements, f, ensure_ascii=False, indent=2)
+    bump_revision('announcements')
+    storage.save_collection('announcements', announcements)
+    queue_event('announcements.updated', announcements)
     notify_change()
 
 
@@ -603,11 +796,8 @@ def incident_unit_was_alerted(incident, unit):
     """Return whether a unit already received an alarm for this incident."""
     if not incident or not unit:
         return False
-    return any(
-        entry.get('unit') == unit and entry.get('status') == 'alarmiert'
-        for entry in incident.get('log', []) or []
-        if isinstance(entry, dict)
-    )
+    state = indexed_incidents().unit_state(incident, unit)
+    return bool(state and state.alerted)
 
 def update_vehicle_incident_details(unit, incident, *, newly_assigned=False):
     info = vehicles.get(unit)
@@ -627,46 +817,218 @@ def update_vehicle_incident_details(unit, incident, *, newly_assigned=False):
 
 vehicles = load_vehicles()
 incidents = load_incidents()
+incident_sequence = load_incident_sequence()
 templates = load_templates()
 priorities = load_priorities()
 announcements = load_announcements()
 settings = load_settings()
 pager_service = PagerService(PagerConfig.from_settings(settings), app.logger)
 pager_service.start()
+storage.start(lambda: incidents, incident_snapshot_lock)
+persister.start()
+incident_archiver = IncidentArchiver(archive_ended_incidents, app.logger)
+incident_archiver.start()
+geocode_worker = GeocodeWorker(app.logger)
+geocode_worker.start()
+
+
+def shutdown_persistence():
+    """End open event streams and write pending changes with fsync before the process exits."""
+
+    broadcaster.close()
+    incident_archiver.stop()
+    persister.stop()
+    geocode_worker.stop()
+    storage.stop()
+    geocode_store.close()
+
+
+atexit.register(shutdown_persistence)
+if threading.current_thread() is threading.main_thread():
+    # systemd stops the service with SIGTERM; turn it into a regular exit so
+    # that the atexit handler above still runs.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+broadcaster = EventBroadcaster(BOOT_ID)
+CACHE_MAX_ENTRIES = 512
+GEOCODE_CACHE_TTL = timedelta(days=30)
+REVERSE_GEOCODE_CACHE_TTL = timedelta(days=30)
+GEOCODE_SEARCH_CACHE_TTL = timedelta(days=1)
+# In-memory front of the geocode store: repeated lookups skip SQLite.
+geocode_cache = TTLCache(CACHE_MAX_ENTRIES, ttl=15 * 60)
+reverse_geocode_cache = TTLCache(CACHE_MAX_ENTRIES, ttl=15 * 60)
+geocode_search_cache = TTLCache(CACHE_MAX_ENTRIES, ttl=15 * 60)
+GEOCODE_CACHES = {'forward': geocode_cache, 'reverse': reverse_geocode_cache, 'search': geocode_search_cache}
+# Kiosks poll the weather; an outdated answer is served for up to an hour
+# while one request fetches the new one (or while the service is down).
+weather_cache = TTLCache(8, ttl=5 * 60, stale_ttl=60 * 60)
+# Nominatim answers survive restarts; expired entries still answer when the
+# uplink is down.
+geocode_store = GeocodeStore(GEOCODE_DB_FILE, max_entries=GEOCODE_CACHE_MAX_ENTRIES, logger=app.logger)
+# Offline address index built by ``python gazetteer.py import``; asked
+# before the caches and Nominatim.
+gazetteer = Gazetteer.load(GAZETTEER_FILE, app.logger)
+
+
+def operation_area_center():
+    operation_area = settings.get('operation_area') or {}
+    try:
+        return float(operation_area.get('lat')), float(operation_area.get('lon'))
+    except (TypeError, ValueError):
+        return None
+
 
-listeners = []
-CACHE_MAX_ENTRIES = 128
-GEOCODE_CACHE_TTL = timedelta(minutes=30)
-REVERSE_GEOCODE_CACHE_TTL = timedelta(minutes=30)
-GEOCODE_SEARCH_CACHE_TTL = timedelta(minutes=15)
-weather_cache = {'data': None, 'expires': None}
-geocode_cache = {}
-reverse_geocode_cache = {}
-geocode_search_cache = {}
-
-
-def _cache_get(cache, key):
-    entry = cache.get(key)
-    if not entry:
-        return None, False
-    value, expires, _ = entry
-    if expires and expires > datetime.now(timezone.utc):
+def cached_geocode(kind, key, *, stale=False):
+    """Look ``key`` up in the memory cache, then in the geocode store."""
+
+    memory = GEOCODE_CACHES[kind]
+    value, found = memory.get(key)
+    if found:
         return value, True
-    cache.pop(key, None)
-    return None, False
+    value, found = geocode_store.get(kind, key, stale=stale)
+    if found and not stale:
+        memory.set(key, value)
+    return value, found
+
+
+def remember_geocode(kind, key, value, ttl):
+    GEOCODE_CACHES[kind].set(key, value)
+    geocode_store.set(kind, key, value, ttl.total_seconds())
 
 
-def _cache_set(cache, key, value, ttl):
-    now = datetime.now(timezone.utc)
-    cache[key] = (value, now + ttl if ttl else None, now)
-    if len(cache) > CACHE_MAX_ENTRIES:
-        oldest_key = min(cache.items(), key=lambda item: item[1][2])[0]
-        cache.pop(oldest_key, None)
+def geocode_history_entries():
+    """Yield forward lookups already known from incidents, unit bases and the operation area."""
+
+    for inc in itertools.chain(list(incidents), storage.iter_archived_incidents()):
+        loc = inc.get('location')
+        if isinstance(loc, dict) and loc.get('lat') is not None and loc.get('lon') is not None:
+            yield 'forward', forward_key(loc.get('name')), (loc['lat'], loc['lon'])
+    for info in list(vehicles.values()):
+        base = info.get('base')
+        if base and info.get('location') == base and info.get('lat') is not None and info.get('lon') is not None:
+            yield 'forward', forward_key(base), (info['lat'], info['lon'])
+    area = settings.get('operation_area') or {}
+    if area.get('lat') is not None and area.get('lon') is not None:
+        yield 'forward', forward_key(area.get('name')), (area['lat'], area['lon'])
+
+
+def warm_geocode_store():
+    try:
+        added = geocode_store.warm(geocode_history_entries(), GEOCODE_CACHE_TTL.total_seconds())
+    except Exception:
+        app.logger.exception('Geocoding-Cache konnte nicht vorbefüllt werden')
+        return 0
+    if added:
+        app.logger.info('Geocoding-Cache mit %d bekannten Adressen vorbefüllt', added)
+    return added
+
+
+# the archive may hold years of incidents; startup does not wait for it
+threading.Thread(target=warm_geocode_store, name='geocode-warmup', daemon=True).start()
+
+
+pending_events = []
+_events_lock = threading.Lock()
+# JSON of every vehicle as last sent to the listeners, to send only changed units
+published_vehicles = {
+    unit: json.dumps(info, ensure_ascii=False, sort_keys=True) for unit, info in vehicles.items()
+}
+published_revisions = {'vehicles': 0}
+
+
+def queue_event(event_type, data):
+    """Queue a delta event; it is sent with the next :func:`notify_change`."""
+
+    with _events_lock:
+        pending_events.append((event_type, data))
+
+
+def vehicle_events():
+    """Return ``vehicle.updated``/``vehicle.removed`` events for units changed since the last call."""
+
+    events = []
+    current = {}
+    for unit, info in list(vehicles.items()):
+        serialised = json.dumps(info, ensure_ascii=False, sort_keys=True)
+        current[unit] = serialised
+        if published_vehicles.get(unit) != serialised:
+            events.append(('vehicle.updated', {'unit': unit, 'vehicle': info}))
+    for unit in published_vehicles.keys() - current.keys():
+        events.append(('vehicle.removed', {'unit': unit}))
+    published_vehicles.clear()
+    published_vehicles.update(current)
+    return events
+
+
+def collect_events():
+    """Drain the queued events, collapsing repeated updates of the same incident."""
+
+    with _events_lock:
+        queued = pending_events[:]
+        del pending_events[:len(queued)]
+        events = []
+        if published_revisions['vehicles'] != revisions['vehicles']:
+            published_revisions['vehicles'] = revisions['vehicles']
+            events.extend(vehicle_events())
+    alerted = {data['id'] for event_type, data in queued if event_type == 'incident.alerted'}
+    last_update = {id(data): i for i, (event_type, data) in enumerate(queued) if event_type == 'incident.updated'}
+    for i, (event_type, data) in enumerate(queued):
+        if event_type == 'incident.updated':
+            # an alert event already carries the incident
+            if last_update[id(data)] != i or data.get('id') in alerted:
+                continue
+            data = {'id': data.get('id'), 'incident': data}
+        events.append((event_type, data))
+    return events
 
 
 def notify_change():
-    for q in list(listeners):
-        q.put('update')
+    """Send queued delta events to all SSE listeners."""
+
+    events = collect_events()
+    if not events:
+        return
+    frames = [
+        format_event(event_type, data, revision=revisions.get(event_collection(event_type)))
+        for event_type, data in events
+    ]
+    broadcaster.publish(frames)
+
+
+@app.after_request
+def publish_request_events(response):
+    # Deltas go out right after the request instead of waiting for the
+    # write-behind flush; the flush only sends what is still queued.
+    notify_change()
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """Compress HTML and other text responses for clients that accept it.
+
+    JSON read endpoints compress through ``response_cache`` already, static
+    files are served from precompressed siblings and event streams must not
+    be buffered, so all of them pass through unchanged.
+    """
+
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or not is_compressible(response.mimetype)
+    ):
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = negotiate(request.accept_encodings)
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
 
 
 def finalise_incident_if_clear(incident):
@@ -688,55 +1050,52 @@ def finalise_incident_if_clear(incident):
     )
 
 
-def event_stream():
-    q = Queue()
-    listeners.append(q)
-    try:
-        while True:
-            try:
-                data = q.get(timeout=15)
-            except Empty:
-                yield ': keepalive\n\n'
-                continue
-            yield f"data: {data}\n\n"
-    finally:
-        try:
-            listeners.remove(q)
-        except ValueError:
-            pass
-
-
 @app.route('/events')
 def events():
-    return Response(event_stream(), mimetype='text/event-stream')
+    # EventSource sends Last-Event-ID when it reconnects by itself; pages
+    # that reconnect manually pass the id as query parameter.
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = Response(broadcaster.stream(last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
-def geocode(address):
-    if not address or not isinstance(address, str):
-        return None, None
-    normalised = ' '.join(address.split())
-    if not normalised:
+# The lookups below are generators driven by upstream.run_lookup (threads)
+# or upstream.run_lookup_async (asgi.py); they yield the upstream request
+# and receive its decoded JSON.
+
+
+def geocode_lookup(address):
+    cache_key = forward_key(address)
+    if not cache_key:
         return None, None
-    cache_key = normalised.lower()
-    cached, found = _cache_get(geocode_cache, cache_key)
+    local = gazetteer.geocode(address, near=operation_area_center())
+    if local:
+        return local
+    cached, found = cached_geocode('forward', cache_key)
     if found:
-        return cached
-    query = parse.urlencode({'q': normalised, 'format': 'json'})
+        return tuple(cached)
+    query = parse.urlencode({'q': ' '.join(address.split()), 'format': 'json'})
     url = f"https://nominatim.openstreetmap.org/search?{query}"
     try:
-        req = urlrequest.Request(url, headers={'User-Agent': 'Alarmmonitor/1.0'})
-        with urlrequest.urlopen(req, timeout=5) as resp:
-            data = json.loads(resp.read().decode('utf-8'))
-            if data:
-                result = float(data[0]['lat']), float(data[0]['lon'])
-                _cache_set(geocode_cache, cache_key, result, GEOCODE_CACHE_TTL)
-                return result
+        data = yield UpstreamRequest(url)
     except Exception:
-        pass
-    return None, None
+        cached, found = cached_geocode('forward', cache_key, stale=True)
+        return tuple(cached) if found else (None, None)
+    try:
+        result = float(data[0]['lat']), float(data[0]['lon'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None, None
+    remember_geocode('forward', cache_key, result, GEOCODE_CACHE_TTL)
+    return result
 
 
-def reverse_geocode(lat, lon):
+def geocode(address):
+    return run_lookup(geocode_lookup(address))
+
+
+def reverse_geocode_lookup(lat, lon):
     if lat is None or lon is None:
         return None
     try:
@@ -744,8 +1103,11 @@ def reverse_geocode(lat, lon):
         lon = float(lon)
     except (TypeError, ValueError):
         return None
-    cache_key = (round(lat, 5), round(lon, 5))
-    cached, found = _cache_get(reverse_geocode_cache, cache_key)
+    local = gazetteer.reverse(lat, lon)
+    if local:
+        return local
+    cache_key = reverse_key(lat, lon)
+    cached, found = cached_geocode('reverse', cache_key)
     if found:
         return cached
     query = parse.urlencode(
@@ -758,24 +1120,105 @@ def reverse_geocode(lat, lon):
     )
     url = f"https://nominatim.openstreetmap.org/reverse?{query}"
     try:
-        req = urlrequest.Request(url, headers={'User-Agent': 'Alarmmonitor/1.0'})
-        with urlrequest.urlopen(req, timeout=5) as resp:
-            data = json.loads(resp.read().decode('utf-8'))
-            if isinstance(data, dict):
-                display = data.get('display_name')
-                if display:
-                    _cache_set(
-                        reverse_geocode_cache,
-                        cache_key,
-                        display,
-                        REVERSE_GEOCODE_CACHE_TTL,
-                    )
-                    return display
+        data = yield UpstreamRequest(url)
     except Exception:
-        pass
+        cached, found = cached_geocode('reverse', cache_key, stale=True)
+        return cached
+    display = data.get('display_name') if isinstance(data, dict) else None
+    if display:
+        remember_geocode('reverse', cache_key, display, REVERSE_GEOCODE_CACHE_TTL)
+        return display
     return None
 
 
+def reverse_geocode(lat, lon):
+    return run_lookup(reverse_geocode_lookup(lat, lon))
+
+
+# Requests never wait on Nominatim: addresses that are not cached yet are
+# looked up by geocode_worker and their coordinates filled in afterwards.
+
+
+def cached_coordinates(address):
+    """Return cached coordinates of ``address`` or ``(None, None)`` without a network request."""
+
+    cache_key = forward_key(address)
+    if not cache_key:
+        return None, None
+    local = gazetteer.geocode(address, near=operation_area_center())
+    if local:
+        return local
+    cached, found = cached_geocode('forward', cache_key)
+    return tuple(cached) if found else (None, None)
+
+
+def geocode_incident_later(inc):
+    """Fill in the incident coordinates from the cache or in the background.
+
+    Until the lookup finishes the location is marked ``pending``; the result
+    is published as ``incident.updated`` (and ``vehicle.updated`` for the
+    units sent there).
+    """
+
+    location = inc['location']
+    address = location['name']
+    location['lat'], location['lon'] = cached_coordinates(address)
+    if location['lat'] is not None:
+        location.pop('pending', None)
+        return
+    location['pending'] = True
+    inc_id = inc['id']
+
+    def apply(result):
+        inc = find_incident(inc_id)
+        if not inc:
+            return
+        location = inc['location']
+        if not location.get('pending') or location.get('name') != address:
+            return
+        location.pop('pending')
+        location['lat'], location['lon'] = result or (None, None)
+        if location['lat'] is None:
+            app.logger.warning('Einsatzort %r wurde nicht gefunden', address)
+        record_incident_change(inc)
+        for unit in inc.get('vehicles', []):
+            if vehicles.get(unit, {}).get('incident_id') == inc_id:
+                update_vehicle_incident_details(unit, inc)
+        save_vehicles()
+        save_incidents()
+        notify_change()
+
+    geocode_worker.submit(('incident', inc_id), lambda: geocode(address), apply)
+
+
+def geocode_vehicle_later(unit, address):
+    """Return cached coordinates of a unit location or look them up in the background."""
+
+    coordinates = cached_coordinates(address)
+    if coordinates[0] is not None:
+        return coordinates
+
+    def apply(result):
+        info = vehicles.get(unit)
+        if not info or info.get('location') != address or info.get('lat') is not None:
+            return
+        lat, lon = result or (None, None)
+        if lat is None:
+            return
+        info['lat'], info['lon'] = lat, lon
+        save_vehicles()
+        notify_change()
+
+    geocode_worker.submit(('vehicle', unit), lambda: geocode(address), apply)
+    return None, None
+
+
+# lookups that were still running when the service stopped
+for _incident in incidents:
+    if _incident['location'].get('pending'):
+        geocode_incident_later(_incident)
+
+
 @app.route('/')
 def index():
     return render_template('monitor.html', title='Alarmmonitor', vehicles=vehicles, status_text=STATUS_TEXT)
@@ -783,14 +1226,13 @@ def index():
 
 @app.route('/dispatch')
 def dispatch():
-    sorted_incidents = sorted(incidents, key=lambda inc: inc.get('start') or '', reverse=True)
+    index = indexed_incidents()
+    sorted_incidents = list(index.newest_first())
     available = {
         name: info
         for name, info in vehicles.items()
         if info.get('status') in (1, 2)
-        and not any(
-            inc.get('active') and name in inc.get('vehicles', []) for inc in incidents
-        )
+        and not index.unit_is_bound(name)
     }
     priority_options = list(priorities)
     for source in (incidents, templates):
@@ -811,6 +1253,25 @@ def dispatch():
     )
 
 
+@app.route('/dispatch/incidents')
+def dispatch_incident_fragments():
+    """Return the rendered incident cards of the dispatch console by id.
+
+    The console patches single cards after SSE deltas instead of reloading the
+    page; ``null`` tells it to drop a card whose incident no longer exists.
+    """
+
+    try:
+        ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        return jsonify({'ok': False, 'error': 'Ungültige Einsatznummern.'}), 400
+    cards = {}
+    for inc_id in ids:
+        inc = find_incident(inc_id)
+        cards[inc_id] = render_template('dispatch_incident_card.html', inc=inc) if inc else None
+    return jsonify(cards)
+
+
 @app.route('/vehicles')
 def vehicles_page():
     return render_template(
@@ -831,103 +1292,167 @@ def vehicle_status_page():
     )
 
 
+def conditional_json(names, build):
+    """Return ``build()`` as JSON unless the client already has this revision.
+
+    The strong ETag is derived from the revisions of ``names``; a matching
+    ``If-None-Match`` is answered with 304 without serialising anything.
+    Encoded bodies (and their compressed variants) come from ``response_cache``, so
+    clients refreshing after the same change share one serialisation.
+    """
+
+    etag = '-'.join([BOOT_ID] + [str(revisions[name]) for name in names])
+    if any(request.if_none_match.contains(f'{etag}{suffix}') for suffix in ('', '-br', '-gzip')):
+        response = Response(status=304)
+        response.set_etag(etag)
+    else:
+        entry = response_cache.get(
+            request.full_path,
+            etag,
+            names,
+            lambda: json.dumps(build(), ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+        )
+        response = Response(entry.body, mimetype='application/json')
+        response.set_etag(etag)
+        encoding = negotiate(request.accept_encodings) if len(entry.body) >= COMPRESS_MIN_SIZE else None
+        if encoding:
+            response.set_data(entry.encoded(encoding))
+            response.headers['Content-Encoding'] = encoding
+            # a different representation needs its own strong validator
+            response.set_etag(f'{etag}-{encoding}')
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+MONITOR_SNAPSHOT_COLLECTIONS = ('vehicles', 'incidents', 'announcements', 'settings')
+
+
+def build_monitor_snapshot():
+    return {
+        'revision': max(revisions[name] for name in MONITOR_SNAPSHOT_COLLECTIONS),
+        'vehicles': vehicles,
+        'incidents': indexed_incidents().query(active=True, limit=len(incidents) or 1)[0],
+        # same list as announcements.updated and /api/announcements (at most MAX_ANNOUNCEMENTS)
+        'announcements': announcements,
+        'settings': {
+            'operation_area': settings.get('operation_area'),
+            'monitor': settings.get('monitor'),
+        },
+    }
+
+
+@app.route('/api/monitor/snapshot')
+def api_monitor_snapshot():
+    """Everything the monitor shows in one document."""
+
+    return conditional_json(MONITOR_SNAPSHOT_COLLECTIONS, build_monitor_snapshot)
+
+
 @app.route('/api/status')
 def api_status():
-    return jsonify(vehicles)
+    return conditional_json(('vehicles',), lambda: vehicles)
 
 
-@app.route('/api/dispatch', methods=['POST'])
-def api_dispatch():
-    data = request.json or {}
-    unit = data.get('unit')
-    status = int(data.get('status', 2))
-    note = data.get('note')
-    location = data.get('location')
-    lat = data.get('lat')
-    lon = data.get('lon')
-    if unit in vehicles and status in STATUS_TEXT:
-        if (lat is None or lon is None) and location:
-            lat, lon = geocode(location)
-        info = vehicles[unit]
-        active_inc = next(
-            (
-                inc
-                for inc in incidents
-                if inc.get('active') and unit in inc.get('vehicles', [])
-            ),
-            None,
-        )
-        active = active_inc is not None
-        if active and status in {1, 2}:
-            info['status'] = status
-            info['incident_id'] = None
-            info['alarm_time'] = None
-            info['note'] = ''
-            info['priority'] = ''
-            if status == 2:
-                info['location'] = info.get('base', '')
-                if info['location']:
-                    info['lat'], info['lon'] = geocode(info['location'])
-                else:
-                    info['lat'] = info['lon'] = None
-            else:
-                info['location'] = ''
-                info['lat'] = None
-                info['lon'] = None
-            incident_cleared = False
-            if active_inc and unit in active_inc.get('vehicles', []):
-                active_inc['vehicles'].remove(unit)
-                active_inc.setdefault('log', []).append({
-                    'time': now_local_iso(),
-                    'unit': unit,
-                    'status': status,
-                })
-                incident_cleared = finalise_incident_if_clear(active_inc)
-            save_vehicles()
-            save_incidents()
-            ended = bool(active_inc and not active_inc.get('active'))
-            response = {'ok': True, 'incidentEnded': ended}
-            if incident_cleared and not ended:
-                response['incidentClear'] = True
-            return jsonify(response)
+def apply_dispatch(unit, status, note=None, location=None, lat=None, lon=None):
+    """Set the status of a known unit and log it on its incidents.
+
+    The caller validates ``unit`` and ``status`` and saves vehicles and
+    incidents afterwards; the returned dict is the API result.
+    """
+
+    info = vehicles[unit]
+    active_inc = indexed_incidents().active_incident_for_unit(unit)
+    active = active_inc is not None
+    if active and status in {1, 2}:
         info['status'] = status
-        if note is not None or location is not None or lat is not None or lon is not None:
-            if not active:
-                info['incident_id'] = None
-                info['priority'] = ''
-            if note is not None:
-                info['note'] = note
-            if location is not None:
-                info['location'] = location
-                info['lat'] = lat
-                info['lon'] = lon
-        elif status == 2 and not active:
-            info['incident_id'] = None
-            info['note'] = ''
-            info['priority'] = ''
+        info['incident_id'] = None
+        info['alarm_time'] = None
+        info['note'] = ''
+        info['priority'] = ''
+        if status == 2:
             info['location'] = info.get('base', '')
             if info['location']:
-                info['lat'], info['lon'] = geocode(info['location'])
+                info['lat'], info['lon'] = geocode_vehicle_later(unit, info['location'])
             else:
                 info['lat'] = info['lon'] = None
-        elif not active:
-            info['incident_id'] = None
-            info['note'] = ''
-            info['priority'] = ''
+        else:
             info['location'] = ''
             info['lat'] = None
             info['lon'] = None
-        for inc in incidents:
-            if inc.get('active') and unit in inc.get('vehicles', []):
-                inc.setdefault('log', []).append({
-                    'time': now_local_iso(),
-                    'unit': unit,
-                    'status': status,
-                })
-                finalise_incident_if_clear(inc)
+        incident_cleared = False
+        if active_inc and unit in active_inc.get('vehicles', []):
+            active_inc['vehicles'].remove(unit)
+            active_inc.setdefault('log', []).append({
+                'time': now_local_iso(),
+                'unit': unit,
+                'status': status,
+            })
+            record_incident_change(active_inc)
+            incident_cleared = finalise_incident_if_clear(active_inc)
+        ended = bool(active_inc and not active_inc.get('active'))
+        response = {'ok': True, 'incidentEnded': ended}
+        if incident_cleared and not ended:
+            response['incidentClear'] = True
+        return response
+    info['status'] = status
+    if note is not None or location is not None or lat is not None or lon is not None:
+        if not active:
+            info['incident_id'] = None
+            info['priority'] = ''
+        if note is not None:
+            info['note'] = note
+        if location is not None:
+            info['location'] = location
+            info['lat'] = lat
+            info['lon'] = lon
+            if (lat is None or lon is None) and location:
+                info['lat'], info['lon'] = geocode_vehicle_later(unit, location)
+    elif status == 2 and not active:
+        info['incident_id'] = None
+        info['note'] = ''
+        info['priority'] = ''
+        info['location'] = info.get('base', '')
+        if info['location']:
+            info['lat'], info['lon'] = geocode_vehicle_later(unit, info['location'])
+        else:
+            info['lat'] = info['lon'] = None
+    elif not active:
+        info['incident_id'] = None
+        info['note'] = ''
+        info['priority'] = ''
+        info['location'] = ''
+        info['lat'] = None
+        info['lon'] = None
+    for inc in indexed_incidents().active_incidents_for_unit(unit):
+        if unit in inc.get('vehicles', []):
+            inc.setdefault('log', []).append({
+                'time': now_local_iso(),
+                'unit': unit,
+                'status': status,
+            })
+            record_incident_change(inc)
+            finalise_incident_if_clear(inc)
+    return {'ok': True}
+
+
+@app.route('/api/dispatch', methods=['POST'])
+def api_dispatch():
+    data = request.json or {}
+    unit = data.get('unit')
+    status = int(data.get('status', 2))
+    if unit in vehicles and status in STATUS_TEXT:
+        result = apply_dispatch(
+            unit,
+            status,
+            note=data.get('note'),
+            location=data.get('location'),
+            lat=data.get('lat'),
+            lon=data.get('lon'),
+        )
         save_vehicles()
         save_incidents()
-        return jsonify({'ok': True})
+        return jsonify(result)
     return jsonify({'ok': False}), 400
 
 
@@ -1051,12 +1576,43 @@ def api_delete_vehicle(unit):
 
 @app.route('/api/incidents', methods=['GET'])
 def api_list_incidents():
-    return jsonify(incidents)
+    """Return incidents, optionally filtered and paged newest first.
+
+    Without query parameters the complete list is returned as before. With
+    any of ``active``, ``since``, ``until``, ``unit``, ``priority``, ``limit``
+    or ``cursor`` one page is returned; the cursor of the following page is
+    sent in the ``X-Next-Cursor`` header.
+    """
+
+    if not request.args:
+        return conditional_json(('incidents',), lambda: incidents)
+    args = request.args
+    active = args.get('active')
+    try:
+        limit = max(1, min(int(args.get('limit', 200)), 1000))
+    except (TypeError, ValueError):
+        limit = 200
+    try:
+        page, next_cursor = indexed_incidents().query(
+            active=parse_bool(active) if active not in (None, '') else None,
+            since=(args.get('since') or '').strip() or None,
+            until=(args.get('until') or '').strip() or None,
+            unit=(args.get('unit') or '').strip() or None,
+            priority=args.get('priority'),
+            limit=limit,
+            cursor=args.get('cursor') or None,
+        )
+    except ValueError as exc:
+        return jsonify({'ok': False, 'error': str(exc)}), 400
+    response = conditional_json(('incidents',), lambda: page)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 
 @app.route('/api/templates', methods=['GET'])
 def api_list_templates():
-    return jsonify(templates)
+    return conditional_json(('templates',), lambda: templates)
 
 
 @app.route('/api/templates', methods=['POST'])
@@ -1105,7 +1661,7 @@ def _normalise_priorities(items):
 
 @app.route('/api/priorities', methods=['GET'])
 def api_list_priorities():
-    return jsonify(priorities)
+    return conditional_json(('priorities',), lambda: priorities)
 
 
 @app.route('/api/priorities', methods=['POST'])
@@ -1122,7 +1678,7 @@ def api_save_priorities():
 
 @app.route('/api/announcements', methods=['GET'])
 def api_list_announcements():
-    return jsonify(announcements)
+    return conditional_json(('announcements',), lambda: announcements)
 
 
 @app.route('/api/announcements', methods=['POST'])
@@ -1169,10 +1725,8 @@ def api_create_incident():
     priority = data.get('priority', '')
     patient = data.get('patient', '')
     vehicles_req = data.get('vehicles', [])
-    if (lat is None or lon is None) and location:
-        lat, lon = geocode(location)
     incident = {
-        'id': len(incidents) + 1,
+        'id': next_incident_id(),
         'start': now_local_iso(),
         'end': None,
         'vehicles': list(vehicles_req),
@@ -1194,6 +1748,9 @@ def api_create_incident():
     for unit in vehicles_req:
         incident['log'].append({'time': now, 'unit': unit, 'status': 'zugeteilt'})
     incidents.append(incident)
+    if (lat is None or lon is None) and location:
+        geocode_incident_later(incident)
+    record_incident_change(incident)
     if vehicles_req:
         for unit in vehicles_req:
             update_vehicle_incident_details(unit, incident, newly_assigned=True)
@@ -1202,272 +1759,465 @@ def api_create_incident():
     return jsonify({'ok': True, 'id': incident['id']})
 
 
+def apply_note(inc, text):
+    inc['notes'].append({'time': now_local_iso(), 'text': text})
+    record_incident_change(inc)
+    return {'ok': True}
+
+
 @app.route('/api/incidents/<int:inc_id>/notes', methods=['POST'])
 def api_add_note(inc_id):
     data = request.json or {}
     text = data.get('text')
     if text:
-        for inc in incidents:
-            if inc['id'] == inc_id and inc.get('active'):
-                inc['notes'].append({'time': now_local_iso(), 'text': text})
-                save_incidents()
-                return jsonify({'ok': True})
+        inc = find_incident(inc_id)
+        if inc and inc.get('active'):
+            result = apply_note(inc, text)
+            save_incidents()
+            return jsonify(result)
     return jsonify({'ok': False}), 404
 
 
 @app.route('/api/incidents/<int:inc_id>/end', methods=['POST'])
 def api_end_incident(inc_id):
-    for inc in incidents:
-        if inc['id'] == inc_id and inc.get('active'):
-            inc['active'] = False
-            inc['end'] = now_local_iso()
-            for unit in inc.get('vehicles', []):
-                if unit in vehicles:
-                    if not any(
-                        other.get('active') and unit in other.get('vehicles', [])
-                        for other in incidents
-                        if other is not inc
-                    ):
-                        info = vehicles[unit]
-                        info['status'] = 1
-                        info['note'] = ''
-                        info['priority'] = ''
-                        info['incident_id'] = None
-                        info['alarm_time'] = None
-                        info['location'] = ''
-                        info['lat'] = None
-                        info['lon'] = None
-            save_vehicles()
-            save_incidents()
-            return jsonify({'ok': True})
+    inc = find_incident(inc_id)
+    if inc and inc.get('active'):
+        inc['active'] = False
+        inc['end'] = now_local_iso()
+        record_incident_change(inc)
+        for unit in inc.get('vehicles', []):
+            if unit in vehicles:
+                if not indexed_incidents().unit_is_bound(unit, exclude=inc):
+                    info = vehicles[unit]
+                    info['status'] = 1
+                    info['note'] = ''
+                    info['priority'] = ''
+                    info['incident_id'] = None
+                    info['alarm_time'] = None
+                    info['location'] = ''
+                    info['lat'] = None
+                    info['lon'] = None
+        save_vehicles()
+        save_incidents()
+        return jsonify({'ok': True})
     return jsonify({'ok': False}), 404
 
 
 @app.route('/api/incidents/<int:inc_id>', methods=['DELETE'])
 def api_delete_incident(inc_id):
-    for i, inc in enumerate(incidents):
-        if inc['id'] == inc_id:
-            incidents.pop(i)
-            save_incidents()
-            return jsonify({'ok': True})
+    inc = find_incident(inc_id)
+    if inc:
+        incidents[:] = [other for other in incidents if other is not inc]
+        record_incident_removal(inc)
+        save_incidents()
+        return jsonify({'ok': True})
     return jsonify({'ok': False}), 404
 
 
+def apply_alert(inc, requested_units):
+    """Alert units for an active incident; the caller saves vehicles and incidents.
+
+    Each unit is assigned to the incident and its vehicle entry is updated
+    with the incident details. Vehicles retain their current status and are
+    not automatically set to status 3. Units already bound to another active
+    incident are skipped, units alerted before are reported separately.
+    """
+
+    inc_id = inc['id']
+    inc = normalise_incident(inc)
+    alerted = []
+    skipped = []
+    already = []
+    requested_units = list(dict.fromkeys(requested_units))
+    units = requested_units if requested_units else list(dict.fromkeys(inc.get('vehicles', [])))
+    index = indexed_incidents()
+    for unit in units:
+        # Skip vehicles that are already bound to another active incident
+        if index.unit_is_bound(unit, exclude=inc):
+            skipped.append(unit)
+            continue
+        info = vehicles.get(unit)
+        already_assigned = unit in inc['vehicles']
+        already_active = incident_unit_was_alerted(inc, unit)
+        if already_active:
+            already.append(unit)
+            continue
+        # Add the vehicle to this incident if not already present
+        if not already_assigned:
+            inc['vehicles'].append(unit)
+        now = now_local_iso()
+        # Log the alarm time for the incident
+        inc.setdefault('log', []).append({
+            'time': now,
+            'unit': unit,
+            'status': 'alarmiert',
+        })
+        if unit in vehicles:
+            info = vehicles[unit]
+            # Store incident details without changing vehicle status
+            info['note'] = inc['keyword']
+            info['location'] = inc['location']['name']
+            info['lat'] = inc['location']['lat']
+            info['lon'] = inc['location']['lon']
+            info['alarm_time'] = now
+            info['incident_id'] = inc_id
+            info['priority'] = inc.get('priority', '')
+            pager_service.enqueue(info.get('pager'), unit)
+        alerted.append(unit)
+    if alerted:
+        record_incident_change(inc)
+        queue_event('incident.alerted', {'id': inc_id, 'units': alerted, 'incident': inc})
+    return {
+        'ok': True,
+        'alerted': alerted,
+        'skipped': skipped,
+        'already_alerted': already,
+    }
+
+
 @app.route('/api/incidents/<int:inc_id>/alert', methods=['POST'])
 def api_alert_incident(inc_id):
     """Alert the given units for an active incident.
 
-    Each unit is assigned to the incident and its vehicle entry is updated
-    with the incident details. Vehicles retain their current status and are
-    not automatically set to status 3. The response additionally reports which
-    units were alerted and which were skipped because they were already bound
-    to another active incident.
+    The response reports which units were alerted and which were skipped
+    because they were already bound to another active incident.
     """
     data = request.json or {}
-    requested_units = data.get('units', [])
-    for inc in incidents:
-        if inc['id'] == inc_id and inc.get('active'):
-            inc = normalise_incident(inc)
-            alerted = []
-            skipped = []
-            already = []
-            requested_units = list(dict.fromkeys(requested_units))
-            units = requested_units if requested_units else list(dict.fromkeys(inc.get('vehicles', [])))
-            for unit in units:
-                # Skip vehicles that are already bound to another active incident
-                if any(
-                    other.get('active') and unit in other.get('vehicles', [])
-                    for other in incidents
-                    if other is not inc
-                ):
-                    skipped.append(unit)
-                    continue
-                info = vehicles.get(unit)
-                already_assigned = unit in inc['vehicles']
-                already_active = incident_unit_was_alerted(inc, unit)
-                if already_active:
-                    already.append(unit)
-                    continue
-                # Add the vehicle to this incident if not already present
-                if not already_assigned:
-                    inc['vehicles'].append(unit)
-                now = now_local_iso()
-                # Log the alarm time for the incident
-                inc.setdefault('log', []).append({
-                    'time': now,
-                    'unit': unit,
-                    'status': 'alarmiert',
-                })
-                if unit in vehicles:
-                    info = vehicles[unit]
-                    # Store incident details without changing vehicle status
-                    info['note'] = inc['keyword']
-                    info['location'] = inc['location']['name']
-                    info['lat'] = inc['location']['lat']
-                    info['lon'] = inc['location']['lon']
-                    info['alarm_time'] = now
-                    info['incident_id'] = inc_id
-                    info['priority'] = inc.get('priority', '')
-                    pager_service.enqueue(info.get('pager'), unit)
-                alerted.append(unit)
-            save_incidents()
-            save_vehicles()
-            return jsonify(
-                {
-                    'ok': True,
-                    'alerted': alerted,
-                    'skipped': skipped,
-                    'already_alerted': already,
-                }
-            )
+    inc = find_incident(inc_id)
+    if inc and inc.get('active'):
+        result = apply_alert(inc, data.get('units', []))
+        save_incidents()
+        save_vehicles()
+        return jsonify(result)
     return jsonify({'ok': False}), 404
 
 
+def prepare_batch_operation(operation):
+    """Validate one ``/api/batch`` operation and return a callable applying it.
+
+    Raises ``ValueError`` with a German message for invalid operations. The
+    operations cannot invalidate each other (none of them ends or removes an
+    incident), so checking all of them up front makes the batch all-or-nothing.
+    """
+
+    if not isinstance(operation, dict):
+        raise ValueError('Ungültige Operation.')
+    kind = operation.get('op')
+    if kind == 'dispatch':
+        unit = operation.get('unit')
+        try:
+            status = int(operation.get('status', 2))
+        except (TypeError, ValueError):
+            raise ValueError('Ungültiger Status.') from None
+        if unit not in vehicles:
+            raise ValueError(f'Unbekanntes Fahrzeug: {unit}')
+        if status not in STATUS_TEXT:
+            raise ValueError('Ungültiger Status.')
+        return lambda: apply_dispatch(
+            unit,
+            status,
+            note=operation.get('note'),
+            location=operation.get('location'),
+            lat=operation.get('lat'),
+            lon=operation.get('lon'),
+        )
+    if kind not in ('note', 'alert'):
+        raise ValueError(f'Unbekannte Operation: {kind}')
+    inc = find_incident(operation.get('incident'))
+    if not inc or not inc.get('active'):
+        raise ValueError(f"Kein aktiver Einsatz #{operation.get('incident')}")
+    if kind == 'note':
+        text = operation.get('text')
+        if not text:
+            raise ValueError('Text erforderlich')
+        return lambda: apply_note(inc, text)
+    units = operation.get('units', [])
+    if not isinstance(units, list):
+        raise ValueError('Ungültige Fahrzeugliste.')
+    return lambda: apply_alert(inc, units)
+
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """Apply dispatch, note and alert operations together.
+
+    Either every operation is applied or none: all of them are validated
+    first, and a single invalid one rejects the batch with per-operation
+    errors. Vehicles and incidents are saved once and the resulting events
+    are published together after the request.
+    """
+
+    data = request.json or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'ok': False, 'error': 'Keine Operationen übergeben.'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'ok': False, 'error': f'Höchstens {MAX_BATCH_OPERATIONS} Operationen pro Anfrage.'}), 400
+    prepared = []
+    errors = []
+    for operation in operations:
+        try:
+            prepared.append(prepare_batch_operation(operation))
+            errors.append(None)
+        except ValueError as exc:
+            errors.append(str(exc))
+    if any(errors):
+        # valid operations are reported as skipped, nothing has been applied
+        results = [{'ok': False, 'error': error} if error else {'ok': False, 'skipped': True} for error in errors]
+        return jsonify({'ok': False, 'error': 'Batch wurde nicht ausgeführt.', 'results': results}), 400
+    results = [apply() for apply in prepared]
+    save_vehicles()
+    save_incidents()
+    return jsonify({'ok': True, 'results': results})
+
+
 @app.route('/api/incidents/<int:inc_id>', methods=['GET'])
 def api_get_incident(inc_id):
-    for inc in incidents:
-        if inc['id'] == inc_id:
-            return jsonify(normalise_incident(inc))
+    inc = find_incident(inc_id)
+    if inc:
+        return jsonify(normalise_incident(inc))
+    archived = storage.load_archived_incident(inc_id)
+    if archived:
+        archived = normalise_incident(archived)
+        archived['archived'] = True
+        return jsonify(archived)
     return jsonify({'ok': False}), 404
 
 
+@app.route('/api/incidents/<int:inc_id>/units', methods=['GET'])
+def api_incident_units(inc_id):
+    """Return first alarm, last status and status times of every unit of an incident."""
+
+    inc = find_incident(inc_id)
+    if not inc:
+        return jsonify({'ok': False}), 404
+    units = indexed_incidents().log_state(inc).units
+    return jsonify({unit: state.as_dict() for unit, state in units.items()})
+
+
+@app.route('/api/incidents/search', methods=['GET'])
+def api_search_incidents():
+    """Full-text search over keyword, notes, location and patient of all incidents.
+
+    Every word of ``q`` has to match the beginning of a word in the incident;
+    archived incidents are included and marked with ``archived``.
+    """
+
+    query = (request.args.get('q') or '').strip()
+    since = (request.args.get('since') or '').strip() or None
+    until = (request.args.get('until') or '').strip() or None
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except (TypeError, ValueError):
+        limit = 50
+    index = indexed_incidents()
+    results = []
+    for inc_id, archived, score in incident_search.search(query, since=since, until=until, limit=limit):
+        if archived:
+            incident = storage.load_archived_incident(inc_id)
+            if not incident:
+                continue
+            incident = dict(normalise_incident(incident), archived=True)
+        else:
+            incident = index.get(inc_id)
+            if not incident:
+                continue
+            incident = dict(normalise_incident(incident))
+        incident['score'] = score
+        results.append(incident)
+    return jsonify(results)
+
+
+def incident_start(incident):
+    return incident.get('start') or ''
+
+
+@app.route('/api/incidents/export', methods=['GET'])
+def api_export_incidents():
+    """Stream loaded and archived incidents as NDJSON or CSV, oldest first.
+
+    ``format`` is ``ndjson`` (one incident with notes and log per line, the
+    default) or ``csv`` (one row per log entry); ``since``, ``until`` and
+    ``unit`` filter like ``/api/incidents``. Archived incidents are read in
+    batches while the response is sent, so the export never holds the whole
+    history in memory.
+    """
+
+    export_format = (request.args.get('format') or 'ndjson').strip().lower()
+    if export_format not in EXPORT_FORMATS:
+        allowed = ', '.join(EXPORT_FORMATS)
+        return jsonify({'ok': False, 'error': f'Ungültiges Exportformat. Erlaubt: {allowed}'}), 400
+    since = (request.args.get('since') or '').strip() or None
+    until = (request.args.get('until') or '').strip() or None
+    unit = (request.args.get('unit') or '').strip() or None
+    # The loaded incidents are copied up front: they keep changing while the
+    # response streams, and the hot set is small compared to the archive.
+    loaded = [
+        deepcopy(incident)
+        for incident in reversed(list(indexed_incidents().newest_first(since=since, until=until)))
+        if incident_matches(incident, unit=unit)
+    ]
+    archived = (
+        dict(normalise_incident(incident), archived=True)
+        for incident in storage.iter_archived_incidents(since=since, until=until, unit=unit)
+    )
+    merged = heapq.merge(archived, loaded, key=incident_start)
+    export = export_csv if export_format == 'csv' else export_ndjson
+    filename = f"einsaetze-{datetime.now().strftime('%Y%m%d')}.{export_format}"
+    response = Response(export(merged), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/api/incidents/archive', methods=['GET'])
+def api_list_archived_incidents():
+    """Return archived incidents, optionally limited by start time and unit."""
+
+    since = (request.args.get('since') or '').strip() or None
+    until = (request.args.get('until') or '').strip() or None
+    unit = (request.args.get('unit') or '').strip() or None
+    try:
+        limit = max(1, min(int(request.args.get('limit', 200)), 1000))
+    except (TypeError, ValueError):
+        limit = 200
+    results = storage.query_incidents(since=since, until=until, unit=unit, limit=limit, archived=True)
+    return jsonify([normalise_incident(inc) for inc in results])
+
+
 @app.route('/api/incidents/<int:inc_id>', methods=['PUT'])
 def api_update_incident(inc_id):
     data = request.json or {}
-    for inc in incidents:
-        if inc['id'] == inc_id:
-            inc = normalise_incident(inc)
-            keyword = data.get('keyword')
-            location_raw = data.get('location')
-            priority = data.get('priority')
-            patient = data.get('patient')
-            note = data.get('note')
-            vehicles_req = data.get('vehicles')
-            lat_value = data.get('lat')
-            lon_value = data.get('lon')
-            if isinstance(location_raw, dict):
-                loc_name = location_raw.get('name')
-                if lat_value is None:
-                    lat_value = location_raw.get('lat')
-                if lon_value is None:
-                    lon_value = location_raw.get('lon')
-            else:
-                loc_name = location_raw
-            if loc_name is not None:
-                loc_name = (loc_name or '').strip()
-            if keyword is not None:
-                inc['keyword'] = keyword
-            if loc_name is not None:
-                inc['location']['name'] = loc_name
-                if loc_name == '':
-                    inc['location']['lat'] = None
-                    inc['location']['lon'] = None
-            try:
-                lat_value = float(lat_value)
-            except (TypeError, ValueError):
-                lat_value = None
-            try:
-                lon_value = float(lon_value)
-            except (TypeError, ValueError):
-                lon_value = None
-            if lat_value is not None:
-                inc['location']['lat'] = lat_value
-            if lon_value is not None:
-                inc['location']['lon'] = lon_value
-            if loc_name:
-                lat = inc['location'].get('lat')
-                lon = inc['location'].get('lon')
-                if lat is None or lon is None:
-                    lat, lon = geocode(loc_name)
-                    inc['location']['lat'] = lat
-                    inc['location']['lon'] = lon
-            if priority is not None:
-                inc['priority'] = priority
-            if patient is not None:
-                inc['patient'] = patient
-            vehicles_updated = False
-            removal_error = None
-            if vehicles_req is not None:
-                existing_units = list(inc.get('vehicles', []))
-                existing_set = set(existing_units)
-                requested_units = list(dict.fromkeys(vehicles_req))
-                requested_set = set(requested_units)
-                added = [unit for unit in requested_units if unit not in existing_set]
-                removed = [unit for unit in existing_units if unit not in requested_set]
-                blocked = []
-                allowed_removed = []
-                for unit in removed:
-                    info = vehicles.get(unit)
-                    status = info.get('status') if info else None
-                    if not inc.get('active') or status in {1, 2}:
-                        allowed_removed.append(unit)
-                    else:
-                        blocked.append(unit)
-                final_units = requested_units[:]
-                for unit in blocked:
-                    if unit not in final_units:
-                        final_units.append(unit)
-                inc['vehicles'] = final_units
-                now = now_local_iso()
-                for unit in added:
-                    inc.setdefault('log', []).append({
-                        'time': now,
-                        'unit': unit,
-                        'status': 'zugeteilt',
-                    })
-                for unit in allowed_removed:
-                    inc.setdefault('log', []).append({
-                        'time': now,
-                        'unit': unit,
-                        'status': 'entfernt',
-                    })
-                    if unit in vehicles:
-                        if not any(
-                            other.get('active') and unit in other.get('vehicles', [])
-                            for other in incidents
-                            if other is not inc
-                        ):
-                            info = vehicles[unit]
-                            info['status'] = 1
-                            info['note'] = ''
-                            info['incident_id'] = None
-                            info['alarm_time'] = None
-                            info['location'] = ''
-                            info['lat'] = None
-                            info['lon'] = None
-                            info['priority'] = ''
-                for unit in inc.get('vehicles', []):
-                    update_vehicle_incident_details(
-                        unit,
-                        inc,
-                        newly_assigned=unit in added,
-                    )
-                save_vehicles()
-                vehicles_updated = True
-                finalise_incident_if_clear(inc)
-                if blocked:
-                    removal_error = {
-                        'ok': False,
-                        'error': 'Fahrzeuge können nur in Status 1 oder 2 entfernt werden.',
-                        'blocked': blocked,
-                    }
-            if not vehicles_updated and inc.get('vehicles'):
-                for unit in inc.get('vehicles', []):
-                    update_vehicle_incident_details(unit, inc)
-                save_vehicles()
-                vehicles_updated = True
-            if note:
-                inc.setdefault('notes', []).append({'time': now_local_iso(), 'text': note})
-            save_incidents()
-            if removal_error:
-                return jsonify(removal_error), 400
-            return jsonify({'ok': True})
+    inc = find_incident(inc_id)
+    if inc:
+        inc = normalise_incident(inc)
+        keyword = data.get('keyword')
+        location_raw = data.get('location')
+        priority = data.get('priority')
+        patient = data.get('patient')
+        note = data.get('note')
+        vehicles_req = data.get('vehicles')
+        lat_value = data.get('lat')
+        lon_value = data.get('lon')
+        if isinstance(location_raw, dict):
+            loc_name = location_raw.get('name')
+            if lat_value is None:
+                lat_value = location_raw.get('lat')
+            if lon_value is None:
+                lon_value = location_raw.get('lon')
+        else:
+            loc_name = location_raw
+        if loc_name is not None:
+            loc_name = (loc_name or '').strip()
+        if keyword is not None:
+            inc['keyword'] = keyword
+        if loc_name is not None:
+            inc['location']['name'] = loc_name
+            if loc_name == '':
+                inc['location']['lat'] = None
+                inc['location']['lon'] = None
+        try:
+            lat_value = float(lat_value)
+        except (TypeError, ValueError):
+            lat_value = None
+        try:
+            lon_value = float(lon_value)
+        except (TypeError, ValueError):
+            lon_value = None
+        if lat_value is not None:
+            inc['location']['lat'] = lat_value
+        if lon_value is not None:
+            inc['location']['lon'] = lon_value
+        location = inc['location']
+        if not location['name'] or (location.get('lat') is not None and location.get('lon') is not None):
+            location.pop('pending', None)
+        elif loc_name:
+            geocode_incident_later(inc)
+        if priority is not None:
+            inc['priority'] = priority
+        if patient is not None:
+            inc['patient'] = patient
+        vehicles_updated = False
+        removal_error = None
+        if vehicles_req is not None:
+            existing_units = list(inc.get('vehicles', []))
+            existing_set = set(existing_units)
+            requested_units = list(dict.fromkeys(vehicles_req))
+            requested_set = set(requested_units)
+            added = [unit for unit in requested_units if unit not in existing_set]
+            removed = [unit for unit in existing_units if unit not in requested_set]
+            blocked = []
+            allowed_removed = []
+            for unit in removed:
+                info = vehicles.get(unit)
+                status = info.get('status') if info else None
+                if not inc.get('active') or status in {1, 2}:
+                    allowed_removed.append(unit)
+                else:
+                    blocked.append(unit)
+            final_units = requested_units[:]
+            for unit in blocked:
+                if unit not in final_units:
+                    final_units.append(unit)
+            inc['vehicles'] = final_units
+            now = now_local_iso()
+            for unit in added:
+                inc.setdefault('log', []).append({
+                    'time': now,
+                    'unit': unit,
+                    'status': 'zugeteilt',
+                })
+            for unit in allowed_removed:
+                inc.setdefault('log', []).append({
+                    'time': now,
+                    'unit': unit,
+                    'status': 'entfernt',
+                })
+                if unit in vehicles:
+                    if not indexed_incidents().unit_is_bound(unit, exclude=inc):
+                        info = vehicles[unit]
+                        info['status'] = 1
+                        info['note'] = ''
+                        info['incident_id'] = None
+                        info['alarm_time'] = None
+                        info['location'] = ''
+                        info['lat'] = None
+                        info['lon'] = None
+                        info['priority'] = ''
+            for unit in inc.get('vehicles', []):
+                update_vehicle_incident_details(
+                    unit,
+                    inc,
+                    newly_assigned=unit in added,
+                )
+            save_vehicles()
+            vehicles_updated = True
+            finalise_incident_if_clear(inc)
+            if blocked:
+                removal_error = {
+                    'ok': False,
+                    'error': 'Fahrzeuge können nur in Status 1 oder 2 entfernt werden.',
+                    'blocked': blocked,
+                }
+        if not vehicles_updated and inc.get('vehicles'):
+            for unit in inc.get('vehicles', []):
+                update_vehicle_incident_details(unit, inc)
+            save_vehicles()
+            vehicles_updated = True
+        if note:
+            inc.setdefault('notes', []).append({'time': now_local_iso(), 'text': note})
+        record_incident_change(inc)
+        save_incidents()
+        if removal_error:
+            return jsonify(removal_error), 400
+        return jsonify({'ok': True})
     return jsonify({'ok': False}), 404
 
 
 @app.route('/api/settings', methods=['GET'])
 def api_get_settings():
-    return jsonify(settings)
+    return conditional_json(('settings',), lambda: settings)
 
 
 @app.route('/api/settings/operation-area', methods=['PUT'])
@@ -1494,21 +2244,42 @@ def api_update_operation_area():
     except (TypeError, ValueError):
         lon = None
     if (lat is None or lon is None) and name:
-        lat, lon = geocode(name)
+        lat, lon = cached_coordinates(name)
+        if lat is None:
+            # applied once Nominatim has answered; until then the old area stays
+            geocode_worker.submit(
+                'operation_area',
+                lambda: geocode(name),
+                lambda result: apply_operation_area(name, *(result or (None, None)), zoom),
+            )
+            return jsonify({'ok': True, 'pending': True, 'operation_area': settings.get('operation_area')}), 202
     if lat is None or lon is None:
         return jsonify({'ok': False, 'error': 'Ort konnte nicht gefunden werden.'}), 400
     if not name:
-        display = reverse_geocode(lat, lon)
-        if display:
-            name = display
-        else:
-            name = f"{lat:.5f}, {lon:.5f}"
+        display, found = cached_geocode('reverse', reverse_key(lat, lon))
+        name = display if found else f"{lat:.5f}, {lon:.5f}"
+        if not found:
+            placeholder = name
+
+            def apply_display(display):
+                area = settings.get('operation_area') or {}
+                if display and (area.get('name'), area.get('lat'), area.get('lon')) == (placeholder, lat, lon):
+                    apply_operation_area(display, lat, lon, area.get('zoom', zoom))
+
+            geocode_worker.submit('operation_area', lambda: reverse_geocode(lat, lon), apply_display)
+    apply_operation_area(name, lat, lon, zoom)
+    return jsonify({'ok': True, 'operation_area': settings['operation_area']})
+
+
+def apply_operation_area(name, lat, lon, zoom):
+    if lat is None or lon is None:
+        app.logger.warning('Einsatzbereich %r wurde nicht gefunden', name)
+        return
+    operation_area = dict(settings.get('operation_area') or {})
     operation_area.update({'name': name, 'lat': lat, 'lon': lon, 'zoom': zoom})
     settings['operation_area'] = operation_area
-    weather_cache['data'] = None
-    weather_cache['expires'] = None
+    weather_cache.clear()
     save_settings()
-    return jsonify({'ok': True, 'operation_area': operation_area})
 
 
 @app.route('/api/settings/monitor', methods=['PUT'])
@@ -1652,6 +2423,24 @@ def api_update_pager_settings():
     return jsonify({'ok': True, 'pager': pager_settings})
 
 
+@app.route('/api/settings/archive', methods=['PUT'])
+def api_update_archive_settings():
+    data = request.get_json(silent=True) or {}
+    archive_settings = dict(settings.get('archive') or DEFAULT_SETTINGS['archive'])
+    try:
+        if 'after_hours' in data:
+            archive_settings['after_hours'] = _parse_int_setting(
+                data.get('after_hours'), minimum=1, maximum=24 * 365, name='Archivierung nach Stunden'
+            )
+        if 'enabled' in data:
+            archive_settings['enabled'] = parse_bool(data.get('enabled'), archive_settings.get('enabled', True))
+    except ValueError as exc:
+        return jsonify({'ok': False, 'error': str(exc)}), 400
+    settings['archive'] = archive_settings
+    save_settings()
+    return jsonify({'ok': True, 'archive': archive_settings})
+
+
 @app.route('/api/settings/network', methods=['PUT'])
 def api_update_network_settings():
     data = request.json or {}
@@ -1673,36 +2462,34 @@ def api_update_network_settings():
     return jsonify({'ok': True, 'network': network_settings})
 
 
-@app.route('/api/geocode/search')
-def api_geocode_search():
-    query = (request.args.get('q') or '').strip()
+def geocode_search_lookup(args):
+    """Search places for the location picker; returns ``(payload, status)``."""
+
+    query = (args.get('q') or '').strip()
     normalised = ' '.join(query.split())
     if len(normalised) < 3:
-        return jsonify({'ok': False, 'error': 'Bitte mindestens drei Zeichen eingeben.'}), 400
-    limit_param = request.args.get('limit', '5')
+        return {'ok': False, 'error': 'Bitte mindestens drei Zeichen eingeben.'}, 400
+    limit_param = args.get('limit', '5')
     try:
         limit = max(1, min(int(limit_param), 10))
     except (TypeError, ValueError):
         limit = 5
-    cache_key = (normalised.lower(), limit)
-    cached, found = _cache_get(geocode_search_cache, cache_key)
+    center = operation_area_center()
+    results = gazetteer.search(normalised, limit, near=center)
+    if results:
+        return {'ok': True, 'results': results}, 200
+    cache_key = search_key(normalised, limit)
+    cached, found = cached_geocode('search', cache_key)
     if found:
-        return jsonify({'ok': True, 'results': cached})
+        return {'ok': True, 'results': cached}, 200
     params = {
         'q': normalised,
         'format': 'jsonv2',
         'addressdetails': 1,
         'limit': limit,
     }
-    operation_area = settings.get('operation_area') or {}
-    lat = operation_area.get('lat')
-    lon = operation_area.get('lon')
-    try:
-        lat_value = float(lat)
-        lon_value = float(lon)
-    except (TypeError, ValueError):
-        lat_value = lon_value = None
-    if lat_value is not None and lon_value is not None:
+    if center:
+        lat_value, lon_value = center
         lat_span = 0.45
         lon_span = 0.65
         params['viewbox'] = f"{lon_value - lon_span},{lat_value + lat_span},{lon_value + lon_span},{lat_value - lat_span}"
@@ -1710,15 +2497,13 @@ def api_geocode_search():
     query_string = parse.urlencode(params)
     url = f"https://nominatim.openstreetmap.org/search?{query_string}"
     try:
-        req = urlrequest.Request(
-            url,
-            headers={'User-Agent': 'Alarmmonitor/1.0', 'Accept-Language': 'de'},
-        )
-        with urlrequest.urlopen(req, timeout=5) as resp:
-            data = json.loads(resp.read().decode('utf-8'))
+        data = yield UpstreamRequest(url, headers={'Accept-Language': 'de'})
     except Exception as exc:
         app.logger.warning('Geocoding search failed: %s', exc)
-        return jsonify({'ok': False, 'error': 'Die Suche ist fehlgeschlagen.'}), 502
+        cached, found = cached_geocode('search', cache_key, stale=True)
+        if found:
+            return {'ok': True, 'results': cached}, 200
+        return {'ok': False, 'error': 'Die Suche ist fehlgeschlagen.'}, 502
     results = []
     if isinstance(data, list):
         for item in data:
@@ -1741,41 +2526,52 @@ def api_geocode_search():
                     'category': item.get('class') or '',
                 }
             )
-    _cache_set(geocode_search_cache, cache_key, results, GEOCODE_SEARCH_CACHE_TTL)
-    return jsonify({'ok': True, 'results': results})
+    remember_geocode('search', cache_key, results, GEOCODE_SEARCH_CACHE_TTL)
+    return {'ok': True, 'results': results}, 200
 
 
-@app.route('/api/geocode/reverse')
-def api_reverse_geocode():
-    lat = request.args.get('lat')
-    lon = request.args.get('lon')
+@app.route('/api/geocode/search')
+def api_geocode_search():
+    payload, status = run_lookup(geocode_search_lookup(request.args))
+    return jsonify(payload), status
+
+
+def reverse_geocode_address_lookup(args):
+    """Resolve ``lat``/``lon`` query arguments to an address; returns ``(payload, status)``."""
+
     try:
-        lat_value = float(lat)
-        lon_value = float(lon)
+        lat_value = float(args.get('lat'))
+        lon_value = float(args.get('lon'))
     except (TypeError, ValueError):
-        return jsonify({'ok': False, 'error': 'Ungültige Koordinaten.'}), 400
-    address = reverse_geocode(lat_value, lon_value)
+        return {'ok': False, 'error': 'Ungültige Koordinaten.'}, 400
+    address = yield from reverse_geocode_lookup(lat_value, lon_value)
     if not address:
-        return jsonify({'ok': False, 'error': 'Adresse wurde nicht gefunden.'}), 404
-    return jsonify({'ok': True, 'address': address, 'lat': lat_value, 'lon': lon_value})
+        return {'ok': False, 'error': 'Adresse wurde nicht gefunden.'}, 404
+    return {'ok': True, 'address': address, 'lat': lat_value, 'lon': lon_value}, 200
 
 
-@app.route('/api/weather')
-def api_weather():
+@app.route('/api/geocode/reverse')
+def api_reverse_geocode():
+    payload, status = run_lookup(reverse_geocode_address_lookup(request.args))
+    return jsonify(payload), status
+
+
+def weather_lookup():
+    """Current weather for the operation area; returns ``(payload, status)``."""
+
     operation_area = settings.get('operation_area') or {}
     lat = operation_area.get('lat')
     lon = operation_area.get('lon')
     if lat is None or lon is None:
-        return jsonify({'ok': False, 'error': 'Kein Einsatzbereich konfiguriert.'}), 400
+        return {'ok': False, 'error': 'Kein Einsatzbereich konfiguriert.'}, 400
     try:
         lat = float(lat)
         lon = float(lon)
     except (TypeError, ValueError):
-        return jsonify({'ok': False, 'error': 'Ungültige Einsatzbereich-Koordinaten.'}), 400
-    now = datetime.now(timezone.utc)
-    cache = weather_cache
-    if cache['data'] and cache['expires'] and cache['expires'] > now:
-        return jsonify(cache['data'])
+        return {'ok': False, 'error': 'Ungültige Einsatzbereich-Koordinaten.'}, 400
+    cached, found, refresh = weather_cache.get_stale((lat, lon))
+    if found and not refresh:
+        return cached, 200
     query = parse.urlencode(
         {
             'latitude': lat,
@@ -1786,11 +2582,11 @@ def api_weather():
     )
     url = f"https://api.open-meteo.com/v1/forecast?{query}"
     try:
-        req = urlrequest.Request(url, headers={'User-Agent': 'Alarmmonitor/1.0'})
-        with urlrequest.urlopen(req, timeout=5) as resp:
-            data = json.loads(resp.read().decode('utf-8'))
+        data = yield UpstreamRequest(url)
     except Exception:
-        return jsonify({'ok': False, 'error': 'Wetterdienst nicht erreichbar.'}), 502
+        if found:
+            return cached, 200
+        return {'ok': False, 'error': 'Wetterdienst nicht erreichbar.'}, 502
     current = data.get('current_weather') or data.get('current') or {}
     payload = {
         'ok': True,
@@ -1808,9 +2604,14 @@ def api_weather():
             'weather_code': current.get('weathercode') or current.get('weather_code'),
         },
     }
-    cache['data'] = payload
-    cache['expires'] = now + timedelta(minutes=5)
-    return jsonify(payload)
+    weather_cache.set((lat, lon), payload)
+    return payload, 200
+
+
+@app.route('/api/weather')
+def api_weather():
+    payload, status = run_lookup(weather_lookup())
+    return jsonify(payload), status
 
 
 @app.route('/settings', endpoint='settings')
@@ -1831,7 +2632,31 @@ def download_log():
 
 @app.route('/api/health')
 def api_health():
-    return jsonify({'ok': True, 'time': now_local_iso()})
+    # only registered when the app is served by server.py
+    limiter = app.extensions.get('concurrency_limiter')
+    store_stats = geocode_store.stats()
+    return jsonify({
+        'ok': True,
+        'time': now_local_iso(),
+        'events': {
+            'subscribers': broadcaster.subscribers,
+            'last_id': broadcaster.last_id,
+            'resets': broadcaster.resets,
+        },
+        'response_cache': response_cache.stats(),
+        'caches': {
+            'geocode': geocode_cache.stats(),
+            'reverse_geocode': reverse_geocode_cache.stats(),
+            'geocode_search': geocode_search_cache.stats(),
+            'weather': weather_cache.stats(),
+        },
+        'geocode_store': store_stats,
+        # previous name of 'geocode_store', kept for existing dashboards
+        'geocode_cache': store_stats,
+        'gazetteer': gazetteer.stats(),
+        'server': limiter.stats() if limiter else None,
+        'upstream': {client.name: client.stats() for client in UPSTREAM_CLIENTS.values()},
+    })
 
 
 def log_request_and_errors(func):
@@ -1854,6 +2679,33 @@ for name, func in list(app.view_functions.items()):
         app.view_functions[name] = log_request_and_errors(func)
 
 
+# Text assets are compressed once at startup instead of on every request.
+static_precompressed = precompress_static(app.static_folder, app.logger)
+
+
+def static_file(filename):
+    encoding = negotiate(request.accept_encodings, static_precompressed.get(filename, ()))
+    if not encoding:
+        response = app.send_static_file(filename)
+        if filename in static_precompressed:
+            response.vary.add('Accept-Encoding')
+        return response
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_from_directory(
+        app.static_folder,
+        filename + FILE_SUFFIX[encoding],
+        mimetype=mimetype,
+        max_age=app.get_send_file_max_age(filename),
+    )
+    response.headers['Content-Encoding'] = encoding
+    # the precompressed file carries its own ETag (mtime and size of the sibling)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+app.view_functions['static'] = static_file
+
+
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,239 @@
+"""Monthly archive partitions for ended incidents."""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from incident_journal import write_json_atomic
+
+PARTITION_CACHE_SIZE = 3
+
+
+def parse_timestamp(value) -> datetime | None:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def incident_partition(incident: dict) -> str:
+    """Return the ``YYYY-MM`` partition an incident belongs to (by start time)."""
+
+    start = parse_timestamp(incident.get('start')) or parse_timestamp(incident.get('end'))
+    if start is None:
+        return 'undatiert'
+    return start.strftime('%Y-%m')
+
+
+def partitions_between(since: str | None, until: str | None, available: Iterable[str]) -> list[str]:
+    """Filter partition names to those that can contain incidents in ``[since, until)``.
+
+    ``undatiert`` comes first: incidents without a start sort before all
+    others, as they do in the SQLite backend.
+    """
+
+    first = since[:7] if since else None
+    last = until[:7] if until else None
+    selected = []
+    for name in sorted(available, key=lambda name: (name != 'undatiert', name)):
+        if name == 'undatiert':
+            if not since and not until:
+                selected.append(name)
+            continue
+        if first and name < first:
+            continue
+        if last and name > last:
+            continue
+        selected.append(name)
+    return selected
+
+
+def archive_candidates(incidents: Iterable[dict], *, older_than: timedelta, now: datetime | None = None) -> list[dict]:
+    """Return ended incidents whose end (or start) lies more than ``older_than`` in the past."""
+
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - older_than
+    candidates = []
+    for incident in incidents:
+        if incident.get('active'):
+            continue
+        ended = parse_timestamp(incident.get('end')) or parse_timestamp(incident.get('start'))
+        if ended is not None and ended <= cutoff:
+            candidates.append(incident)
+    return candidates
+
+
+class IncidentArchive:
+    """Ended incidents stored as one JSON file per month under ``directory``.
+
+    Partitions are only read when an archived incident or a history range is
+    requested; a small index maps incident ids to their partition.
+    """
+
+    INDEX_NAME = 'index.json'
+
+    def __init__(self, directory: Path, logger: logging.Logger | None = None) -> None:
+        self.directory = Path(directory)
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._index: dict[int, str] | None = None
+        self._partitions: OrderedDict[str, list[dict]] = OrderedDict()
+
+    def _partition_path(self, name: str) -> Path:
+        return self.directory / f'incidents-{name}.json'
+
+    def _load_index(self) -> dict[int, str]:
+        if self._index is None:
+            path = self.directory / self.INDEX_NAME
+            try:
+                with open(path, encoding='utf-8') as f:
+                    raw = json.load(f)
+                self._index = {int(inc_id): name for inc_id, name in raw.items()}
+            except (OSError, ValueError, AttributeError):
+                self._index = self._rebuild_index()
+        return self._index
+
+    def _rebuild_index(self) -> dict[int, str]:
+        index = {}
+        for path in sorted(self.directory.glob('incidents-*.json')):
+            name = path.stem[len('incidents-'):]
+            for incident in self._read_partition(name):
+                if isinstance(incident.get('id'), int):
+                    index[incident['id']] = name
+        return index
+
+    def _read_partition(self, name: str, *, cache: bool = True) -> list[dict]:
+        cached = self._partitions.get(name)
+        if cached is not None:
+            self._partitions.move_to_end(name)
+            return cached
+        path = self._partition_path(name)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = []
+        except (OSError, ValueError) as exc:
+            self.logger.error('Archivpartition %s konnte nicht gelesen werden: %s', path, exc)
+            data = []
+        data = [incident for incident in data if isinstance(incident, dict)] if isinstance(data, list) else []
+        if not cache:
+            return data
+        self._partitions[name] = data
+        while len(self._partitions) > PARTITION_CACHE_SIZE:
+            self._partitions.popitem(last=False)
+        return data
+
+    def add(self, incidents: Iterable[dict]) -> int:
+        """Write incidents into their monthly partitions; returns the number archived."""
+
+        by_partition: dict[str, list[dict]] = {}
+        for incident in incidents:
+            by_partition.setdefault(incident_partition(incident), []).append(incident)
+        if not by_partition:
+            return 0
+        with self._lock:
+            index = self._load_index()
+            for name, new_incidents in by_partition.items():
+                existing = list(self._read_partition(name))
+                positions = {inc.get('id'): i for i, inc in enumerate(existing)}
+                for incident in new_incidents:
+                    position = positions.get(incident.get('id'))
+                    if position is None:
+                        positions[incident.get('id')] = len(existing)
+                        existing.append(incident)
+                    else:
+                        existing[position] = incident
+                    if isinstance(incident.get('id'), int):
+                        index[incident['id']] = name
+                existing.sort(key=lambda inc: inc.get('start') or '')
+                write_json_atomic(self._partition_path(name), existing)
+                self._partitions[name] = existing
+            write_json_atomic(self.directory / self.INDEX_NAME, {str(k): v for k, v in index.items()}, indent=None)
+        return sum(len(items) for items in by_partition.values())
+
+    def get(self, inc_id: int) -> dict | None:
+        with self._lock:
+            name = self._load_index().get(inc_id)
+            if name is None:
+                return None
+            return next((inc for inc in self._read_partition(name) if inc.get('id') == inc_id), None)
+
+    def max_id(self) -> int:
+        with self._lock:
+            return max(self._load_index(), default=0)
+
+    def partitions(self) -> list[str]:
+        return sorted(path.stem[len('incidents-'):] for path in self.directory.glob('incidents-*.json'))
+
+    def query(self, *, since: str | None = None, until: str | None = None) -> list[dict]:
+        """Return archived incidents of all partitions overlapping ``[since, until)``."""
+
+        with self._lock:
+            result = []
+            for name in partitions_between(since, until, self.partitions()):
+                result.extend(self._read_partition(name))
+            return result
+
+    def iter_query(self, *, since: str | None = None, until: str | None = None) -> Iterator[dict]:
+        """Yield archived incidents of ``[since, until)`` partitions oldest month first.
+
+        Only one partition is held at a time and partitions read for this
+        walk do not displace the cached recent months.
+        """
+
+        for name in partitions_between(since, until, self.partitions()):
+            with self._lock:
+                partition = self._read_partition(name, cache=False)
+            yield from partition
+
+
+class IncidentArchiver:
+    """Background thread that periodically runs an archiving callback."""
+
+    def __init__(
+        self,
+        run: Callable[[], int],
+        logger: logging.Logger | None = None,
+        *,
+        interval: float = 900.0,
+    ) -> None:
+        self.run = run
+        self.logger = logger or logging.getLogger(__name__)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._worker, name='incident-archiver', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _worker(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                archived = self.run()
+            except Exception as exc:  # keep archiving on the next round
+                self.logger.error('Archivierung beendeter Einsätze fehlgeschlagen: %s', exc)
+                continue
+            if archived:
+                self.logger.info('%s beendete Einsätze archiviert', archived)
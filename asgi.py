@@ -0,0 +1,267 @@
+"""ASGI entry point for the alarm monitor (``uvicorn asgi:application``).
+
+The event stream and the upstream lookups (geocoding, location search,
+weather) run as coroutines on one event loop: an idle SSE client costs no
+thread, and a lookup only borrows one from the loop's executor for its HTTP
+request and cache access, so the loop itself never blocks. Every other route is passed to the Flask
+app through a small WSGI bridge on a bounded thread pool, so pages and the
+API behave exactly as under ``server.py``.
+
+The lookups are the generators from :mod:`app` driven by
+:func:`upstream.run_lookup_async`, so caching and parsing are shared with
+the threaded endpoints.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib import parse
+
+from werkzeug.datastructures import MultiDict
+
+import app as alarmmonitor
+from upstream import run_lookup_async
+
+WSGI_THREADS = int(os.environ.get('ALARMMONITOR_THREADS', '8'))
+
+
+class LoopWakeup:
+    """Wake every waiting stream of one event loop after a publish.
+
+    The broadcaster calls :meth:`notify` from the publishing thread; one
+    ``call_soon_threadsafe`` per publish wakes all streams on the loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # the loop is gone (server stopped); publishing must not fail
+            pass
+
+    def _wake(self) -> None:
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class WsgiBridge:
+    """Serve ASGI HTTP requests with a WSGI app on a thread pool."""
+
+    def __init__(self, wsgi_app, executor: ThreadPoolExecutor) -> None:
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+
+    @staticmethod
+    def environ(scope, body: bytes) -> dict:
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': _BytesInput(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for raw_name, raw_value in scope.get('headers', []):
+            name = raw_name.decode('latin-1').upper().replace('-', '_')
+            value = raw_value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    async def __call__(self, scope, receive, send) -> None:
+        body = b''
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+        environ = self.environ(scope, body)
+        result = await loop.run_in_executor(self.executor, self.wsgi_app, environ, start_response)
+        chunks = iter(result)
+        try:
+            # a generator may call start_response only with its first chunk
+            first = await loop.run_in_executor(self.executor, next, chunks, None)
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            chunk = first
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+
+class _BytesInput:
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+        self._pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = len(self._data) - self._pos
+        chunk = self._data[self._pos:self._pos + size]
+        self._pos += len(chunk)
+        return chunk
+
+    def readline(self, size: int = -1) -> bytes:
+        end = self._data.find(b'\n', self._pos)
+        end = len(self._data) if end < 0 else end + 1
+        if size is not None and size >= 0:
+            end = min(end, self._pos + size)
+        return self.read(end - self._pos)
+
+    def __iter__(self):
+        while line := self.readline():
+            yield line
+
+
+async def send_json(send, payload, status: int = 200) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def query_args(scope) -> MultiDict:
+    return MultiDict(parse.parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+
+
+def header(scope, name: bytes) -> str | None:
+    for raw_name, raw_value in scope.get('headers', []):
+        if raw_name.lower() == name:
+            return raw_value.decode('latin-1')
+    return None
+
+
+class AlarmmonitorASGI:
+    """Route the I/O-bound endpoints to coroutines and the rest to Flask."""
+
+    LOOKUPS = {
+        '/api/geocode/search': lambda args: alarmmonitor.geocode_search_lookup(args),
+        '/api/geocode/reverse': lambda args: alarmmonitor.reverse_geocode_address_lookup(args),
+        '/api/weather': lambda args: alarmmonitor.weather_lookup(),
+    }
+
+    def __init__(self, flask_app, broadcaster, *, threads: int = WSGI_THREADS) -> None:
+        self.broadcaster = broadcaster
+        self.bridge = WsgiBridge(flask_app, ThreadPoolExecutor(threads, thread_name_prefix='wsgi'))
+        self._wakeups: dict[asyncio.AbstractEventLoop, LoopWakeup] = {}
+
+    def wakeup(self) -> LoopWakeup:
+        loop = asyncio.get_running_loop()
+        wakeup = self._wakeups.get(loop)
+        if wakeup is None:
+            wakeup = self._wakeups[loop] = LoopWakeup(loop)
+            self.broadcaster.add_listener(wakeup.notify)
+        return wakeup
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        lookup = self.LOOKUPS.get(scope['path'])
+        if scope['method'] == 'GET' and lookup is not None:
+            payload, status = await run_lookup_async(lookup(query_args(scope)))
+            await send_json(send, payload, status)
+        elif scope['method'] == 'GET' and scope['path'] == '/events':
+            await self.events(scope, receive, send)
+        else:
+            await self.bridge(scope, receive, send)
+
+    async def lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.wakeup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # ends the open streams so the server can stop
+                self.broadcaster.close()
+                self.bridge.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def events(self, scope, receive, send) -> None:
+        last_event_id = header(scope, b'last-event-id') or query_args(scope).get('last_event_id')
+        stream = self.broadcaster.astream(last_event_id, self.wakeup().wait)
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+
+        async def forward():
+            async for frame in stream:
+                await send({'type': 'http.response.body', 'body': frame.encode('utf-8'), 'more_body': True})
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        sender = asyncio.ensure_future(forward())
+        watcher = asyncio.ensure_future(disconnected())
+        try:
+            await asyncio.wait((sender, watcher), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (sender, watcher):
+                task.cancel()
+            await asyncio.gather(sender, watcher, return_exceptions=True)
+            await stream.aclose()
+        if not watcher.done() or watcher.cancelled():
+            # the broadcaster was closed: end the response properly
+            await send({'type': 'http.response.body', 'body': b''})
+
+
+application = AlarmmonitorASGI(alarmmonitor.app, alarmmonitor.broadcaster)
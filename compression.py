@@ -0,0 +1,99 @@
+"""Negotiated gzip/Brotli compression for responses and static files."""
+
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # Brotli ist optional, ohne Paket wird nur gzip angeboten.
+    brotli = None  # type: ignore[assignment]
+
+# Bodies below this size are not worth the header overhead and CPU time.
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json',
+    'application/javascript',
+    'image/svg+xml',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+})
+STATIC_SUFFIXES = frozenset({'.css', '.js', '.svg', '.html', '.json', '.txt'})
+FILE_SUFFIX = {'br': '.br', 'gzip': '.gz'}
+
+
+def supported_encodings() -> tuple[str, ...]:
+    """Encodings in order of preference on equal client quality."""
+
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encodings, available=None) -> str | None:
+    """Pick the best encoding of ``available`` that the client accepts.
+
+    ``accept_encodings`` is werkzeug's ``request.accept_encodings``.
+    """
+
+    best = None
+    best_quality = 0
+    for encoding in supported_encodings():
+        if available is not None and encoding not in available:
+            continue
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    raise ValueError(encoding)
+
+
+def is_compressible(mimetype: str | None) -> bool:
+    return bool(mimetype) and mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def precompress_static(directory, logger: logging.Logger | None = None) -> dict[str, set[str]]:
+    """Write ``.gz``/``.br`` siblings for text assets that changed since the last run.
+
+    Returns the encodings available per file path relative to ``directory``
+    (with forward slashes, as used in static URLs).
+    """
+
+    logger = logger or logging.getLogger(__name__)
+    directory = Path(directory)
+    available: dict[str, set[str]] = {}
+    if not directory.is_dir():
+        return available
+    for path in directory.rglob('*'):
+        if not path.is_file() or path.suffix not in STATIC_SUFFIXES:
+            continue
+        try:
+            stat = path.stat()
+            if stat.st_size < COMPRESS_MIN_SIZE:
+                continue
+            data = None
+            encodings = set()
+            for encoding in supported_encodings():
+                target = path.with_name(path.name + FILE_SUFFIX[encoding])
+                if not target.exists() or target.stat().st_mtime < stat.st_mtime:
+                    if data is None:
+                        data = path.read_bytes()
+                    tmp_path = target.with_name(f'.{target.name}.tmp')
+                    tmp_path.write_bytes(compress(data, encoding))
+                    os.replace(tmp_path, target)
+                encodings.add(encoding)
+        except OSError as exc:
+            logger.warning('Statische Datei %s konnte nicht vorkomprimiert werden: %s', path, exc)
+            continue
+        available[path.relative_to(directory).as_posix()] = encodings
+    return available
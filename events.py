@@ -0,0 +1,207 @@
+"""Server-sent event helpers for the live pages."""
+
+from __future__ import annotations
+
+import itertools
+import json
+import threading
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Iterator
+
+EVENT_TYPES = (
+    'vehicle.updated',
+    'vehicle.removed',
+    'incident.updated',
+    'incident.alerted',
+    'incident.removed',
+    'incident.archived',
+    'templates.updated',
+    'priorities.updated',
+    'announcements.updated',
+    'settings.updated',
+    'stream.reset',
+)
+
+
+def event_collection(event_type: str) -> str:
+    """Return the collection whose revision an event carries (``vehicle.updated`` → ``vehicles``)."""
+
+    name = event_type.split('.', 1)[0]
+    return name if name.endswith('s') else f'{name}s'
+
+
+def format_event(event_type: str, data, *, revision: int | None = None, event_id: int | None = None) -> str:
+    """Serialise one SSE frame; ``data`` is sent as JSON together with the revision."""
+
+    payload = json.dumps(
+        {'type': event_type, 'revision': revision, 'data': data},
+        ensure_ascii=False,
+        separators=(',', ':'),
+    )
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {payload}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventBroadcaster:
+    """Fan out SSE frames through one bounded ring buffer.
+
+    Publishing appends to the ring and wakes all readers at once; no
+    per-client queue is filled on the publishing thread. Each connection
+    keeps a cursor into the ring, so a reconnecting browser can resume from
+    its ``Last-Event-ID``. A reader that fell out of the ring (a slow or
+    long disconnected client) receives one ``stream.reset`` event and has to
+    reload its state.
+    """
+
+    def __init__(self, prefix: str, *, capacity: int = 512, keepalive: float = 15.0) -> None:
+        self.prefix = prefix
+        self.capacity = capacity
+        self.keepalive = keepalive
+        self._ring: deque[str] = deque(maxlen=capacity)
+        self._last_id = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._listeners: list[Callable[[], None]] = []
+        self.subscribers = 0
+        self.resets = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def event_id(self, number: int) -> str:
+        return f'{self.prefix}-{number}'
+
+    def parse_event_id(self, value: str | None) -> int | None:
+        """Return the sequence number of an id from this process, else ``None``."""
+
+        if not value:
+            return None
+        prefix, _, number = value.strip().rpartition('-')
+        if prefix != self.prefix or not number.isdigit():
+            return None
+        return int(number)
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` (from the publishing thread) after every publish or close."""
+
+        with self._condition:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]) -> None:
+        with self._condition:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify_listeners(self) -> None:
+        with self._condition:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            callback()
+
+    def publish(self, frames: Iterable[str]) -> int:
+        """Append frames produced by :func:`format_event` (without id) and wake all readers."""
+
+        with self._condition:
+            for frame in frames:
+                self._last_id += 1
+                self._ring.append(f'id: {self.event_id(self._last_id)}\n{frame}')
+            self._condition.notify_all()
+            last_id = self._last_id
+        self._notify_listeners()
+        return last_id
+
+    def since(self, cursor: int) -> tuple[list[str], int, bool]:
+        """Return ``(frames, new_cursor, lagged)`` for everything after ``cursor``."""
+
+        with self._condition:
+            first = self._last_id - len(self._ring) + 1
+            if cursor + 1 < first:
+                return [], self._last_id, True
+            start = max(cursor + 1 - first, 0)
+            return list(itertools.islice(self._ring, start, None)), self._last_id, False
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._notify_listeners()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _start_cursor(self, last_event_id: str | None) -> tuple[int, bool]:
+        cursor = self.parse_event_id(last_event_id)
+        if cursor is None:
+            # unknown or from a previous process: the client reloads its state
+            return self._last_id, bool(last_event_id)
+        if cursor > self._last_id:
+            return self._last_id, True
+        return cursor, False
+
+    def stream(self, last_event_id: str | None = None) -> Iterator[str]:
+        """Yield SSE frames for one connection, replaying after ``last_event_id``."""
+
+        cursor, lagged = self._start_cursor(last_event_id)
+        with self._condition:
+            self.subscribers += 1
+        try:
+            # tell the browser how long to wait before reconnecting
+            yield 'retry: 3000\n\n'
+            while True:
+                if lagged:
+                    self.resets += 1
+                    # carries an id so the browser resumes from here on its next reconnect
+                    yield format_event('stream.reset', {}, event_id=self.event_id(cursor))
+                with self._condition:
+                    if self._last_id == cursor and not self._closed:
+                        self._condition.wait(self.keepalive)
+                    if self._closed:
+                        return
+                frames, cursor, lagged = self.since(cursor)
+                if frames:
+                    yield ''.join(frames)
+                elif not lagged:
+                    yield ': keepalive\n\n'
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+    async def astream(
+        self,
+        last_event_id: str | None,
+        wait: Callable[[float], Awaitable[None]],
+    ) -> AsyncIterator[str]:
+        """Async variant of :meth:`stream` for an event loop.
+
+        ``wait(timeout)`` has to return once :meth:`publish` or :meth:`close`
+        ran (see :meth:`add_listener`) or the timeout passed; the connection
+        then costs no thread while it is idle.
+        """
+
+        cursor, lagged = self._start_cursor(last_event_id)
+        with self._condition:
+            self.subscribers += 1
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                if lagged:
+                    self.resets += 1
+                    yield format_event('stream.reset', {}, event_id=self.event_id(cursor))
+                if self._last_id == cursor and not self._closed:
+                    await wait(self.keepalive)
+                if self._closed:
+                    return
+                frames, cursor, lagged = self.since(cursor)
+                if frames:
+                    yield ''.join(frames)
+                elif not lagged:
+                    yield ': keepalive\n\n'
+        finally:
+            with self._condition:
+                self.subscribers -= 1
@@ -0,0 +1,438 @@
+"""Offline address index (streets, house numbers, POIs) for the operation area.
+
+``python gazetteer.py import extract.osm`` reads an OpenStreetMap XML extract
+(optionally ``.gz``/``.bz2`` compressed) or a CSV file and writes
+``data/gazetteer.json``. The app loads it at startup and answers location
+search, forward and reverse geocoding from memory; Nominatim is only asked
+for what the extract does not contain.
+
+Search uses a prefix trie over the folded words of every place, reverse
+geocoding a grid of spatial buckets.
+"""
+
+from __future__ import annotations
+
+import argparse
+import bz2
+import csv
+import gzip
+import json
+import logging
+import math
+import re
+import unicodedata
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+DEFAULT_FILE = Path('data/gazetteer.json')
+FORMAT_VERSION = 1
+# Bucket edge in degrees (about 550 m north-south); reverse lookups search
+# the bucket of the point and its eight neighbours.
+BUCKET_SIZE = 0.005
+REVERSE_MAX_DISTANCE = 150.0
+KIND_ORDER = {'address': 0, 'poi': 1, 'street': 2}
+POI_KEYS = ('amenity', 'emergency', 'healthcare', 'shop', 'tourism', 'leisure', 'office', 'craft', 'historic', 'public_transport')
+CSV_FIELDS = ('kind', 'name', 'street', 'housenumber', 'postcode', 'city', 'lat', 'lon', 'category')
+_TOKEN_RE = re.compile(r'\w+')
+
+
+class Place(NamedTuple):
+    kind: str
+    name: str
+    street: str
+    housenumber: str
+    postcode: str
+    city: str
+    lat: float
+    lon: float
+    category: str = ''
+
+    @property
+    def display_name(self) -> str:
+        street = f'{self.street} {self.housenumber}'.strip()
+        town = f'{self.postcode} {self.city}'.strip()
+        if self.kind == 'street':
+            parts = (self.name, town)
+        elif self.kind == 'poi':
+            parts = (self.name, street, town)
+        else:
+            parts = (street, town)
+        return ', '.join(part for part in parts if part)
+
+    def as_result(self) -> dict:
+        """Return the place in the shape of the location search results."""
+
+        if self.kind == 'address':
+            label, category, kind = f'{self.street} {self.housenumber}'.strip(), 'place', 'house'
+        else:
+            # OSM places carry "key=value" (amenity=pharmacy), CSV rows free text
+            category, _, kind = self.category.rpartition('=')
+            label, category = self.name, category or ('highway' if self.kind == 'street' else 'poi')
+        return {
+            'name': label,
+            'display_name': self.display_name,
+            'lat': self.lat,
+            'lon': self.lon,
+            'type': kind or self.kind,
+            'category': category,
+        }
+
+
+def fold(text) -> str:
+    """Case-fold and strip accents, so ``Mühlweg`` matches ``muhlweg``."""
+
+    decomposed = unicodedata.normalize('NFKD', str(text or '').casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text) -> list[str]:
+    return _TOKEN_RE.findall(fold(text))
+
+
+def _distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Approximate distance in metres; exact enough within one district."""
+
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371000.0 * math.hypot(x, y)
+
+
+def _is_postcode(token: str) -> bool:
+    return len(token) == 5 and token.isdigit()
+
+
+class _TrieNode:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.ids: list[int] = []
+
+
+class Gazetteer:
+    """In-memory index over :class:`Place` entries."""
+
+    def __init__(self, places: Iterable[Place] = (), *, source: str = '', imported: str | None = None) -> None:
+        self.places: list[Place] = []
+        self.source = source
+        self.imported = imported
+        self._tokens: list[frozenset[str]] = []
+        # words of the name and street, without house number and town
+        self._labels: list[frozenset[str]] = []
+        self._root = _TrieNode()
+        self._buckets: dict[tuple[int, int], list[int]] = {}
+        for place in places:
+            self.add(place)
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def add(self, place: Place) -> None:
+        index = len(self.places)
+        self.places.append(place)
+        tokens = frozenset(tokenize(' '.join((place.name, place.street, place.housenumber, place.postcode, place.city))))
+        self._tokens.append(tokens)
+        self._labels.append(frozenset(tokenize(f'{place.name} {place.street}')))
+        for token in tokens:
+            node = self._root
+            for char in token:
+                node = node.children.setdefault(char, _TrieNode())
+            node.ids.append(index)
+        if place.kind != 'street':
+            self._buckets.setdefault(self._bucket(place.lat, place.lon), []).append(index)
+
+    @staticmethod
+    def _bucket(lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / BUCKET_SIZE), math.floor(lon / BUCKET_SIZE)
+
+    def _node(self, prefix: str) -> _TrieNode | None:
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _matching(self, token: str, prefix: bool) -> set[int]:
+        node = self._node(token)
+        if node is None:
+            return set()
+        if not prefix:
+            return set(node.ids)
+        found: set[int] = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            found.update(node.ids)
+            stack.extend(node.children.values())
+        return found
+
+    def _candidates(self, tokens: list[str], *, exact_numbers: bool) -> set[int]:
+        sets = [self._matching(token, not (exact_numbers and token[0].isdigit())) for token in tokens]
+        sets.sort(key=len)
+        if not sets:
+            return set()
+        candidates = sets[0]
+        for other in sets[1:]:
+            candidates = candidates & other
+            if not candidates:
+                break
+        return candidates
+
+    def _rank(self, candidates: set[int], tokens: list[str], near: tuple[float, float] | None, numbered: bool):
+        def key(index: int):
+            place = self.places[index]
+            exact = sum(token in self._tokens[index] for token in tokens)
+            kind = KIND_ORDER.get(place.kind, 3)
+            if not numbered:
+                # without a house number the street itself is the best answer
+                kind = -kind if place.kind == 'street' else kind
+            distance = _distance(near[0], near[1], place.lat, place.lon) if near else 0.0
+            return (-exact, kind, len(self._tokens[index]), distance)
+
+        return sorted(candidates, key=key)
+
+    def search(self, query: str, limit: int = 5, *, near: tuple[float, float] | None = None) -> list[dict]:
+        """Return up to ``limit`` places whose words start with the query words."""
+
+        tokens = tokenize(query)
+        if not tokens or not self.places:
+            return []
+        candidates = self._candidates(tokens, exact_numbers=False)
+        numbered = any(token[0].isdigit() for token in tokens)
+        return [self.places[index].as_result() for index in self._rank(candidates, tokens, near, numbered)[:limit]]
+
+    def geocode(self, address: str, *, near: tuple[float, float] | None = None) -> tuple[float, float] | None:
+        """Return the coordinates of ``address`` if every word of it is known.
+
+        House numbers and postcodes must match exactly; an address with a
+        house number is never answered with the street alone.
+        """
+
+        tokens = tokenize(address)
+        if not tokens or not self.places:
+            return None
+        words = [token for token in tokens if not token[0].isdigit()]
+        numbered = any(token[0].isdigit() and not _is_postcode(token) for token in tokens)
+        candidates = {
+            index
+            for index in self._candidates(tokens, exact_numbers=True)
+            # "Lich" alone must not pick some street in Lich
+            if any(label.startswith(word) for word in words for label in self._labels[index])
+            and not (numbered and self.places[index].kind == 'street')
+        }
+        ranked = self._rank(candidates, tokens, near, numbered)
+        if not ranked:
+            return None
+        place = self.places[ranked[0]]
+        return place.lat, place.lon
+
+    def reverse(self, lat: float, lon: float, *, max_distance: float = REVERSE_MAX_DISTANCE) -> str | None:
+        """Return the display name of the nearest address or POI within ``max_distance`` metres."""
+
+        row, col = self._bucket(lat, lon)
+        best, best_distance = None, max_distance
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                for index in self._buckets.get((row + d_row, col + d_col), ()):
+                    place = self.places[index]
+                    distance = _distance(lat, lon, place.lat, place.lon)
+                    if distance <= best_distance:
+                        best, best_distance = place, distance
+        return best.display_name if best else None
+
+    def stats(self) -> dict:
+        counts = dict.fromkeys(KIND_ORDER, 0)
+        for place in self.places:
+            counts[place.kind] = counts.get(place.kind, 0) + 1
+        return {'entries': len(self.places), **counts, 'source': self.source, 'imported': self.imported}
+
+    def save(self, path: Path = DEFAULT_FILE) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': FORMAT_VERSION,
+            'source': self.source,
+            'imported': self.imported,
+            'places': [list(place) for place in self.places],
+        }
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_FILE, logger: logging.Logger | None = None) -> Gazetteer:
+        """Load an imported index; a missing or unreadable file gives an empty one."""
+
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+            if data.get('version') != FORMAT_VERSION:
+                raise ValueError(f"Version {data.get('version')} wird nicht unterstützt")
+            places = [Place(*row) for row in data['places']]
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            (logger or logging.getLogger(__name__)).error('Adressindex %s konnte nicht geladen werden: %s', path, exc)
+            return cls()
+        return cls(places, source=data.get('source') or '', imported=data.get('imported'))
+
+
+def _open_text(path: Path):
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rb')
+    if path.suffix == '.bz2':
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def read_csv(path: Path, *, city: str = '') -> Iterator[Place]:
+    """Read places from a CSV file with a header of :data:`CSV_FIELDS` (``lat``/``lon`` required)."""
+
+    with open(path, encoding='utf-8-sig', newline='') as handle:
+        sample = handle.read(4096)
+        handle.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        for row in csv.DictReader(handle, dialect=dialect):
+            values = {field: (row.get(field) or '').strip() for field in CSV_FIELDS}
+            try:
+                lat, lon = float(values['lat'].replace(',', '.')), float(values['lon'].replace(',', '.'))
+            except ValueError:
+                continue
+            kind = values['kind']
+            if kind not in KIND_ORDER:
+                if values['housenumber'] and not values['category']:
+                    kind = 'address'
+                elif values['category'] or (values['name'] and values['street']):
+                    kind = 'poi'
+                else:
+                    kind = 'street'
+            if kind == 'street' and not values['name']:
+                values['name'] = values['street']
+            yield Place(
+                kind,
+                values['name'],
+                values['street'],
+                values['housenumber'],
+                values['postcode'],
+                values['city'] or city,
+                lat,
+                lon,
+                values['category'],
+            )
+
+
+def _tags(element) -> dict[str, str]:
+    return {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+
+
+def _places_for(tags: dict, lat: float, lon: float, city: str, *, way: bool) -> Iterator[Place]:
+    street = tags.get('addr:street') or tags.get('addr:place') or ''
+    housenumber = tags.get('addr:housenumber') or ''
+    postcode = tags.get('addr:postcode') or ''
+    town = tags.get('addr:city') or city
+    category = next((key for key in POI_KEYS if key in tags), '')
+    if way and tags.get('highway') and tags.get('name'):
+        yield Place('street', tags['name'], tags['name'], '', postcode, town, lat, lon, f"highway={tags['highway']}")
+        return
+    if category and tags.get('name'):
+        yield Place('poi', tags['name'], street, housenumber, postcode, town, lat, lon, f'{category}={tags[category]}')
+    if street and housenumber:
+        yield Place('address', '', street, housenumber, postcode, town, lat, lon)
+
+
+def _wanted_way(tags: dict) -> bool:
+    return bool(
+        (tags.get('highway') and tags.get('name'))
+        or tags.get('addr:housenumber')
+        or (tags.get('name') and any(key in tags for key in POI_KEYS))
+    )
+
+
+def read_osm(path: Path, *, city: str = '') -> Iterator[Place]:
+    """Read places from an OSM XML extract.
+
+    The file is read twice: first to find the nodes used by named streets and
+    addressed buildings, then to collect their coordinates and the tagged
+    nodes. Ways are placed at the centre of their nodes; a street split into
+    several ways is returned once per ~1 km.
+    """
+
+    wanted: set[str] = set()
+    with _open_text(path) as handle:
+        for _, element in ET.iterparse(handle):
+            if element.tag == 'way':
+                if _wanted_way(_tags(element)):
+                    wanted.update(nd.get('ref') for nd in element.iter('nd'))
+                element.clear()
+            elif element.tag in ('node', 'relation'):
+                element.clear()
+
+    coordinates: dict[str, tuple[float, float]] = {}
+    streets: set[tuple[str, float, float]] = set()
+    with _open_text(path) as handle:
+        for _, element in ET.iterparse(handle):
+            if element.tag == 'node':
+                lat, lon = float(element.get('lat')), float(element.get('lon'))
+                if element.get('id') in wanted:
+                    coordinates[element.get('id')] = (lat, lon)
+                tags = _tags(element)
+                if tags:
+                    yield from _places_for(tags, lat, lon, city, way=False)
+                element.clear()
+            elif element.tag == 'way':
+                tags = _tags(element)
+                points = [coordinates[nd.get('ref')] for nd in element.iter('nd') if nd.get('ref') in coordinates]
+                element.clear()
+                if not points or not _wanted_way(tags):
+                    continue
+                lat = sum(point[0] for point in points) / len(points)
+                lon = sum(point[1] for point in points) / len(points)
+                if tags.get('highway'):
+                    key = (tags['name'], round(lat, 2), round(lon, 2))
+                    if key in streets:
+                        continue
+                    streets.add(key)
+                yield from _places_for(tags, lat, lon, city, way=True)
+            elif element.tag == 'relation':
+                element.clear()
+
+
+def import_file(path: Path, *, city: str = '') -> Gazetteer:
+    path = Path(path)
+    name = path.name.lower()
+    if name.endswith(('.osm.pbf', '.pbf')):
+        raise ValueError('PBF wird nicht unterstützt; bitte z. B. mit "osmium cat datei.osm.pbf -o datei.osm" umwandeln.')
+    if name.endswith(('.csv', '.txt')):
+        places = read_csv(path, city=city)
+    else:
+        places = read_osm(path, city=city)
+    imported = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    return Gazetteer(places, source=path.name, imported=imported)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Adressindex für den Einsatzbereich verwalten')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    importer = subparsers.add_parser('import', help='OSM-XML- oder CSV-Auszug einlesen')
+    importer.add_argument('source', type=Path)
+    importer.add_argument('--city', default='', help='Ort für Straßen und Adressen ohne addr:city')
+    importer.add_argument('--output', type=Path, default=DEFAULT_FILE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    try:
+        gazetteer = import_file(args.source, city=args.city)
+    except (OSError, ValueError, ET.ParseError, csv.Error) as exc:
+        parser.error(str(exc))
+    gazetteer.save(args.output)
+    stats = gazetteer.stats()
+    print(f"{stats['street']} Straßen, {stats['address']} Adressen, {stats['poi']} Orte nach {args.output} geschrieben.")
+    print('Der Alarmmonitor lädt den Index beim nächsten Start.')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
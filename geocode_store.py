@@ -0,0 +1,186 @@
+"""Persistent geocoding cache shared by forward, reverse and search lookups.
+
+Nominatim answers are kept in a small SQLite database next to the other data
+files, so they survive service restarts and ``update.sh``. Entries expire
+after a TTL; expired entries stay on disk as a fallback for when the uplink
+is down and are only dropped by the size limit, least recently used first.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable
+
+DEFAULT_DB_FILE = Path('data/geocode.db')
+DEFAULT_MAX_ENTRIES = 5000
+# Reads refresh ``used`` at most this often, so hits rarely write.
+TOUCH_INTERVAL = 3600.0
+KINDS = frozenset({'forward', 'reverse', 'search'})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_geocode_used ON geocode (used);
+"""
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def forward_key(address) -> str | None:
+    """Return the cache key of a forward lookup, ``None`` for an empty address."""
+
+    if not isinstance(address, str):
+        return None
+    normalised = ' '.join(address.split())
+    return normalised.lower() or None
+
+
+def reverse_key(lat: float, lon: float) -> str:
+    return f'{round(lat, 5):.5f},{round(lon, 5):.5f}'
+
+
+def search_key(query: str, limit: int) -> str:
+    return f'{limit}:{query.lower()}'
+
+
+class GeocodeStore:
+    """SQLite cache of geocoding results with TTL and size-based eviction.
+
+    Times are wall-clock seconds because they have to stay meaningful across
+    restarts. Values are stored as JSON, so tuples come back as lists.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = DEFAULT_DB_FILE,
+        *,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        logger: logging.Logger | None = None,
+        clock=time.time,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.logger = logger or logging.getLogger(__name__)
+        self.clock = clock
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._count = self._conn.execute('SELECT COUNT(*) FROM geocode').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, kind: str, key: str, *, stale: bool = False):
+        """Return ``(value, found)``; with ``stale`` expired entries count as found."""
+
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires, used FROM geocode WHERE kind = ? AND key = ?',
+                (kind, key),
+            ).fetchone()
+            if row is None:
+                return None, False
+            value, expires, used = row
+            if expires <= now and not stale:
+                return None, False
+            if now - used >= TOUCH_INTERVAL:
+                self._conn.execute(
+                    'UPDATE geocode SET used = ? WHERE kind = ? AND key = ?',
+                    (now, kind, key),
+                )
+        return json.loads(value), True
+
+    def set(self, kind: str, key: str, value, ttl: float) -> None:
+        now = self.clock()
+        with self._lock:
+            exists = self._conn.execute(
+                'SELECT 1 FROM geocode WHERE kind = ? AND key = ?',
+                (kind, key),
+            ).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO geocode (kind, key, value, expires, used) VALUES (?, ?, ?, ?, ?)',
+                (kind, key, _dumps(value), now + ttl, now),
+            )
+            if not exists:
+                self._count += 1
+                self._evict()
+
+    def warm(self, entries: Iterable[tuple[str, str, object]], ttl: float) -> int:
+        """Add ``(kind, key, value)`` entries that are not cached yet.
+
+        Known answers from Nominatim are never overwritten. Returns the number
+        of added entries.
+        """
+
+        now = self.clock()
+        rows = [(kind, key, _dumps(value), now + ttl, now) for kind, key, value in entries if key]
+        if not rows:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO geocode (kind, key, value, expires, used) VALUES (?, ?, ?, ?, ?)',
+                    rows,
+                )
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            added = self._conn.total_changes - before
+            self._count += added
+            self._evict()
+        return added
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM geocode')
+            self._count = 0
+
+    def stats(self) -> dict:
+        now = self.clock()
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT kind, COUNT(*), SUM(expires <= ?) FROM geocode GROUP BY kind',
+                (now,),
+            ).fetchall()
+        return {
+            'entries': self._count,
+            'max_entries': self.max_entries,
+            'kinds': {kind: {'entries': count, 'expired': expired or 0} for kind, count, expired in rows},
+        }
+
+    def _evict(self) -> None:
+        # Called with the lock held. Trims a tenth more than necessary so a
+        # full cache does not run a DELETE on every insert.
+        if self._count <= self.max_entries:
+            return
+        excess = self._count - self.max_entries + max(1, self.max_entries // 10)
+        cursor = self._conn.execute(
+            'DELETE FROM geocode WHERE (kind, key) IN (SELECT kind, key FROM geocode ORDER BY used LIMIT ?)',
+            (excess,),
+        )
+        self._count -= cursor.rowcount
+        self.logger.info('Geocoding-Cache: %d alte Einträge entfernt', cursor.rowcount)
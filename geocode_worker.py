@@ -0,0 +1,95 @@
+"""Background geocoding so that requests never wait on Nominatim.
+
+Callers submit a lookup for a *target* (an incident, a unit, the operation
+area) together with a callback that applies the result. Only the most recent
+lookup of a target is applied: if the location changes again while the first
+lookup is still running, its result is dropped.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from typing import Callable, Hashable
+
+Apply = Callable[[object], None]
+
+_STOP = object()
+
+
+class GeocodeWorker:
+    """Thread pool that runs lookups and hands their results to callbacks."""
+
+    def __init__(self, logger: logging.Logger | None = None, *, workers: int = 2) -> None:
+        self.logger = logger or logging.getLogger(__name__)
+        self.workers = workers
+        self._queue: queue.Queue = queue.Queue()
+        self._latest: dict[Hashable, int] = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stopping = False
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'geocode-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        # results of lookups still running are dropped
+        self._stopping = True
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def submit(self, target: Hashable, lookup: Callable[[], object], apply: Apply) -> None:
+        """Run ``lookup()`` in the background and pass its result to ``apply``."""
+
+        with self._lock:
+            self._sequence += 1
+            self._latest[target] = self._sequence
+            self._queue.put((target, self._sequence, lookup, apply))
+
+    def pending(self, target: Hashable) -> bool:
+        with self._lock:
+            return target in self._latest
+
+    def join(self) -> None:
+        """Wait until every submitted lookup has been applied (used by tests)."""
+
+        self._queue.join()
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+                self._run(*job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, target, sequence, lookup, apply) -> None:
+        with self._lock:
+            if self._stopping or self._latest.get(target) != sequence:
+                return
+        try:
+            result = lookup()
+        except Exception:
+            self.logger.exception('Geocoding für %s fehlgeschlagen', target)
+            result = None
+        with self._lock:
+            if self._stopping or self._latest.get(target) != sequence:
+                return
+            del self._latest[target]
+        try:
+            apply(result)
+        except Exception:
+            self.logger.exception('Geocoding-Ergebnis für %s konnte nicht übernommen werden', target)
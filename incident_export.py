@@ -0,0 +1,96 @@
+"""Streaming NDJSON/CSV export of the incident history."""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Iterable, Iterator
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+CSV_COLUMNS = (
+    'incident_id',
+    'start',
+    'end',
+    'active',
+    'keyword',
+    'priority',
+    'location',
+    'lat',
+    'lon',
+    'patient',
+    'vehicles',
+    'log_time',
+    'log_unit',
+    'log_status',
+)
+# Rows per yielded chunk: small enough to keep memory flat, large enough
+# that the chunked transfer does not send one tiny frame per line.
+CHUNK_ROWS = 64
+
+
+def _location(incident: dict) -> dict:
+    location = incident.get('location')
+    if isinstance(location, dict):
+        return location
+    return {'name': location or '', 'lat': incident.get('lat'), 'lon': incident.get('lon')}
+
+
+def export_ndjson(incidents: Iterable[dict], *, chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """Yield one JSON object per line, each incident with its notes and log."""
+
+    lines = []
+    for incident in incidents:
+        lines.append(json.dumps(incident, ensure_ascii=False, separators=(',', ':')))
+        if len(lines) >= chunk_rows:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def csv_rows(incident: dict) -> Iterator[tuple]:
+    """Return one row per log entry (or one row without log fields)."""
+
+    location = _location(incident)
+    base = (
+        incident.get('id'),
+        incident.get('start') or '',
+        incident.get('end') or '',
+        1 if incident.get('active') else 0,
+        incident.get('keyword') or '',
+        incident.get('priority') or '',
+        location.get('name') or '',
+        '' if location.get('lat') is None else location.get('lat'),
+        '' if location.get('lon') is None else location.get('lon'),
+        incident.get('patient') or '',
+        ' '.join(unit for unit in incident.get('vehicles') or [] if unit),
+    )
+    entries = [entry for entry in incident.get('log') or [] if isinstance(entry, dict)]
+    if not entries:
+        yield base + ('', '', '')
+        return
+    for entry in entries:
+        yield base + (entry.get('time') or '', entry.get('unit') or '', entry.get('status', ''))
+
+
+def export_csv(incidents: Iterable[dict], *, chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """Yield CSV text with a header and one row per incident log entry."""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
+    for incident in incidents:
+        for row in csv_rows(incident):
+            writer.writerow(row)
+            rows += 1
+        if rows >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
@@ -0,0 +1,303 @@
+"""In-memory lookup structures derived from the incident list."""
+
+from __future__ import annotations
+
+import base64
+import json
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from incident_search import IncidentSearchIndex
+from storage import incident_units
+
+ALARM_STATUS = 'alarmiert'
+
+
+@dataclass
+class UnitLogState:
+    """What the incident log says about one unit."""
+
+    first_alarm: str | None = None
+    alerted: bool = False
+    last_status: object = None
+    status_times: dict = field(default_factory=dict)
+
+    def apply(self, entry: dict) -> None:
+        status = entry.get('status')
+        time = entry.get('time')
+        if status == ALARM_STATUS and not self.alerted:
+            self.alerted = True
+            self.first_alarm = time
+        self.last_status = status
+        self.status_times[str(status)] = time
+
+    def as_dict(self) -> dict:
+        return {
+            'first_alarm': self.first_alarm,
+            'last_status': self.last_status,
+            'status_times': dict(self.status_times),
+        }
+
+
+class IncidentLogState:
+    """Per-unit states folded from an incident log, advanced by appended entries only."""
+
+    def __init__(self, log: list) -> None:
+        self.log = log
+        self.seen = 0
+        self.units: dict[str, UnitLogState] = {}
+
+    def advance(self) -> 'IncidentLogState':
+        for entry in self.log[self.seen:]:
+            if isinstance(entry, dict) and entry.get('unit'):
+                self.units.setdefault(entry['unit'], UnitLogState()).apply(entry)
+        self.seen = len(self.log)
+        return self
+
+
+class IdSequence:
+    """Monotonic incident id allocator.
+
+    ``last`` is persisted together with the incidents; ``saved`` remembers
+    the value that was last written so unchanged sequences are not rewritten.
+    """
+
+    def __init__(self, last: int = 0) -> None:
+        self.last = last
+        self.saved = last
+
+    def allocate(self, floor: int = 0) -> int:
+        """Return a new id above both the sequence and ``floor``."""
+
+        self.last = max(self.last, floor) + 1
+        return self.last
+
+
+def encode_cursor(position: tuple[str, int]) -> str:
+    """Return an opaque paging cursor for the ``(start, id)`` of the last returned incident."""
+
+    raw = json.dumps(list(position), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        start, inc_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (TypeError, ValueError):
+        raise ValueError('Ungültiger Cursor') from None
+    if not isinstance(start, str) or not isinstance(inc_id, int):
+        raise ValueError('Ungültiger Cursor')
+    return start, inc_id
+
+
+def _timeline_key(incident: dict, key: int) -> tuple[str, int, int]:
+    inc_id = incident.get('id')
+    return (incident.get('start') or '', inc_id if isinstance(inc_id, int) else 0, key)
+
+
+class IncidentIndex:
+    """Look up incidents by id and map units to the active incidents they are bound to.
+
+    The index is updated incrementally whenever a mutator reports a changed
+    or removed incident. :meth:`sync` rebuilds it when the incident list was
+    replaced or grew/shrank behind its back (e.g. after loading), so lookups
+    never return stale bindings.
+    """
+
+    def __init__(self, search: IncidentSearchIndex | None = None) -> None:
+        self.search = search
+        self._source: list[dict] | None = None
+        # keyed by object identity so that legacy duplicate ids do not collide
+        self._tracked: dict[int, dict] = {}
+        self._units_of: dict[int, tuple[str, ...]] = {}
+        self._by_id: dict[int, list[dict]] = {}
+        self.max_id = 0
+        self._active: dict[int, dict] = {}
+        self._by_unit: dict[str, dict[int, dict]] = {}
+        self._log_states: dict[int, IncidentLogState] = {}
+        # (start, id, key) in ascending start order
+        self._timeline: list[tuple[str, int, int]] = []
+        self._timeline_keys: dict[int, tuple[str, int, int]] = {}
+
+    def sync(self, incidents: list[dict]) -> 'IncidentIndex':
+        if self._source is not incidents or len(self._tracked) != len(incidents):
+            self.rebuild(incidents)
+        return self
+
+    def rebuild(self, incidents: list[dict]) -> None:
+        self._source = incidents
+        self._tracked = {}
+        self._units_of = {}
+        self._by_id = {}
+        self.max_id = 0
+        self._active = {}
+        self._by_unit = {}
+        self._log_states = {}
+        self._timeline = []
+        self._timeline_keys = {}
+        if self.search is not None:
+            self.search.clear_loaded()
+        for incident in incidents:
+            self.update(incident)
+
+    def update(self, incident: dict) -> None:
+        """Re-index an added or modified incident."""
+
+        key = id(incident)
+        if key not in self._tracked:
+            self._tracked[key] = incident
+            inc_id = incident.get('id')
+            # ids are unique once loaded (see renumber_duplicate_ids); the first one wins otherwise
+            self._by_id.setdefault(inc_id, []).append(incident)
+            if isinstance(inc_id, int) and inc_id > self.max_id:
+                self.max_id = inc_id
+        self.log_state(incident)
+        position = _timeline_key(incident, key)
+        if self._timeline_keys.get(key) != position:
+            self._drop_from_timeline(key)
+            insort(self._timeline, position)
+            self._timeline_keys[key] = position
+        if self.search is not None:
+            self.search.add(incident)
+        self._unbind(key)
+        if not incident.get('active'):
+            return
+        self._active[key] = incident
+        units = tuple(dict.fromkeys(incident.get('vehicles') or []))
+        self._units_of[key] = units
+        for unit in units:
+            self._by_unit.setdefault(unit, {})[key] = incident
+
+    def remove(self, incident: dict) -> None:
+        key = id(incident)
+        if self._tracked.pop(key, None) is None:
+            return
+        same_id = self._by_id.get(incident.get('id'), [])
+        same_id[:] = [other for other in same_id if other is not incident]
+        if not same_id:
+            self._by_id.pop(incident.get('id'), None)
+        self._log_states.pop(key, None)
+        self._drop_from_timeline(key)
+        if self.search is not None:
+            self.search.discard(incident.get('id'))
+        self._unbind(key)
+
+    def _drop_from_timeline(self, key: int) -> None:
+        position = self._timeline_keys.pop(key, None)
+        if position is None:
+            return
+        i = bisect_left(self._timeline, position)
+        if i < len(self._timeline) and self._timeline[i] == position:
+            del self._timeline[i]
+
+    def _unbind(self, key: int) -> None:
+        self._active.pop(key, None)
+        for unit in self._units_of.pop(key, ()):
+            bound = self._by_unit.get(unit)
+            if bound is None:
+                continue
+            bound.pop(key, None)
+            if not bound:
+                del self._by_unit[unit]
+
+    def log_state(self, incident: dict) -> IncidentLogState:
+        """Return the per-unit log state of ``incident``, folding in new log entries."""
+
+        log = incident.get('log')
+        if not isinstance(log, list):
+            log = []
+        key = id(incident)
+        state = self._log_states.get(key)
+        if state is None or state.log is not log or state.seen > len(log):
+            state = IncidentLogState(log)
+            if key in self._tracked:
+                self._log_states[key] = state
+        return state.advance()
+
+    def unit_state(self, incident: dict, unit: str) -> UnitLogState | None:
+        return self.log_state(incident).units.get(unit)
+
+    def newest_first(
+        self,
+        *,
+        since: str | None = None,
+        until: str | None = None,
+        before: tuple[str, int] | None = None,
+    ) -> Iterator[dict]:
+        """Yield incidents with ``since <= start < until`` (and before ``before``), newest first."""
+
+        lo = bisect_left(self._timeline, (since,)) if since else 0
+        hi = bisect_left(self._timeline, (until,)) if until else len(self._timeline)
+        if before is not None:
+            hi = min(hi, bisect_left(self._timeline, before))
+        for i in range(hi - 1, lo - 1, -1):
+            yield self._tracked[self._timeline[i][2]]
+
+    def query(
+        self,
+        *,
+        active: bool | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        unit: str | None = None,
+        priority: str | None = None,
+        limit: int = 200,
+        cursor: str | None = None,
+    ) -> tuple[list[dict], str | None]:
+        """Return one page of matching incidents, newest first, and the cursor of the next page."""
+
+        before = decode_cursor(cursor) if cursor else None
+        if active:
+            # only the few active incidents need to be ordered
+            candidates = sorted(
+                (inc for key, inc in self._active.items() if key in self._timeline_keys),
+                key=lambda inc: self._timeline_keys[id(inc)],
+                reverse=True,
+            )
+            candidates = [
+                inc
+                for inc in candidates
+                if (not since or (inc.get('start') or '') >= since)
+                and (not until or (inc.get('start') or '') < until)
+                and (before is None or self._timeline_keys[id(inc)][:2] < before)
+            ]
+        else:
+            candidates = self.newest_first(since=since, until=until, before=before)
+        page = []
+        for incident in candidates:
+            if active is False and incident.get('active'):
+                continue
+            if priority is not None and (incident.get('priority') or '') != priority:
+                continue
+            if unit is not None and unit not in incident_units(incident):
+                continue
+            if len(page) == limit:
+                return page, encode_cursor(self._timeline_keys[id(page[-1])][:2])
+            page.append(incident)
+        return page, None
+
+    def get(self, inc_id: int) -> dict | None:
+        matches = self._by_id.get(inc_id)
+        return matches[0] if matches else None
+
+    def active_incidents(self) -> list[dict]:
+        return list(self._active.values())
+
+    def active_incidents_for_unit(self, unit: str) -> list[dict]:
+        return list(self._by_unit.get(unit, {}).values())
+
+    def active_incident_for_unit(self, unit: str) -> dict | None:
+        return next(iter(self._by_unit.get(unit, {}).values()), None)
+
+    def unit_is_bound(self, unit: str, *, exclude: dict | None = None) -> bool:
+        """Return whether ``unit`` belongs to an active incident other than ``exclude``."""
+
+        bound = self._by_unit.get(unit)
+        if not bound:
+            return False
+        return any(key != id(exclude) for key in bound)
+
+    def bound_units(self) -> Iterable[str]:
+        return self._by_unit.keys()
@@ -0,0 +1,286 @@
+"""Append-only journal storage for the incident history."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Iterable
+
+
+def _compact_json(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def _has_duplicate_ids(incidents: list) -> bool:
+    ids = [inc.get('id') for inc in incidents if isinstance(inc, dict)]
+    return len(set(ids)) != len(ids) or not all(isinstance(i, int) for i in ids)
+
+
+def write_json_atomic(path: Path, data, *, indent: int | None = 2, fsync: bool = False) -> None:
+    """Write ``data`` to a temporary file next to ``path`` and rename it into place."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def renumber_duplicate_ids(incidents: list, next_id: int, logger: logging.Logger) -> int:
+    """Give incidents with an invalid or already taken id a fresh id from ``next_id``.
+
+    The first incident keeps a shared id, the way older code found it by a
+    linear search. ``incidents`` is updated in place; returns the number of
+    renumbered incidents.
+    """
+
+    seen = set()
+    renumbered = 0
+    for index, incident in enumerate(incidents):
+        if not isinstance(incident, dict):
+            continue
+        inc_id = incident.get('id')
+        if not isinstance(inc_id, int) or inc_id in seen:
+            logger.warning('Einsatz-ID %r doppelt oder ungültig, neu vergeben als %s', inc_id, next_id)
+            incident = incidents[index] = dict(incident, id=next_id)
+            next_id += 1
+            renumbered += 1
+        seen.add(incident['id'])
+    return renumbered
+
+
+class IncidentJournal:
+    """Incident snapshot plus an append-only change journal.
+
+    Every mutation appends one compact JSON line to the journal instead of
+    rewriting the whole snapshot. Loading replays the journal on top of the
+    snapshot; a background compactor folds the journal back into the snapshot
+    so that startup stays fast as well.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: Path,
+        journal_path: Path | None = None,
+        logger: logging.Logger | None = None,
+        *,
+        compact_interval: float = 300.0,
+        compact_threshold: int = 500,
+    ) -> None:
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = Path(journal_path) if journal_path else self.snapshot_path.with_suffix('.journal')
+        self.logger = logger or logging.getLogger(__name__)
+        self.compact_interval = compact_interval
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+        self._snapshot_provider: Callable[[], list] | None = None
+        self._snapshot_lock = threading.Lock()
+        self._tail_checked = False
+        self._records = self._count_records()
+
+    @staticmethod
+    def put_record(incident: dict) -> dict:
+        return {'op': 'put', 'incident': incident}
+
+    @staticmethod
+    def delete_record(inc_id) -> dict:
+        return {'op': 'delete', 'id': inc_id}
+
+    @property
+    def pending_records(self) -> int:
+        """Number of journal records not yet folded into the snapshot."""
+
+        return self._records
+
+    def _count_records(self) -> int:
+        try:
+            with open(self.journal_path, encoding='utf-8') as f:
+                return sum(1 for line in f if line.strip())
+        except OSError:
+            return 0
+
+    def load(self, reserved_id: Callable[[], int] | None = None) -> list[dict]:
+        """Return the snapshot with all journal records replayed on top.
+
+        Duplicate or invalid ids in the snapshot (written by older versions)
+        are renumbered behind every id used in the snapshot, the journal and
+        ``reserved_id()`` before replaying, and the result is compacted so
+        that journal records always address a single incident.
+        """
+
+        with self._lock:
+            incidents = self._read_snapshot()
+            records = list(self._read_journal())
+            if _has_duplicate_ids(incidents):
+                used = [inc.get('id') for inc in incidents if isinstance(inc, dict)]
+                used += [rec['incident'].get('id') for rec in records if isinstance(rec.get('incident'), dict)]
+                used.append(reserved_id() if reserved_id else 0)
+                next_id = max(i for i in used if isinstance(i, int)) + 1
+                renumbered = renumber_duplicate_ids(incidents, next_id, self.logger)
+            else:
+                renumbered = 0
+            positions = {}
+            for index, incident in enumerate(incidents):
+                if isinstance(incident, dict):
+                    positions.setdefault(incident.get('id'), index)
+            for record in records:
+                op = record.get('op')
+                if op == 'put':
+                    incident = record.get('incident')
+                    if not isinstance(incident, dict):
+                        continue
+                    index = positions.get(incident.get('id'))
+                    if index is None:
+                        positions[incident.get('id')] = len(incidents)
+                        incidents.append(incident)
+                    else:
+                        incidents[index] = incident
+                elif op == 'delete':
+                    index = positions.get(record.get('id'))
+                    if index is None:
+                        continue
+                    incidents.pop(index)
+                    positions = {}
+                    for position, incident in enumerate(incidents):
+                        if isinstance(incident, dict):
+                            positions.setdefault(incident.get('id'), position)
+            incidents = [incident for incident in incidents if isinstance(incident, dict)]
+            if renumbered:
+                self._compact_locked(incidents)
+            return incidents
+
+    def _read_snapshot(self) -> list:
+        if not self.snapshot_path.exists():
+            return []
+        with open(self.snapshot_path, encoding='utf-8') as f:
+            data = json.load(f)
+        return list(data) if isinstance(data, list) else []
+
+    def _read_journal(self) -> Iterable[dict]:
+        try:
+            f = open(self.journal_path, encoding='utf-8')
+        except OSError:
+            return
+        with f:
+            for number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line after a power cut must not block startup.
+                    self.logger.warning('Einsatzjournal: Zeile %s ist unvollständig und wird ignoriert', number)
+                    continue
+                if isinstance(record, dict):
+                    yield record
+
+    def _truncate_torn_tail(self) -> None:
+        """Cut off a final line without newline so new records start on a line of their own."""
+
+        try:
+            f = open(self.journal_path, 'rb+')
+        except FileNotFoundError:
+            return
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 4096)
+                f.seek(start)
+                chunk = f.read(position - start)
+                if position == end and chunk.endswith(b'\n'):
+                    return
+                newline = chunk.rfind(b'\n')
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            self.logger.warning('Einsatzjournal: unvollständige letzte Zeile (%s Bytes) wird abgeschnitten', end - position)
+            f.truncate(position)
+        self._records = max(0, self._records - 1)
+
+    def append(self, records: Iterable[dict], *, fsync: bool = False) -> None:
+        """Append records to the journal, one compact JSON line each."""
+
+        lines = [_compact_json(record) + '\n' for record in records]
+        if not lines:
+            return
+        with self._lock:
+            if not self._tail_checked:
+                self._truncate_torn_tail()
+                self._tail_checked = True
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._records += len(lines)
+            if self._records >= self.compact_threshold:
+                self._wake.set()
+
+    def compact(self, incidents: list[dict], *, fsync: bool = False) -> None:
+        """Rewrite the snapshot from ``incidents`` and truncate the journal."""
+
+        with self._lock:
+            self._compact_locked(incidents, fsync=fsync)
+
+    def _compact_locked(self, incidents: list[dict], *, fsync: bool = False) -> None:
+        write_json_atomic(self.snapshot_path, list(incidents), fsync=fsync)
+        if self.journal_path.exists():
+            self.journal_path.unlink()
+        self._records = 0
+        self._tail_checked = True
+
+    def start(self, snapshot_provider: Callable[[], list], lock: threading.Lock | None = None) -> None:
+        """Start the background compactor using ``snapshot_provider`` for the current state.
+
+        Compaction holds ``lock`` while it takes the snapshot and truncates
+        the journal; callers that append records before the matching change
+        is visible to ``snapshot_provider`` hold it as well.
+        """
+
+        self._snapshot_provider = snapshot_provider
+        if lock is not None:
+            self._snapshot_lock = lock
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._worker,
+            name='incident-journal-compactor',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        thread = self._thread
+        if not thread:
+            return
+        self._stopping = True
+        self._wake.set()
+        thread.join(timeout=5)
+        self._thread = None
+
+    def _worker(self) -> None:
+        while not self._stopping:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            if self._stopping or not self._records or self._snapshot_provider is None:
+                continue
+            try:
+                with self._snapshot_lock:
+                    self.compact(self._snapshot_provider())
+            except (OSError, RuntimeError, ValueError) as exc:
+                # Concurrent mutations can interrupt serialisation; retry next round.
+                self.logger.warning('Einsatzjournal konnte nicht verdichtet werden: %s', exc)
@@ -0,0 +1,164 @@
+"""Inverted full-text index over incident keywords, notes, locations and patients."""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, insort
+from typing import Callable, Iterable
+
+# Matches in the keyword count more than a word somewhere in the notes.
+FIELD_WEIGHTS = {
+    'keyword': 4,
+    'location': 3,
+    'patient': 2,
+    'notes': 1,
+}
+EXACT_MATCH_BONUS = 2
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text) -> list[str]:
+    """Split text into case-folded word tokens (``ß`` folds to ``ss``)."""
+
+    if not text:
+        return []
+    return _TOKEN_RE.findall(str(text).casefold())
+
+
+def incident_fields(incident: dict) -> dict[str, list[str]]:
+    location = incident.get('location')
+    if isinstance(location, dict):
+        location = location.get('name')
+    notes = [note.get('text') for note in incident.get('notes') or [] if isinstance(note, dict)]
+    return {
+        'keyword': tokenize(incident.get('keyword')),
+        'location': tokenize(location),
+        'patient': tokenize(incident.get('patient')),
+        'notes': [token for text in notes for token in tokenize(text)],
+    }
+
+
+class IncidentSearchIndex:
+    """Token → incident id postings with per-field weights.
+
+    Loaded incidents are added and removed as they change; archived incidents
+    are indexed once from ``archive_loader`` on the first search and kept as
+    postings only, the documents themselves stay in the archive.
+    """
+
+    def __init__(self, archive_loader: Callable[[], Iterable[dict]] | None = None) -> None:
+        self.archive_loader = archive_loader
+        self._archive_loaded = archive_loader is None
+        self._postings: dict[str, dict[int, int]] = {}
+        self._vocabulary: list[str] = []
+        self._doc_tokens: dict[int, dict[str, int]] = {}
+        # inc_id -> (start, archived)
+        self._docs: dict[int, tuple[str, bool]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, incident: dict, *, archived: bool = False) -> None:
+        inc_id = incident.get('id')
+        if not isinstance(inc_id, int):
+            return
+        weights: dict[str, int] = {}
+        for name, tokens in incident_fields(incident).items():
+            for token in tokens:
+                weights[token] = weights.get(token, 0) + FIELD_WEIGHTS[name]
+        previous = self._doc_tokens.get(inc_id, {})
+        for token in previous.keys() - weights.keys():
+            self._drop_posting(token, inc_id)
+        for token, weight in weights.items():
+            if previous.get(token) == weight:
+                continue
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._vocabulary, token)
+            postings[inc_id] = weight
+        self._doc_tokens[inc_id] = weights
+        self._docs[inc_id] = (incident.get('start') or '', archived)
+
+    def discard(self, inc_id) -> None:
+        for token in self._doc_tokens.pop(inc_id, {}):
+            self._drop_posting(token, inc_id)
+        self._docs.pop(inc_id, None)
+
+    def clear_loaded(self) -> None:
+        """Forget every incident that is not archived."""
+
+        for inc_id, (_, archived) in list(self._docs.items()):
+            if not archived:
+                self.discard(inc_id)
+
+    def _drop_posting(self, token: str, inc_id: int) -> None:
+        postings = self._postings.get(token)
+        if postings is None:
+            return
+        postings.pop(inc_id, None)
+        if not postings:
+            del self._postings[token]
+            i = bisect_left(self._vocabulary, token)
+            if i < len(self._vocabulary) and self._vocabulary[i] == token:
+                del self._vocabulary[i]
+
+    def _load_archive(self) -> None:
+        if self._archive_loaded:
+            return
+        self._archive_loaded = True
+        for incident in self.archive_loader():
+            # a loaded incident with the same id wins over its archived copy
+            if incident.get('id') not in self._docs:
+                self.add(incident, archived=True)
+
+    def _expand(self, term: str) -> dict[int, int]:
+        """Return id → score for all tokens starting with ``term``."""
+
+        scores: dict[int, int] = {}
+        i = bisect_left(self._vocabulary, term)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+            token = self._vocabulary[i]
+            bonus = EXACT_MATCH_BONUS if token == term else 1
+            for inc_id, weight in self._postings[token].items():
+                scores[inc_id] = max(scores.get(inc_id, 0), weight * bonus)
+            i += 1
+        return scores
+
+    def search(
+        self,
+        query: str,
+        *,
+        since: str | None = None,
+        until: str | None = None,
+        limit: int = 50,
+    ) -> list[tuple[int, bool, int]]:
+        """Return ``(id, archived, score)`` of incidents matching every query term.
+
+        Each term matches as a prefix; results are ranked by score and then
+        by start time, newest first.
+        """
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        self._load_archive()
+        scores: dict[int, int] | None = None
+        for term in sorted(terms, key=len, reverse=True):
+            matches = self._expand(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {inc_id: score + matches[inc_id] for inc_id, score in scores.items() if inc_id in matches}
+            if not scores:
+                return []
+        results = []
+        for inc_id, score in scores.items():
+            start, archived = self._docs[inc_id]
+            if since and start < since:
+                continue
+            if until and start >= until:
+                continue
+            results.append((score, start, inc_id, archived))
+        results.sort(reverse=True)
+        return [(inc_id, archived, score) for score, _, inc_id, archived in results[:limit]]
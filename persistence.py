@@ -0,0 +1,107 @@
+"""Coalescing write-behind persistence for frequently changing collections."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable
+
+Writer = Callable[..., None]
+
+
+class WriteBehindPersister:
+    """Mark collections dirty and write each of them once per flush window.
+
+    Request handlers only call :meth:`mark_dirty`; a background thread waits
+    ``delay`` seconds after the first change, then calls every dirty
+    collection's writer once and finally ``on_flush`` with the flushed names.
+    A burst of status changes therefore costs one write per collection.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger | None = None,
+        *,
+        delay: float = 0.25,
+        on_flush: Callable[[set[str]], None] | None = None,
+    ) -> None:
+        self.logger = logger or logging.getLogger(__name__)
+        self.delay = delay
+        self.on_flush = on_flush
+        self._writers: dict[str, Writer] = {}
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+
+    def register(self, name: str, writer: Writer) -> None:
+        """Register ``writer(fsync=False)`` as the persistence function for ``name``."""
+
+        self._writers[name] = writer
+
+    def mark_dirty(self, name: str) -> None:
+        if name not in self._writers:
+            raise KeyError(name)
+        with self._lock:
+            self._dirty.add(name)
+        self._wake.set()
+
+    @property
+    def dirty(self) -> set[str]:
+        with self._lock:
+            return set(self._dirty)
+
+    def flush(self, *, fsync: bool = False) -> set[str]:
+        """Write all dirty collections now and return their names."""
+
+        with self._flush_lock:
+            with self._lock:
+                names, self._dirty = self._dirty, set()
+            flushed = set()
+            for name in sorted(names):
+                try:
+                    self._writers[name](fsync=fsync)
+                except Exception as exc:  # keep the data dirty and retry on the next window
+                    self.logger.error('Speichern von %s fehlgeschlagen: %s', name, exc)
+                    with self._lock:
+                        self._dirty.add(name)
+                    continue
+                flushed.add(name)
+        if flushed and self.on_flush:
+            self.on_flush(flushed)
+        return flushed
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._worker,
+            name='write-behind-persister',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the worker and write everything that is still dirty with fsync."""
+
+        self._stopping = True
+        self._wake.set()
+        thread = self._thread
+        if thread:
+            thread.join(timeout=5)
+            self._thread = None
+        self.flush(fsync=True)
+
+    def _worker(self) -> None:
+        while not self._stopping:
+            self._wake.wait()
+            if self._stopping:
+                return
+            # Collect further changes of the same burst before writing.
+            time.sleep(self.delay)
+            self._wake.clear()
+            self.flush()
@@ -0,0 +1,75 @@
+"""Cache of encoded JSON response bodies keyed by collection revisions."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+from compression import compress
+
+
+class CachedBody:
+    """One encoded response body; compressed variants are produced on first use."""
+
+    __slots__ = ('etag', 'names', 'body', '_compressed', '_lock')
+
+    def __init__(self, etag: str, names: Iterable[str], body: bytes) -> None:
+        self.etag = etag
+        self.names = frozenset(names)
+        self.body = body
+        self._compressed: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        with self._lock:
+            data = self._compressed.get(encoding)
+            if data is None:
+                data = self._compressed[encoding] = compress(self.body, encoding)
+            return data
+
+
+class ResponseCache:
+    """Keep the encoded bytes of read API responses until a collection changes.
+
+    Entries are stored per request key (path and query string) together with
+    the ETag they were built for. :meth:`invalidate` drops every entry that
+    depends on a collection; an entry with a different ETag is rebuilt.
+    """
+
+    def __init__(self, max_entries: int = 64) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedBody] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, etag: str, names: Iterable[str], encode: Callable[[], bytes]) -> CachedBody:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.etag == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        # encode outside the lock; concurrent misses for the same key are harmless
+        entry = CachedBody(etag, names, encode())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, name: str) -> None:
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if name in entry.names]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
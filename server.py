@@ -0,0 +1,249 @@
+"""Production HTTP server for the alarm monitor.
+
+``flask run`` starts the development server, which has no control over
+threads, keep-alive or connection limits. ``python server.py`` serves the same
+app through werkzeug's threaded server with separate concurrency budgets:
+Server-sent event streams (open kiosks and dispatch consoles) get their own
+slots, so they can never use up the slots of page and API requests.
+
+All settings come from the environment (``ALARMMONITOR_THREADS`` and friends,
+see :class:`ServerConfig`) or the matching command line options.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, fields, replace
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import ClosingIterator
+
+STREAM_PATHS = frozenset({'/events'})
+# EventSource reconnects after this many milliseconds when no stream slot is free.
+STREAM_RETRY_MS = 10000
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    host: str = '0.0.0.0'
+    port: int = 5000
+    threads: int = 8
+    stream_threads: int = 16
+    connections: int = 64
+    keepalive: float = 5.0
+    queue_timeout: float = 30.0
+    accept_timeout: float = 1.0
+    backlog: int = 64
+
+    ENV_PREFIX = 'ALARMMONITOR_'
+
+    @classmethod
+    def from_env(cls, environ=None) -> ServerConfig:
+        """Read ``ALARMMONITOR_<FIELD>`` variables, e.g. ``ALARMMONITOR_STREAM_THREADS``."""
+
+        environ = os.environ if environ is None else environ
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(f'{cls.ENV_PREFIX}{field.name.upper()}')
+            if raw in (None, ''):
+                continue
+            try:
+                values[field.name] = type(getattr(cls, field.name))(raw)
+            except ValueError:
+                raise ValueError(f'Ungültiger Wert für {cls.ENV_PREFIX}{field.name.upper()}: {raw}') from None
+        return cls(**values).validated()
+
+    def validated(self) -> ServerConfig:
+        if min(self.threads, self.stream_threads, self.connections, self.backlog) < 1 or min(self.keepalive, self.accept_timeout) <= 0:
+            raise ValueError('Threads, Verbindungen, Keep-Alive und Wartezeiten müssen größer als 0 sein.')
+        # every request slot needs a connection to run on
+        return replace(self, connections=max(self.connections, self.threads + self.stream_threads))
+
+
+class ConcurrencyLimiter:
+    """WSGI middleware with one budget for event streams and one for all other requests.
+
+    Requests wait up to ``queue_timeout`` seconds for a slot and are answered
+    with 503 afterwards. A stream without a free slot is told to reconnect
+    later (an HTTP error would make ``EventSource`` give up for good).
+    """
+
+    def __init__(self, app, *, threads: int, stream_threads: int, queue_timeout: float = 30.0, stream_paths=STREAM_PATHS):
+        self.app = app
+        self.queue_timeout = queue_timeout
+        self.stream_paths = frozenset(stream_paths)
+        self._slots = {
+            'requests': threading.BoundedSemaphore(threads),
+            'streams': threading.BoundedSemaphore(stream_threads),
+        }
+        self._limits = {'requests': threads, 'streams': stream_threads}
+        self._active = {'requests': 0, 'streams': 0}
+        self._rejected = {'requests': 0, 'streams': 0}
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        kind = 'streams' if environ.get('PATH_INFO', '') in self.stream_paths else 'requests'
+        if kind == 'streams':
+            acquired = self._slots[kind].acquire(blocking=False)
+        else:
+            acquired = self._slots[kind].acquire(timeout=self.queue_timeout)
+        if not acquired:
+            with self._lock:
+                self._rejected[kind] += 1
+            return self._reject(kind, start_response)
+        with self._lock:
+            self._active[kind] += 1
+        try:
+            result = self.app(environ, start_response)
+        except BaseException:
+            self._release(kind)
+            raise
+        # the slot is held until the response body is sent completely
+        return ClosingIterator(result, lambda: self._release(kind))
+
+    def _release(self, kind: str) -> None:
+        with self._lock:
+            self._active[kind] -= 1
+        self._slots[kind].release()
+
+    def _reject(self, kind, start_response):
+        if kind == 'streams':
+            body = f'retry: {STREAM_RETRY_MS}\n: Zu viele Ereignis-Verbindungen\n\n'.encode()
+            start_response('200 OK', [
+                ('Content-Type', 'text/event-stream'),
+                ('Cache-Control', 'no-cache'),
+                ('Content-Length', str(len(body))),
+            ])
+            return [body]
+        body = json.dumps({'ok': False, 'error': 'Server ausgelastet, bitte erneut versuchen.'}).encode()
+        start_response('503 Service Unavailable', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Retry-After', '1'),
+        ])
+        return [body]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                kind: {'active': self._active[kind], 'limit': self._limits[kind], 'rejected': self._rejected[kind]}
+                for kind in self._limits
+            }
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    # HTTP/1.1 keeps connections open between requests and lets werkzeug use
+    # chunked transfer for streamed responses.
+    protocol_version = 'HTTP/1.1'
+
+
+class ProductionServer(ThreadedWSGIServer):
+    """Threaded werkzeug server with a cap on open connections.
+
+    Once ``connections`` sockets are open the accept loop waits up to
+    ``accept_timeout`` seconds for one to close, so further clients queue in
+    the listen backlog instead of spawning threads. If none closes (long-lived
+    event streams hold them) the new connection is answered with 503, which
+    keeps the loop accepting and :meth:`shutdown` responsive. Idle keep-alive
+    connections are closed after ``keepalive`` seconds.
+    """
+
+    BUSY_RESPONSE = (
+        b'HTTP/1.1 503 Service Unavailable\r\n'
+        b'Content-Type: application/json\r\n'
+        b'Retry-After: 1\r\n'
+        b'Connection: close\r\n'
+    )
+
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self, app, config: ServerConfig) -> None:
+        self.request_queue_size = config.backlog
+        handler = type('ConfiguredRequestHandler', (KeepAliveRequestHandler,), {'timeout': config.keepalive})
+        super().__init__(config.host, config.port, app, handler=handler)
+        self._connections = threading.BoundedSemaphore(config.connections)
+        self.accept_timeout = config.accept_timeout
+        self.rejected_connections = 0
+
+    def process_request(self, request, client_address):
+        if not self._connections.acquire(timeout=self.accept_timeout):
+            self.rejected_connections += 1
+            self._reject(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._connections.release()
+            raise
+
+    def _reject(self, request) -> None:
+        body = json.dumps({'ok': False, 'error': 'Zu viele Verbindungen, bitte erneut versuchen.'}).encode()
+        try:
+            request.settimeout(self.accept_timeout)
+            request.sendall(self.BUSY_RESPONSE + f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._connections.release()
+
+
+def create_server(flask_app, config: ServerConfig) -> ProductionServer:
+    """Wrap ``flask_app`` in the limiter and bind the server (port 0 picks a free port)."""
+
+    limiter = ConcurrencyLimiter(
+        flask_app.wsgi_app,
+        threads=config.threads,
+        stream_threads=config.stream_threads,
+        queue_timeout=config.queue_timeout,
+    )
+    flask_app.wsgi_app = limiter
+    flask_app.extensions['concurrency_limiter'] = limiter
+    return ProductionServer(flask_app, config)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Alarmmonitor im Produktionsmodus starten')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--threads', type=int, help='gleichzeitige Seiten- und API-Anfragen')
+    parser.add_argument('--stream-threads', type=int, help='gleichzeitige Ereignis-Streams (/events)')
+    parser.add_argument('--connections', type=int, help='offene Verbindungen inklusive Keep-Alive')
+    parser.add_argument('--keepalive', type=float, help='Sekunden, die eine ruhende Verbindung offen bleibt')
+    args = parser.parse_args(argv)
+    config = ServerConfig.from_env()
+    overrides = {key: value for key, value in vars(args).items() if value is not None}
+    config = replace(config, **overrides).validated()
+
+    # imported late: loading the app reads the data files and starts the workers
+    from app import app as flask_app
+
+    server = create_server(flask_app, config)
+    flask_app.logger.info(
+        'Produktionsserver auf %s:%s (%d Anfrage-Slots, %d Stream-Slots, %d Verbindungen, Keep-Alive %.0f s)',
+        config.host,
+        server.port,
+        config.threads,
+        config.stream_threads,
+        config.connections,
+        config.keepalive,
+    )
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -104,6 +104,12 @@ ExecStart=/usr/bin/env bash $TARGET_DIR/start.sh
 Restart=always
 RestartSec=5
 Environment=FLASK_ENV=production
+# production = server.py, development = flask run
+Environment=ALARMMONITOR_SERVER=production
+# gleichzeitige Seiten-/API-Anfragen und Ereignis-Streams (Monitore, Leitstellen)
+Environment=ALARMMONITOR_THREADS=8
+Environment=ALARMMONITOR_STREAM_THREADS=16
+Environment=ALARMMONITOR_KEEPALIVE=5
 User=$SERVICE_USER
 Group=$SERVICE_GROUP
 
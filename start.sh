@@ -80,4 +80,27 @@ export FLASK_APP=app.py
 ensure_pigpiod_running
 # Creates a local setup Wi‑Fi hotspot when no WLAN uplink is connected.
 ./scripts/pi_wifi_bootstrap.sh || true
-exec flask run --host=0.0.0.0 --port=5000
+
+# production: server.py with separate request/stream budgets (see README)
+# asgi: event stream and upstream lookups on an event loop (needs uvicorn)
+# development: the Flask development server
+SERVER_MODE="${ALARMMONITOR_SERVER:-production}"
+case "$SERVER_MODE" in
+  production)
+    exec python server.py --host=0.0.0.0 --port=5000
+    ;;
+  asgi)
+    if ! command -v uvicorn >/dev/null 2>&1; then
+      echo "uvicorn fehlt in der venv: pip install uvicorn" >&2
+      exit 1
+    fi
+    exec uvicorn asgi:application --host=0.0.0.0 --port=5000 --lifespan=on
+    ;;
+  development)
+    exec flask run --host=0.0.0.0 --port=5000
+    ;;
+  *)
+    echo "Unbekannter Servermodus '$SERVER_MODE' (ALARMMONITOR_SERVER=production|asgi|development)." >&2
+    exit 1
+    ;;
+esac
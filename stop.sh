@@ -4,7 +4,7 @@ if [ ! -d "venv" ]; then
   echo "Virtual environment not found. Run ./install.sh first."
   exit 1
 fi
-PIDS=$(pgrep -f "flask run --host=0.0.0.0 --port=5000" | tr '\n' ' ' || true)
+PIDS=$(pgrep -f "flask run --host=0.0.0.0 --port=5000|server\.py --host=0.0.0.0 --port=5000|uvicorn asgi:application" | tr '\n' ' ' || true)
 if [ -z "$PIDS" ]; then
   echo "No running Alarmmonitor Flask process found."
   exit 0
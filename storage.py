@@ -0,0 +1,541 @@
+"""Pluggable persistence backends for vehicles, incidents and lookup tables.
+
+``JsonStorage`` keeps the historic file layout under ``data/`` (with the
+incident journal from :mod:`incident_journal`). ``SqliteStorage`` stores the
+same collections row by row in a single SQLite database in WAL mode.
+
+Run ``python storage.py migrate`` once to copy the JSON files into SQLite.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from archive import IncidentArchive
+from incident_journal import IncidentJournal, write_json_atomic
+
+COLLECTIONS = ('vehicles', 'templates', 'priorities', 'announcements', 'sequences')
+DEFAULT_DATA_DIR = Path('data')
+DEFAULT_DB_FILE = DEFAULT_DATA_DIR / 'alarmmonitor.db'
+MIGRATE_BATCH_SIZE = 500
+
+
+def incident_units(incident: dict) -> set[str]:
+    """Return every unit that was ever assigned to or logged for an incident."""
+
+    units = {unit for unit in incident.get('vehicles') or [] if unit}
+    units.update(
+        entry.get('unit')
+        for entry in incident.get('log') or []
+        if isinstance(entry, dict) and entry.get('unit')
+    )
+    return units
+
+
+def incident_matches(incident: dict, *, active=None, since=None, until=None, unit=None) -> bool:
+    start = incident.get('start') or ''
+    if active is not None and bool(incident.get('active')) != active:
+        return False
+    if since is not None and start < since:
+        return False
+    if until is not None and start >= until:
+        return False
+    if unit is not None and unit not in incident_units(incident):
+        return False
+    return True
+
+
+class Storage:
+    """Interface shared by all storage backends."""
+
+    def load_collection(self, name: str):
+        """Return the stored collection or ``None`` when nothing was saved yet."""
+
+        raise NotImplementedError
+
+    def save_collection(self, name: str, data, *, fsync: bool = False) -> None:
+        raise NotImplementedError
+
+    def load_incidents(self) -> list[dict]:
+        raise NotImplementedError
+
+    def save_incident_changes(self, records: Iterable[dict], *, fsync: bool = False) -> None:
+        """Apply ``put``/``delete`` records as produced by :class:`IncidentJournal`."""
+
+        raise NotImplementedError
+
+    def query_incidents(self, *, active=None, since=None, until=None, unit=None, limit=None, archived=None) -> list[dict]:
+        """Return incidents ordered by start time, newest first.
+
+        ``archived`` restricts the result to archived (``True``) or hot
+        (``False``) incidents; ``None`` includes both.
+        """
+
+        raise NotImplementedError
+
+    def iter_archived_incidents(self, *, since=None, until=None, unit=None) -> Iterator[dict]:
+        """Yield archived incidents ordered by start time, oldest first.
+
+        Unlike :meth:`query_incidents` the result is produced in small
+        batches, so exporting years of history keeps memory flat.
+        """
+
+        raise NotImplementedError
+
+    def archive_incidents(self, incidents: list[dict]) -> None:
+        """Move ended incidents out of the set returned by :meth:`load_incidents`."""
+
+        raise NotImplementedError
+
+    def load_archived_incident(self, inc_id: int) -> dict | None:
+        raise NotImplementedError
+
+    def archived_max_id(self) -> int:
+        """Return the highest incident id in the archive (0 when empty)."""
+
+        raise NotImplementedError
+
+    def start(self, snapshot_provider: Callable[[], list], lock: threading.Lock | None = None) -> None:
+        """Start background maintenance; ``snapshot_provider`` returns all incidents.
+
+        ``lock`` is held while the incidents are snapshotted and must also be
+        held around :meth:`archive_incidents` and the matching removal.
+        """
+
+    def stop(self) -> None:
+        pass
+
+
+class JsonStorage(Storage):
+    """One JSON file per collection plus the incident snapshot/journal pair."""
+
+    def __init__(
+        self,
+        path_for: Callable[[str], Path],
+        journal: IncidentJournal | None = None,
+        logger: logging.Logger | None = None,
+        archive: IncidentArchive | None = None,
+    ) -> None:
+        self.path_for = path_for
+        self.logger = logger or logging.getLogger(__name__)
+        self.journal = journal or IncidentJournal(path_for('incidents'), logger=self.logger)
+        self.archive = archive or IncidentArchive(self.journal.snapshot_path.parent / 'archive', self.logger)
+
+    def load_collection(self, name: str):
+        path = self.path_for(name)
+        if not path.exists():
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_collection(self, name: str, data, *, fsync: bool = False) -> None:
+        write_json_atomic(self.path_for(name), data, fsync=fsync)
+
+    def load_incidents(self) -> list[dict]:
+        return self.journal.load(reserved_id=self.reserved_incident_id)
+
+    def reserved_incident_id(self) -> int:
+        """Return the highest id that was handed out, archived or not."""
+
+        stored = (self.load_collection('sequences') or {}).get('incidents')
+        return max(stored if isinstance(stored, int) else 0, self.archived_max_id())
+
+    def save_incident_changes(self, records: Iterable[dict], *, fsync: bool = False) -> None:
+        self.journal.append(records, fsync=fsync)
+
+    def query_incidents(self, *, active=None, since=None, until=None, unit=None, limit=None, archived=None) -> list[dict]:
+        candidates = []
+        if archived is not True:
+            candidates.extend(self.load_incidents())
+        if archived is not False and active is not True:
+            candidates.extend(self.archive.query(since=since, until=until))
+        matches = [
+            incident
+            for incident in candidates
+            if incident_matches(incident, active=active, since=since, until=until, unit=unit)
+        ]
+        matches.sort(key=lambda inc: inc.get('start') or '', reverse=True)
+        return matches[:limit] if limit is not None else matches
+
+    def iter_archived_incidents(self, *, since=None, until=None, unit=None) -> Iterator[dict]:
+        # partitions are sorted by start and walked month by month
+        for incident in self.archive.iter_query(since=since, until=until):
+            if incident_matches(incident, since=since, until=until, unit=unit):
+                yield incident
+
+    def archive_incidents(self, incidents: list[dict]) -> None:
+        # Partition first: a crash in between leaves the incident in both
+        # places, and the next run simply archives it again.
+        self.archive.add(incidents)
+        self.journal.append([IncidentJournal.delete_record(inc.get('id')) for inc in incidents])
+
+    def load_archived_incident(self, inc_id: int) -> dict | None:
+        return self.archive.get(inc_id)
+
+    def archived_max_id(self) -> int:
+        return self.archive.max_id()
+
+    def start(self, snapshot_provider: Callable[[], list], lock: threading.Lock | None = None) -> None:
+        self.journal.start(snapshot_provider, lock)
+
+    def stop(self) -> None:
+        self.journal.stop()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    name TEXT PRIMARY KEY,
+    kind TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS collection_items (
+    collection TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    key TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, position)
+);
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY,
+    active INTEGER NOT NULL,
+    start TEXT,
+    end TEXT,
+    data TEXT NOT NULL,
+    archived INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS incident_units (
+    incident_id INTEGER NOT NULL REFERENCES incidents (id) ON DELETE CASCADE,
+    unit TEXT NOT NULL,
+    PRIMARY KEY (incident_id, unit)
+);
+CREATE INDEX IF NOT EXISTS idx_incident_units_unit ON incident_units (unit, incident_id);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_incidents_active ON incidents (active);
+CREATE INDEX IF NOT EXISTS idx_incidents_start ON incidents (start);
+CREATE INDEX IF NOT EXISTS idx_incidents_archived_start ON incidents (archived, start);
+"""
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class SqliteStorage(Storage):
+    """SQLite backend in WAL mode with row-level writes."""
+
+    def __init__(self, db_path: Path = DEFAULT_DB_FILE, logger: logging.Logger | None = None) -> None:
+        self.db_path = Path(db_path)
+        self.logger = logger or logging.getLogger(__name__)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(incidents)')}
+        if 'archived' not in columns:
+            self._conn.execute('ALTER TABLE incidents ADD COLUMN archived INTEGER NOT NULL DEFAULT 0')
+        self._conn.executescript(INDEXES)
+        # Last written rows per collection, used to skip unchanged rows.
+        self._written: dict[str, list[tuple[str | None, str]]] = {}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT (SELECT COUNT(*) FROM collections) + (SELECT COUNT(*) FROM incidents)'
+            ).fetchone()
+        return not row[0]
+
+    def load_collection(self, name: str):
+        with self._lock:
+            kind = self._conn.execute('SELECT kind FROM collections WHERE name = ?', (name,)).fetchone()
+            if kind is None:
+                return None
+            rows = self._conn.execute(
+                'SELECT key, data FROM collection_items WHERE collection = ? ORDER BY position',
+                (name,),
+            ).fetchall()
+            self._written[name] = [(key, data) for key, data in rows]
+        if kind[0] == 'dict':
+            return {key: json.loads(data) for key, data in rows}
+        return [json.loads(data) for _, data in rows]
+
+    def save_collection(self, name: str, data, *, fsync: bool = False) -> None:
+        if isinstance(data, dict):
+            kind = 'dict'
+            rows = [(str(key), _dumps(value)) for key, value in data.items()]
+        else:
+            kind = 'list'
+            rows = [(None, _dumps(value)) for value in data]
+        with self._lock:
+            previous = self._written.get(name)
+            if previous is None:
+                previous = self._conn.execute(
+                    'SELECT key, data FROM collection_items WHERE collection = ? ORDER BY position',
+                    (name,),
+                ).fetchall()
+            changed = [
+                (name, position, key, value)
+                for position, (key, value) in enumerate(rows)
+                if position >= len(previous) or tuple(previous[position]) != (key, value)
+            ]
+            with self._conn:
+                self._conn.execute('BEGIN')
+                self._conn.execute(
+                    'INSERT INTO collections (name, kind) VALUES (?, ?) '
+                    'ON CONFLICT (name) DO UPDATE SET kind = excluded.kind',
+                    (name, kind),
+                )
+                self._conn.executemany(
+                    'INSERT INTO collection_items (collection, position, key, data) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (collection, position) DO UPDATE SET key = excluded.key, data = excluded.data',
+                    changed,
+                )
+                if len(previous) > len(rows):
+                    self._conn.execute(
+                        'DELETE FROM collection_items WHERE collection = ? AND position >= ?',
+                        (name, len(rows)),
+                    )
+            self._written[name] = rows
+            if fsync:
+                self._checkpoint()
+
+    def load_incidents(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute('SELECT data FROM incidents WHERE archived = 0 ORDER BY id').fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def _put_incident(self, incident: dict) -> None:
+        inc_id = incident.get('id')
+        self._conn.execute(
+            'INSERT INTO incidents (id, active, start, end, data) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (id) DO UPDATE SET active = excluded.active, start = excluded.start, '
+            'end = excluded.end, data = excluded.data',
+            (
+                inc_id,
+                1 if incident.get('active') else 0,
+                incident.get('start'),
+                incident.get('end'),
+                _dumps(incident),
+            ),
+        )
+        self._conn.execute('DELETE FROM incident_units WHERE incident_id = ?', (inc_id,))
+        self._conn.executemany(
+            'INSERT INTO incident_units (incident_id, unit) VALUES (?, ?)',
+            [(inc_id, unit) for unit in sorted(incident_units(incident))],
+        )
+
+    def save_incident_changes(self, records: Iterable[dict], *, fsync: bool = False) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute('BEGIN')
+                for record in records:
+                    if record.get('op') == 'put' and isinstance(record.get('incident'), dict):
+                        self._put_incident(record['incident'])
+                    elif record.get('op') == 'delete':
+                        self._conn.execute('DELETE FROM incidents WHERE id = ?', (record.get('id'),))
+            if fsync:
+                self._checkpoint()
+
+    def _checkpoint(self) -> None:
+        # With synchronous=NORMAL a WAL commit is not synced; a full
+        # checkpoint writes and syncs it into the main database file.
+        self._conn.execute('PRAGMA wal_checkpoint(FULL)')
+
+    def query_incidents(self, *, active=None, since=None, until=None, unit=None, limit=None, archived=None) -> list[dict]:
+        clauses = []
+        params: list = []
+        if archived is not None:
+            clauses.append('archived = ?')
+            params.append(1 if archived else 0)
+        if active is not None:
+            clauses.append('active = ?')
+            params.append(1 if active else 0)
+        if since is not None:
+            clauses.append('start >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('start < ?')
+            params.append(until)
+        if unit is not None:
+            clauses.append('id IN (SELECT incident_id FROM incident_units WHERE unit = ?)')
+            params.append(unit)
+        sql = 'SELECT data FROM incidents'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY start DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def iter_archived_incidents(self, *, since=None, until=None, unit=None, batch_size=500) -> Iterator[dict]:
+        clauses = ['archived = 1']
+        params: list = []
+        if since is not None:
+            clauses.append('start >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('start < ?')
+            params.append(until)
+        if unit is not None:
+            clauses.append('id IN (SELECT incident_id FROM incident_units WHERE unit = ?)')
+            params.append(unit)
+        where = ' AND '.join(clauses)
+        if since is None:
+            # rows without start sort first; there are only a few legacy ones
+            yield from self._iter_batches(
+                f'SELECT id, start, data FROM incidents WHERE {where} AND start IS NULL AND id > ? ORDER BY id LIMIT ?',
+                params,
+                lambda row: (row[0],),
+                (-1,),
+                batch_size,
+            )
+        # keyset paging: the lock is only held per batch, never across yields
+        yield from self._iter_batches(
+            f'SELECT id, start, data FROM incidents WHERE {where} AND (start, id) > (?, ?) ORDER BY start, id LIMIT ?',
+            params,
+            lambda row: (row[1], row[0]),
+            ('', -1),
+            batch_size,
+        )
+
+    def _iter_batches(self, sql, params, key, last, batch_size) -> Iterator[dict]:
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, [*params, *last, batch_size]).fetchall()
+            for row in rows:
+                yield json.loads(row[2])
+            if len(rows) < batch_size:
+                return
+            last = key(rows[-1])
+
+    def archive_incidents(self, incidents: list[dict]) -> None:
+        # The start index keeps month ranges cheap, so archived rows simply
+        # stay in the table and are skipped when loading the hot set.
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN')
+            for incident in incidents:
+                self._put_incident(incident)
+            self._conn.executemany(
+                'UPDATE incidents SET archived = 1 WHERE id = ?',
+                [(incident.get('id'),) for incident in incidents],
+            )
+
+    def load_archived_incident(self, inc_id: int) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM incidents WHERE id = ? AND archived = 1',
+                (inc_id,),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def archived_max_id(self) -> int:
+        with self._lock:
+            row = self._conn.execute('SELECT MAX(id) FROM incidents WHERE archived = 1').fetchone()
+        return row[0] or 0
+
+    def stop(self) -> None:
+        with self._lock:
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+def create_storage(
+    backend: str,
+    *,
+    path_for: Callable[[str], Path],
+    db_path: Path = DEFAULT_DB_FILE,
+    logger: logging.Logger | None = None,
+) -> Storage:
+    backend = (backend or 'json').strip().lower()
+    if backend == 'sqlite':
+        return SqliteStorage(db_path, logger)
+    if backend != 'json':
+        raise ValueError(f'Unbekanntes Speicher-Backend: {backend}')
+    return JsonStorage(path_for, logger=logger)
+
+
+def migrate_json_to_sqlite(source: JsonStorage, target: SqliteStorage, *, force: bool = False) -> dict:
+    """Copy all JSON collections, incidents and archive partitions into ``target``.
+
+    Incidents with an id that was already taken (a consequence of older id
+    allocation) have been renumbered by :meth:`JsonStorage.load_incidents`
+    with the same rule before they are copied. An incident
+    found both in the hot set and in the archive (archiving was interrupted)
+    is migrated from the hot set and archived again by the next run.
+    """
+
+    if not force and not target.is_empty():
+        raise RuntimeError(f'{target.db_path} enthält bereits Daten; mit --force überschreiben.')
+    counts = {}
+    for name in COLLECTIONS:
+        data = source.load_collection(name)
+        if data is None:
+            continue
+        target.save_collection(name, data)
+        counts[name] = len(data)
+    # JsonStorage.load_incidents already renumbers duplicate ids
+    incidents = source.load_incidents()
+    seen = {incident['id'] for incident in incidents}
+    records = [IncidentJournal.put_record(incident) for incident in incidents]
+    target.save_incident_changes(records)
+    counts['incidents'] = len(records)
+    archived = 0
+    batch = []
+    for incident in source.iter_archived_incidents():
+        if incident.get('id') in seen:
+            continue
+        batch.append(incident)
+        if len(batch) >= MIGRATE_BATCH_SIZE:
+            target.archive_incidents(batch)
+            archived += len(batch)
+            batch = []
+    if batch:
+        target.archive_incidents(batch)
+        archived += len(batch)
+    counts['archived'] = archived
+    return counts
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Alarmmonitor-Datenhaltung verwalten')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help='JSON-Dateien einmalig nach SQLite übernehmen')
+    migrate.add_argument('--data-dir', type=Path, default=DEFAULT_DATA_DIR)
+    migrate.add_argument('--db', type=Path, default=None)
+    migrate.add_argument('--force', action='store_true', help='auch in eine nicht leere Datenbank schreiben')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    data_dir = args.data_dir
+    db_path = args.db or data_dir / DEFAULT_DB_FILE.name
+    source = JsonStorage(lambda name: data_dir / f'{name}.json')
+    target = SqliteStorage(db_path)
+    try:
+        counts = migrate_json_to_sqlite(source, target, force=args.force)
+    except RuntimeError as exc:
+        parser.error(str(exc))
+    finally:
+        target.close()
+    for name, count in counts.items():
+        print(f'{name}: {count}')
+    print(f'Migration nach {db_path} abgeschlossen. Mit ALARMMONITOR_STORAGE=sqlite starten.')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,68 @@
+import atexit
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from storage import JsonStorage
+
+_data_dir = None
+
+
+def pytest_configure(config):
+    # ``import app`` already runs while the test modules are collected, so
+    # the paths have to be redirected before any fixture is set up.
+    global _data_dir
+    _data_dir = Path(tempfile.mkdtemp(prefix='alarmmonitor-tests-'))
+    os.environ['ALARMMONITOR_GEOCODE_DB'] = str(_data_dir / 'geocode.db')
+    os.environ['ALARMMONITOR_GAZETTEER'] = str(_data_dir / 'gazetteer.json')
+    os.environ['ALARMMONITOR_LOG'] = str(_data_dir / 'app.log')
+
+
+def pytest_unconfigure(config):
+    if _data_dir is not None:
+        shutil.rmtree(_data_dir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def isolated_app_files(monkeypatch, tmp_path):
+    """Keep every ``reload(app)`` away from the files in the checkout."""
+
+    monkeypatch.setenv('ALARMMONITOR_GEOCODE_DB', str(tmp_path / 'geocode.db'))
+    monkeypatch.setenv('ALARMMONITOR_GAZETTEER', str(tmp_path / 'gazetteer.json'))
+    monkeypatch.setenv('ALARMMONITOR_LOG', str(tmp_path / 'app.log'))
+    yield
+    app = sys.modules.get('app')
+    if app is not None:
+        # the Flask logger outlives reloads; drop the handler this test added
+        app.app.logger.removeHandler(app.file_handler)
+        app.file_handler.close()
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    """The reloaded ``app`` module with its data files in ``tmp_path``.
+
+    The write-behind persister and the geocode worker are stopped (tests
+    flush explicitly), vehicles start from ``DEFAULT_VEHICLES`` and there are
+    no incidents. Afterwards the module is shut down like on exit.
+    """
+
+    module = importlib.reload(importlib.import_module('app'))
+    atexit.unregister(module.shutdown_persistence)
+    module.persister.stop()
+    module.geocode_worker.stop()
+    module.storage.stop()
+    monkeypatch.setattr(module, 'storage', JsonStorage(lambda name: tmp_path / f'{name}.json'))
+    monkeypatch.setattr(module, 'SETTINGS_FILE', tmp_path / 'settings.json')
+    module.vehicles = {k: v.copy() for k, v in module.DEFAULT_VEHICLES.items()}
+    module.incidents = []
+    yield module
+    module.pager_service.stop()
+    module.shutdown_persistence()
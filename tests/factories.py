@@ -0,0 +1,18 @@
+def incident(inc_id, start='2025-01-01T10:00:00', *, active=True, units=(), alerted=False, notes=(), location='', **extra):
+    """Build an incident as stored by the app; ended incidents end when they start."""
+
+    data = {
+        'id': inc_id,
+        'start': start,
+        'end': None if active else start,
+        'active': active,
+        'keyword': f'Einsatz {inc_id}',
+        'location': {'name': location, 'lat': None, 'lon': None},
+        'patient': '',
+        'priority': '',
+        'vehicles': list(units),
+        'notes': [{'time': start, 'text': text} for text in notes],
+        'log': [{'time': start, 'unit': unit, 'status': 'alarmiert'} for unit in units] if alerted else [],
+    }
+    data.update(extra)
+    return data
@@ -1,28 +1,16 @@
-import os
-import sys
 import time
 from pathlib import Path
-from importlib import reload
 
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-import app as app_module
+import pytest
 
 
-def setup_app():
-    app = reload(app_module)
-    # prevent file writes during tests
-    app.save_vehicles = lambda: None
-    app.save_incidents = lambda: None
-    app.save_announcements = lambda: None
-    # reset in-memory data
-    app.vehicles = {k: v.copy() for k, v in app.DEFAULT_VEHICLES.items()}
-    app.incidents = []
+@pytest.fixture
+def client(app):
     app.announcements = []
-    return app, app.app.test_client()
+    return app.app.test_client()
 
 
-def test_realert_same_incident_is_ignored():
-    app, client = setup_app()
+def test_realert_same_incident_is_ignored(app, client):
     resp = client.post('/api/incidents', json={'keyword': 'Test', 'location': 'Loc'})
     inc_id = resp.get_json()['id']
 
@@ -45,8 +33,7 @@ def test_realert_same_incident_is_ignored():
     assert 'RTW1' in data_second['already_alerted']
 
 
-def test_alert_skips_vehicle_in_other_active_incident():
-    app, client = setup_app()
+def test_alert_skips_vehicle_in_other_active_incident(app, client):
     resp = client.post('/api/incidents', json={'keyword': 'A', 'location': 'LocA'})
     inc_a = resp.get_json()['id']
     client.post(f'/api/incidents/{inc_a}/alert', json={'units': ['RTW1']})
@@ -61,8 +48,7 @@ def test_alert_skips_vehicle_in_other_active_incident():
     assert app.vehicles['RTW1']['incident_id'] == inc_a
 
 
-def test_vehicle_status_reset_after_incident_end():
-    app, client = setup_app()
+def test_vehicle_status_reset_after_incident_end(app, client):
     resp = client.post('/api/incidents', json={'keyword': 'Test', 'location': 'Loc'})
     inc_id = resp.get_json()['id']
 
@@ -73,8 +59,7 @@ def test_vehicle_status_reset_after_incident_end():
     assert app.vehicles['RTW1']['status'] == 1
 
 
-def test_vehicle_priority_is_set_and_cleared():
-    app, client = setup_app()
+def test_vehicle_priority_is_set_and_cleared(app, client):
     resp = client.post(
         '/api/incidents',
         json={'keyword': 'Test', 'location': 'Loc', 'priority': 'R1'},
@@ -88,8 +73,7 @@ def test_vehicle_priority_is_set_and_cleared():
     assert app.vehicles['RTW1']['priority'] == ''
 
 
-def test_vehicle_can_be_alerted_again_after_incident_end():
-    app, client = setup_app()
+def test_vehicle_can_be_alerted_again_after_incident_end(app, client):
     resp = client.post('/api/incidents', json={'keyword': 'A', 'location': 'LocA'})
     inc_a = resp.get_json()['id']
     client.post(f'/api/incidents/{inc_a}/alert', json={'units': ['RTW1']})
@@ -105,8 +89,7 @@ def test_vehicle_can_be_alerted_again_after_incident_end():
     assert app.vehicles['RTW1']['status'] == 1
 
 
-def test_vehicle_can_be_alerted_after_removed_from_incident():
-    app, client = setup_app()
+def test_vehicle_can_be_alerted_after_removed_from_incident(app, client):
     resp = client.post('/api/incidents', json={'keyword': 'A', 'location': 'LocA'})
     inc_a = resp.get_json()['id']
     client.post(f'/api/incidents/{inc_a}/alert', json={'units': ['RTW1']})
@@ -123,8 +106,7 @@ def test_vehicle_can_be_alerted_after_removed_from_incident():
     assert app.vehicles['RTW1']['status'] == 1
 
 
-def test_vehicle_assignment_persists_on_status_change():
-    app, client = setup_app()
+def test_vehicle_assignment_persists_on_status_change(app, client):
     resp = client.post('/api/incidents', json={'keyword': 'Test', 'location': 'Loc', 'vehicles': ['RTW1']})
     inc_id = resp.get_json()['id']
     assert app.vehicles['RTW1']['incident_id'] == inc_id
@@ -137,8 +119,7 @@ def test_vehicle_assignment_persists_on_status_change():
     assert app.vehicles['RTW1']['incident_id'] is None
 
 
-def test_remove_vehicle_requires_free_status():
-    app, client = setup_app()
+def test_remove_vehicle_requires_free_status(app, client):
     resp = client.post('/api/incidents', json={'keyword': 'Test', 'location': 'Loc', 'vehicles': ['RTW1']})
     inc_id = resp.get_json()['id']
     client.post('/api/dispatch', json={'unit': 'RTW1', 'status': 4})
@@ -156,8 +137,7 @@ def test_remove_vehicle_requires_free_status():
     assert app.vehicles['RTW1']['incident_id'] is None
 
 
-def test_create_announcement():
-    app, client = setup_app()
+def test_create_announcement(app, client):
     resp = client.post('/api/announcements', json={'text': 'Test Durchsage'})
     data = resp.get_json()
     assert resp.status_code == 200
@@ -168,8 +148,7 @@ def test_create_announcement():
     assert 'id' in entry
 
 
-def test_legacy_ended_incident_does_not_block_alert():
-    app, client = setup_app()
+def test_legacy_ended_incident_does_not_block_alert(app, client):
     legacy = {
         'id': 1,
         'start': '2024-01-01T10:00:00',
@@ -193,8 +172,7 @@ def test_legacy_ended_incident_does_not_block_alert():
     assert not data['skipped']
 
 
-def test_alert_handles_legacy_string_location():
-    app, client = setup_app()
+def test_alert_handles_legacy_string_location(app, client):
     app.incidents.append({
         'id': 1,
         'start': '2025-01-01T00:00:00',
@@ -216,8 +194,7 @@ def test_alert_handles_legacy_string_location():
     assert app.vehicles['RTW1']['location'] == 'Altstadt'
 
 
-def test_alert_after_save_alarms_preassigned_vehicle_once():
-    app, client = setup_app()
+def test_alert_after_save_alarms_preassigned_vehicle_once(app, client):
     app.vehicles['RTW1']['pager'] = 4
     enqueued = []
     app.pager_service.enqueue = lambda pager, unit=None: enqueued.append((pager, unit)) or True
@@ -251,8 +228,7 @@ def test_monitor_registers_gong_end_before_playing_audio():
     assert 'playFallbackChime().finally(finishGong)' in monitor_template
 
 
-def test_realert_requested_unit_only_when_incident_has_existing_vehicles():
-    app, client = setup_app()
+def test_realert_requested_unit_only_when_incident_has_existing_vehicles(app, client):
     app.vehicles['RTW1']['pager'] = 4
     app.vehicles['KTW1']['pager'] = 5
     enqueued = []
@@ -298,8 +274,7 @@ def test_monitor_alarms_only_with_explicit_alarm_time():
     assert 'info.alarm_time || info.incident_id' not in compute_alarm_id
 
 
-def test_create_incident_with_selected_vehicle_does_not_alert_on_save():
-    app, client = setup_app()
+def test_create_incident_with_selected_vehicle_does_not_alert_on_save(app, client):
     app.vehicles['RTW1']['pager'] = 4
     enqueued = []
     app.pager_service.enqueue = lambda pager, unit=None: enqueued.append((pager, unit)) or True
@@ -317,8 +292,7 @@ def test_create_incident_with_selected_vehicle_does_not_alert_on_save():
     assert enqueued == []
 
 
-def test_update_incident_vehicle_selection_does_not_alert_on_save():
-    app, client = setup_app()
+def test_update_incident_vehicle_selection_does_not_alert_on_save(app, client):
     app.vehicles['KTW1']['pager'] = 5
     enqueued = []
     app.pager_service.enqueue = lambda pager, unit=None: enqueued.append((pager, unit)) or True
@@ -341,8 +315,7 @@ def test_update_incident_vehicle_selection_does_not_alert_on_save():
     assert enqueued == []
 
 
-def test_realert_after_status_clear_uses_incident_log_not_alarm_time():
-    app, client = setup_app()
+def test_realert_after_status_clear_uses_incident_log_not_alarm_time(app, client):
     app.vehicles['RTW1']['pager'] = 4
     enqueued = []
     app.pager_service.enqueue = lambda pager, unit=None: enqueued.append((pager, unit)) or True
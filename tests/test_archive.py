@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from archive import IncidentArchive, archive_candidates
+from factories import incident
+from storage import SqliteStorage
+
+
+def test_archive_candidates_only_include_old_ended_incidents():
+    now = datetime(2025, 3, 10, 12, tzinfo=timezone.utc)
+    incidents = [
+        incident(1, '2025-03-01T10:00:00+00:00', active=False, end='2025-03-01T11:00:00+00:00'),
+        incident(2, '2025-03-10T08:00:00+00:00', active=False, end='2025-03-10T09:00:00+00:00'),
+        incident(3, '2025-01-01T10:00:00+00:00'),
+    ]
+    candidates = archive_candidates(incidents, older_than=timedelta(hours=24), now=now)
+    assert [inc['id'] for inc in candidates] == [1]
+
+
+def test_archive_writes_monthly_partitions_and_loads_lazily(tmp_path):
+    archive = IncidentArchive(tmp_path / 'archive')
+    archive.add([
+        incident(1, '2025-01-05T10:00:00+01:00', active=False, end='2025-01-05T11:00:00+01:00'),
+        incident(2, '2025-02-07T10:00:00+01:00', active=False, end='2025-02-07T11:00:00+01:00', units=['RTW1']),
+    ])
+    assert sorted(p.name for p in (tmp_path / 'archive').glob('incidents-*.json')) == [
+        'incidents-2025-01.json',
+        'incidents-2025-02.json',
+    ]
+
+    fresh = IncidentArchive(tmp_path / 'archive')
+    assert fresh.get(2)['vehicles'] == ['RTW1']
+    assert list(fresh._partitions) == ['2025-02']
+    assert fresh.get(99) is None
+    assert fresh.max_id() == 2
+    assert [inc['id'] for inc in fresh.query(since='2025-02-01')] == [2]
+
+
+def test_archiving_moves_incidents_out_of_the_hot_set(app, tmp_path):
+    storage = app.storage
+    app.settings = app.load_settings()
+    app.incidents = [
+        incident(1, '2025-01-05T10:00:00+01:00', active=False, end='2025-01-05T11:00:00+01:00', units=['RTW1']),
+        incident(2, '2025-01-06T10:00:00+01:00'),
+    ]
+    app.record_incident_change(app.incidents[0])
+    app.record_incident_change(app.incidents[1])
+    app.save_incidents()
+
+    assert app.archive_ended_incidents() == 1
+    assert [inc['id'] for inc in app.incidents] == [2]
+    assert [inc['id'] for inc in storage.load_incidents()] == [2]
+    assert json.loads((tmp_path / 'archive' / 'incidents-2025-01.json').read_text(encoding='utf-8'))[0]['id'] == 1
+
+    client = app.app.test_client()
+    response = client.get('/api/incidents/1')
+    assert response.status_code == 200
+    assert response.get_json()['archived'] is True
+    history = client.get('/api/incidents/archive?unit=RTW1').get_json()
+    assert [inc['id'] for inc in history] == [1]
+
+    # ids of archived incidents are never handed out again
+    assert app.next_incident_id() == 3
+
+
+def test_sqlite_archive_keeps_rows_but_hides_them_from_hot_set(tmp_path):
+    storage = SqliteStorage(tmp_path / 'alarmmonitor.db')
+    ended = incident(1, '2025-01-05T10:00:00+01:00', active=False, end='2025-01-05T11:00:00+01:00')
+    storage.archive_incidents([ended])
+    assert storage.load_incidents() == []
+    assert storage.load_archived_incident(1)['id'] == 1
+    assert storage.archived_max_id() == 1
+    assert [inc['id'] for inc in storage.query_incidents(archived=True)] == [1]
+
+
+def test_archive_settings_endpoint_validates_hours(app):
+    app.settings = app.load_settings()
+    client = app.app.test_client()
+
+    response = client.put('/api/settings/archive', json={'after_hours': 12, 'enabled': False})
+    assert response.status_code == 200
+    assert app.settings['archive'] == {'enabled': False, 'after_hours': 12}
+    assert app.archive_ended_incidents() == 0
+
+    response = client.put('/api/settings/archive', json={'after_hours': 0})
+    assert response.status_code == 400
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import upstream
+from asgi import AlarmmonitorASGI
+from events import format_event
+
+
+def setup_app(app, monkeypatch):
+    monkeypatch.setattr(app.persister, 'mark_dirty', lambda name: None)
+    app.settings['operation_area'] = {'name': 'Lich', 'lat': 50.52, 'lon': 8.82, 'zoom': 13}
+    app.weather_cache.clear()
+    return AlarmmonitorASGI(app.app, app.broadcaster, threads=2)
+
+
+def scope(path, query=b'', headers=()):
+    return {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query, 'headers': list(headers)}
+
+
+async def call(application, request_scope, disconnect=None):
+    sent = []
+    disconnect = disconnect or asyncio.Event()
+
+    async def receive():
+        if sent or request_scope['path'] == '/events':
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        sent.append(message)
+
+    await application(request_scope, receive, send)
+    return sent
+
+
+def body(messages):
+    return b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+
+
+def test_weather_runs_on_the_event_loop_and_shares_the_cache(app, monkeypatch):
+    application = setup_app(app, monkeypatch)
+    requests = []
+
+    async def fake_fetch(request):
+        requests.append(request.url)
+        await asyncio.sleep(0)
+        return {'current': {'time': '2025-01-01T10:00', 'temperature_2m': 3.5}}
+
+    monkeypatch.setattr(upstream, 'fetch_json_async', fake_fetch)
+    messages = asyncio.run(call(application, scope('/api/weather')))
+    assert messages[0]['status'] == 200
+    assert json.loads(body(messages))['current']['temperature'] == 3.5
+    assert requests and 'open-meteo' in requests[0]
+
+    # the threaded endpoint answers from the same cache
+    assert app.app.test_client().get('/api/weather').get_json()['current']['temperature'] == 3.5
+
+    messages = asyncio.run(call(application, scope('/api/geocode/search', b'q=ab')))
+    assert messages[0]['status'] == 400
+
+
+def test_events_stream_without_a_thread_and_other_routes_use_flask(app, monkeypatch):
+    application = setup_app(app, monkeypatch)
+
+    async def scenario():
+        disconnect = asyncio.Event()
+        stream = asyncio.ensure_future(call(application, scope('/events'), disconnect))
+        await asyncio.sleep(0.05)
+        assert app.broadcaster.subscribers == 1
+        # a publish from another thread wakes the stream
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, app.broadcaster.publish, [format_event('vehicle.updated', {'unit': 'RTW1'})])
+        await asyncio.sleep(0.05)
+        disconnect.set()
+        messages = await stream
+        status = await call(application, scope('/api/status'))
+        return messages, status
+
+    messages, status = asyncio.run(scenario())
+    assert messages[0]['status'] == 200
+    frames = body(messages).decode()
+    assert frames.startswith('retry: 3000') and 'event: vehicle.updated' in frames
+    assert app.broadcaster.subscribers == 0
+    assert status[0]['status'] == 200 and 'RTW1' in json.loads(body(status))
+
+
+def test_async_fetch_reads_chunked_json_and_reports_http_errors():
+    async def handle(reader, writer):
+        request_line = (await reader.readline()).decode()
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+        if '/missing' in request_line:
+            writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n')
+        else:
+            writer.write(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\n[{"a"\r\n4\r\n:1}]\r\n0\r\n\r\n')
+        await writer.drain()
+        writer.close()
+
+    async def scenario():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            data = await upstream.fetch_json_async(upstream.UpstreamRequest(f'http://127.0.0.1:{port}/search?q=x'))
+            try:
+                await upstream.fetch_json_async(upstream.UpstreamRequest(f'http://127.0.0.1:{port}/missing'))
+            except upstream.UpstreamError as exc:
+                error = exc
+        return data, error
+
+    data, error = asyncio.run(scenario())
+    assert data == [{'a': 1}]
+    assert '404' in str(error)
+
+
+def test_async_fetch_follows_redirects_and_limits_the_body(monkeypatch):
+    monkeypatch.setattr(upstream, 'MAX_RESPONSE_BYTES', 64)
+
+    async def handle(reader, writer):
+        request_line = (await reader.readline()).decode()
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+        if '/old' in request_line:
+            writer.write(b'HTTP/1.1 301 Moved Permanently\r\nLocation: /search\r\nContent-Length: 0\r\n\r\n')
+        elif '/huge' in request_line:
+            payload = json.dumps(['x' * 100]).encode()
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n' % len(payload) + payload)
+        else:
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 8\r\n\r\n{"a": 1}')
+        await writer.drain()
+        writer.close()
+
+    async def scenario():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            data = await upstream.fetch_json_async(upstream.UpstreamRequest(f'http://127.0.0.1:{port}/old'))
+            try:
+                await upstream.fetch_json_async(upstream.UpstreamRequest(f'http://127.0.0.1:{port}/huge'))
+            except upstream.UpstreamError as exc:
+                error = exc
+        return data, error
+
+    data, error = asyncio.run(scenario())
+    assert data == {'a': 1}
+    assert '64 Bytes' in str(error)
+
+
+def test_lookups_access_the_geocode_store_off_the_event_loop(app, monkeypatch):
+    application = setup_app(app, monkeypatch)
+    store_threads = []
+    for name in ('get', 'set'):
+        original = getattr(app.geocode_store, name)
+
+        def traced(*args, _original=original, **kwargs):
+            store_threads.append(threading.get_ident())
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(app.geocode_store, name, traced)
+
+    async def fake_fetch(request):
+        return [{'display_name': 'Marktplatz, Lich', 'lat': '50.52', 'lon': '8.82'}]
+
+    monkeypatch.setattr(upstream, 'fetch_json_async', fake_fetch)
+    messages = asyncio.run(call(application, scope('/api/geocode/search', b'q=Marktplatz')))
+    assert messages[0]['status'] == 200
+    assert store_threads and threading.get_ident() not in store_threads
@@ -0,0 +1,63 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from test_events import Reader
+
+
+def setup_app(app, monkeypatch):
+    saves = []
+    monkeypatch.setattr(app.persister, 'mark_dirty', saves.append)
+    app.geocode = lambda address: (None, None)
+    app.pager_service.enqueue = lambda pager, unit=None: True
+    client = app.app.test_client()
+    app.save_vehicles()
+    client.get('/api/status')
+    return client, saves
+
+
+def test_batch_applies_all_operations_with_one_save(app, monkeypatch):
+    client, saves = setup_app(app, monkeypatch)
+    inc_id = client.post('/api/incidents', json={'keyword': 'MANV', 'location': 'Marktplatz'}).get_json()['id']
+    reader = Reader(app.broadcaster)
+    del saves[:]
+
+    response = client.post('/api/batch', json={'operations': [
+        {'op': 'alert', 'incident': inc_id, 'units': ['RTW1', 'NEF1']},
+        {'op': 'note', 'incident': inc_id, 'text': 'Weitere Kräfte angefordert'},
+        {'op': 'dispatch', 'unit': 'RTW1', 'status': 3},
+    ]})
+
+    body = response.get_json()
+    assert response.status_code == 200 and body['ok']
+    assert body['results'][0]['alerted'] == ['RTW1', 'NEF1']
+    assert body['results'][1:] == [{'ok': True}, {'ok': True}]
+    assert sorted(set(saves)) == ['incidents', 'vehicles'] and len(saves) == 2
+    assert app.vehicles['RTW1']['status'] == 3
+    inc = app.find_incident(inc_id)
+    assert inc['notes'][-1]['text'] == 'Weitere Kräfte angefordert'
+    # the whole batch goes out in one publish, the alert carries the incident
+    events = reader.drain()
+    assert [e['type'] for e in events].count('incident.alerted') == 1
+    assert 'incident.updated' not in [e['type'] for e in events]
+
+
+def test_batch_with_an_invalid_operation_changes_nothing(app, monkeypatch):
+    client, saves = setup_app(app, monkeypatch)
+    del saves[:]
+
+    response = client.post('/api/batch', json={'operations': [
+        {'op': 'dispatch', 'unit': 'RTW1', 'status': 3},
+        {'op': 'dispatch', 'unit': 'XYZ', 'status': 2},
+        {'op': 'note', 'incident': 999, 'text': 'x'},
+    ]})
+
+    body = response.get_json()
+    assert response.status_code == 400 and not body['ok']
+    assert body['results'][0] == {'ok': False, 'skipped': True}
+    assert 'XYZ' in body['results'][1]['error']
+    assert '#999' in body['results'][2]['error']
+    assert app.vehicles['RTW1']['status'] == app.DEFAULT_VEHICLES['RTW1']['status']
+    assert saves == []
+    assert client.post('/api/batch', json={'operations': []}).status_code == 400
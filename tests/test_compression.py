@@ -0,0 +1,62 @@
+import gzip
+import os
+import sys
+
+from werkzeug.http import parse_accept_header
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import compression
+
+
+def accept(value):
+    return parse_accept_header(value)
+
+
+def test_negotiate_respects_client_quality_and_available_variants(monkeypatch):
+    monkeypatch.setattr(compression, 'supported_encodings', lambda: ('br', 'gzip'))
+
+    assert compression.negotiate(accept('gzip, deflate, br')) == 'br'
+    assert compression.negotiate(accept('br;q=0.5, gzip')) == 'gzip'
+    assert compression.negotiate(accept('gzip, br'), available={'gzip'}) == 'gzip'
+    assert compression.negotiate(accept('identity')) is None
+    assert compression.negotiate(accept('')) is None
+
+
+def test_precompress_static_writes_siblings_only_for_changed_text_assets(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'big.css').write_text('body { color: red; }\n' * 200)
+    (tmp_path / 'small.js').write_text('let a = 1;')
+    (tmp_path / 'alarm.wav').write_bytes(b'\0' * 4096)
+
+    available = compression.precompress_static(tmp_path)
+
+    assert available == {'css/big.css': set(compression.supported_encodings())}
+    target = tmp_path / 'css' / 'big.css.gz'
+    assert gzip.decompress(target.read_bytes()) == (tmp_path / 'css' / 'big.css').read_bytes()
+    mtime = target.stat().st_mtime_ns
+    compression.precompress_static(tmp_path)
+    assert target.stat().st_mtime_ns == mtime
+
+
+def test_html_pages_and_static_files_are_served_compressed(app):
+    client = app.app.test_client()
+
+    page = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert page.headers['Content-Encoding'] == 'gzip'
+    assert b'<html' in gzip.decompress(page.data)
+    assert 'Accept-Encoding' in page.headers['Vary']
+    assert 'Content-Encoding' not in client.get('/').headers
+
+    css = client.get('/static/style.css', headers={'Accept-Encoding': 'gzip'})
+    assert css.headers['Content-Encoding'] == 'gzip'
+    assert css.mimetype == 'text/css'
+    assert gzip.decompress(css.data) == open(os.path.join(app.app.static_folder, 'style.css'), 'rb').read()
+    css.close()
+    plain = client.get('/static/style.css')
+    assert 'Content-Encoding' not in plain.headers
+    plain.close()
+
+    events = client.get('/events', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in events.headers
+    events.close()
@@ -0,0 +1,15 @@
+def test_dispatch_incident_cards_render_like_the_page(app, monkeypatch):
+    monkeypatch.setattr(app.persister, 'mark_dirty', lambda name: None)
+    app.geocode = lambda address: (None, None)
+    client = app.app.test_client()
+    inc_id = client.post('/api/incidents', json={'keyword': 'BMA', 'location': 'Schulstraße 4'}).get_json()['id']
+
+    cards = client.get(f'/dispatch/incidents?ids={inc_id},999').get_json()
+    assert cards['999'] is None
+    card = cards[str(inc_id)]
+    assert f'data-id="{inc_id}"' in card and 'BMA' in card and 'Schulstraße 4' in card
+    assert card.strip() in client.get('/dispatch').get_data(as_text=True)
+
+    client.post(f'/api/incidents/{inc_id}/end')
+    assert 'Beendet' in client.get(f'/dispatch/incidents?ids={inc_id}').get_json()[str(inc_id)]
+    assert client.get('/dispatch/incidents?ids=abc').status_code == 400
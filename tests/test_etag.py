@@ -0,0 +1,88 @@
+import gzip
+
+
+def test_read_apis_answer_304_until_the_collection_changes(app, monkeypatch):
+    monkeypatch.setattr(app.persister, 'mark_dirty', lambda name: None)
+    client = app.app.test_client()
+
+    response = client.get('/api/status')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    cached = client.get('/api/status', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+    # an unrelated collection does not invalidate the vehicle status
+    app.save_incidents()
+    assert client.get('/api/status', headers={'If-None-Match': etag}).status_code == 304
+
+    app.save_vehicles()
+    changed = client.get('/api/status', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_settings_etag_changes_after_save(app):
+    app.settings = app.load_settings()
+    client = app.app.test_client()
+
+    etag = client.get('/api/settings').headers['ETag']
+    response = client.put('/api/settings/archive', json={'after_hours': 12})
+    assert response.status_code == 200
+    assert client.get('/api/settings', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_monitor_snapshot_combines_active_state_and_caches_the_body(app, monkeypatch):
+    monkeypatch.setattr(app.persister, 'mark_dirty', lambda name: None)
+    app.incidents = [
+        {'id': 1, 'start': '2025-01-01T10:00:00', 'active': False, 'vehicles': [], 'log': [], 'notes': []},
+        {'id': 2, 'start': '2025-01-02T10:00:00', 'active': True, 'vehicles': ['RTW1'], 'log': [], 'notes': []},
+    ]
+    app.announcements = [{'id': i, 'time': '', 'text': str(i)} for i in range(30)]
+    app.save_incidents()
+    client = app.app.test_client()
+
+    response = client.get('/api/monitor/snapshot')
+    snapshot = response.get_json()
+    assert set(snapshot['vehicles']) == set(app.DEFAULT_VEHICLES)
+    assert [inc['id'] for inc in snapshot['incidents']] == [2]
+    assert [entry['id'] for entry in snapshot['announcements']] == list(range(30))
+    assert set(snapshot['settings']) == {'operation_area', 'monitor'}
+    etag = response.headers['ETag']
+
+    # the serialised body is reused until a collection changes
+    build = app.build_monitor_snapshot
+    app.build_monitor_snapshot = lambda: 1 / 0
+    assert client.get('/api/monitor/snapshot').get_json() == snapshot
+    assert client.get('/api/monitor/snapshot', headers={'If-None-Match': etag}).status_code == 304
+    app.build_monitor_snapshot = build
+
+    app.vehicles['RTW1']['status'] = 3
+    app.save_vehicles()
+    changed = client.get('/api/monitor/snapshot', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['vehicles']['RTW1']['status'] == 3
+    assert changed.get_json()['revision'] > snapshot['revision']
+
+
+def test_encoded_bodies_are_shared_until_a_save_invalidates_them(app, monkeypatch):
+    monkeypatch.setattr(app.persister, 'mark_dirty', lambda name: None)
+    app.vehicles = {f'RTW{i}': dict(app.DEFAULT_VEHICLES['RTW1'], name=f'Rettungswagen {i}') for i in range(40)}
+    app.save_vehicles()
+    client = app.app.test_client()
+
+    plain = client.get('/api/status')
+    compressed = client.get('/api/status', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+    assert client.get('/api/status', headers={'If-None-Match': compressed.headers['ETag']}).status_code == 304
+    assert app.response_cache.stats()['misses'] == 1
+
+    app.save_incidents()
+    client.get('/api/status')
+    assert app.response_cache.stats()['misses'] == 1
+    app.save_vehicles()
+    client.get('/api/status')
+    assert app.response_cache.stats()['misses'] == 2
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from events import EventBroadcaster, event_collection, format_event
+
+
+class Reader:
+    """Read published frames the way a connection does, without blocking."""
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self.cursor = broadcaster.last_id
+
+    def drain(self):
+        frames, self.cursor, lagged = self.broadcaster.since(self.cursor)
+        assert not lagged
+        events = []
+        for frame in frames:
+            event_line, data_line = frame.strip().split('\n')[-2:]
+            payload = json.loads(data_line[len('data: '):])
+            assert event_line == f"event: {payload['type']}"
+            events.append(payload)
+        return events
+
+
+def setup_app(app, monkeypatch):
+    monkeypatch.setattr(app.persister, 'mark_dirty', lambda name: None)
+    app.geocode = lambda address: (None, None)
+    reader = Reader(app.broadcaster)
+    client = app.app.test_client()
+    # publish the replaced vehicle list once so later events are deltas
+    app.save_vehicles()
+    client.get('/api/status')
+    reader.drain()
+    return client, reader
+
+
+def test_format_event_and_collection_names():
+    frame = format_event('vehicle.updated', {'unit': 'RTW1'}, revision=3, event_id=7)
+    assert frame.startswith('id: 7\nevent: vehicle.updated\ndata: ')
+    assert frame.endswith('\n\n')
+    assert event_collection('vehicle.updated') == 'vehicles'
+    assert event_collection('settings.updated') == 'settings'
+
+
+def test_status_change_sends_only_the_changed_vehicle(app, monkeypatch):
+    client, reader = setup_app(app, monkeypatch)
+
+    client.post('/api/dispatch', json={'unit': 'RTW1', 'status': 3})
+
+    events = reader.drain()
+    assert [(e['type'], e['data']['unit']) for e in events] == [('vehicle.updated', 'RTW1')]
+    assert events[0]['data']['vehicle']['status'] == 3
+    assert events[0]['revision'] == app.revisions['vehicles']
+
+
+def test_alert_sends_one_incident_event_with_the_alerted_units(app, monkeypatch):
+    client, reader = setup_app(app, monkeypatch)
+    app.pager_service.enqueue = lambda pager, unit=None: True
+    inc_id = client.post('/api/incidents', json={'keyword': 'Test', 'location': 'Loc'}).get_json()['id']
+    assert [e['type'] for e in reader.drain()] == ['incident.updated']
+
+    client.post(f'/api/incidents/{inc_id}/notes', json={'text': 'Lage'})
+    client.post(f'/api/incidents/{inc_id}/alert', json={'units': ['RTW1']})
+
+    events = reader.drain()
+    assert [e['type'] for e in events] == ['incident.updated', 'vehicle.updated', 'incident.alerted']
+    alerted = events[-1]['data']
+    assert alerted['units'] == ['RTW1']
+    assert alerted['incident']['notes'][0]['text'] == 'Lage'
+
+    client.delete(f'/api/incidents/{inc_id}')
+    assert [(e['type'], e['data']) for e in reader.drain()] == [('incident.removed', {'id': inc_id})]
+
+
+def test_broadcaster_replays_after_last_event_id_and_resets_lagging_readers():
+    broadcaster = EventBroadcaster('boot', capacity=3, keepalive=0.01)
+    broadcaster.publish([format_event('vehicle.updated', {'unit': str(i)}) for i in range(2)])
+
+    stream = broadcaster.stream('boot-1')
+    assert next(stream) == 'retry: 3000\n\n'
+    replayed = next(stream)
+    assert replayed.startswith('id: boot-2\n') and '"unit":"1"' in replayed
+    assert broadcaster.subscribers == 1
+    assert next(stream) == ': keepalive\n\n'
+    stream.close()
+    assert broadcaster.subscribers == 0
+
+    broadcaster.publish([format_event('vehicle.updated', {'unit': str(i)}) for i in range(2, 6)])
+    assert broadcaster.since(1) == ([], 6, True)
+    stream = broadcaster.stream('boot-1')
+    next(stream)
+    assert next(stream).startswith('id: boot-6\nevent: stream.reset')
+
+    # ids of an earlier process are never replayed
+    stream = broadcaster.stream('other-3')
+    next(stream)
+    assert 'stream.reset' in next(stream)
+    assert broadcaster.resets == 2
@@ -0,0 +1,113 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import upstream
+from gazetteer import Gazetteer, import_file
+
+OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="50.5200" lon="8.8200"/>
+  <node id="2" lat="50.5210" lon="8.8220"/>
+  <node id="3" lat="50.5230" lon="8.8150">
+    <tag k="addr:street" v="Mühlweg"/>
+    <tag k="addr:housenumber" v="12a"/>
+    <tag k="addr:postcode" v="35423"/>
+    <tag k="addr:city" v="Lich"/>
+  </node>
+  <node id="4" lat="50.5190" lon="8.8180">
+    <tag k="amenity" v="pharmacy"/>
+    <tag k="name" v="Stadt-Apotheke"/>
+  </node>
+  <node id="5" lat="50.5240" lon="8.8300"/>
+  <node id="6" lat="50.5250" lon="8.8310"/>
+  <node id="7" lat="50.5244" lon="8.8310"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/>
+    <tag k="highway" v="residential"/>
+    <tag k="name" v="Hauptstraße"/>
+  </way>
+  <way id="11">
+    <nd ref="5"/><nd ref="6"/><nd ref="7"/>
+    <tag k="building" v="yes"/>
+    <tag k="addr:street" v="Hauptstraße"/>
+    <tag k="addr:housenumber" v="5"/>
+  </way>
+</osm>
+"""
+
+
+def build(tmp_path):
+    source = tmp_path / 'lich.osm'
+    source.write_text(OSM, encoding='utf-8')
+    return import_file(source, city='Lich')
+
+
+def test_osm_import_reads_streets_addresses_and_pois(tmp_path):
+    gazetteer = build(tmp_path)
+
+    assert gazetteer.stats()['street'] == 1
+    assert gazetteer.stats()['address'] == 2
+    assert gazetteer.stats()['poi'] == 1
+    assert gazetteer.geocode('Hauptstr. 5, Lich') == pytest.approx((50.524467, 8.830667))
+    assert gazetteer.geocode('Hauptstraße') == (50.5205, 8.821)
+    assert gazetteer.geocode('Muehlweg 12a') is None
+    assert gazetteer.geocode('Mühlweg 12A') == (50.523, 8.815)
+    # the house number must exist and a town alone is not an address
+    assert gazetteer.geocode('Hauptstraße 7') is None
+    assert gazetteer.geocode('Lich') is None
+
+
+def test_search_matches_prefixes_and_ranks_by_distance(tmp_path):
+    gazetteer = build(tmp_path)
+
+    assert [r['display_name'] for r in gazetteer.search('haupt')] == ['Hauptstraße, Lich', 'Hauptstraße 5, Lich']
+    assert gazetteer.search('muhl')[0]['display_name'] == 'Mühlweg 12a, 35423 Lich'
+    pharmacy = gazetteer.search('apoth', 1)
+    assert pharmacy == [{
+        'name': 'Stadt-Apotheke',
+        'display_name': 'Stadt-Apotheke, Lich',
+        'lat': 50.519,
+        'lon': 8.818,
+        'type': 'pharmacy',
+        'category': 'amenity',
+    }]
+    assert gazetteer.reverse(50.5231, 8.8151) == 'Mühlweg 12a, 35423 Lich'
+    assert gazetteer.reverse(50.60, 8.90) is None
+
+
+def test_csv_import_and_saved_index(tmp_path):
+    source = tmp_path / 'adressen.csv'
+    source.write_text(
+        'street;housenumber;postcode;city;lat;lon\n'
+        'Am Wall;3;35423;Lich;50,5201;8,8102\n'
+        'kaputt;;;;x;y\n',
+        encoding='utf-8',
+    )
+    gazetteer = import_file(source)
+    gazetteer.save(tmp_path / 'gazetteer.json')
+
+    loaded = Gazetteer.load(tmp_path / 'gazetteer.json')
+    assert len(loaded) == 1
+    assert loaded.geocode('Am Wall 3, 35423 Lich') == (50.5201, 8.8102)
+    assert len(Gazetteer.load(tmp_path / 'missing.json')) == 0
+
+
+def test_app_answers_from_the_gazetteer_without_nominatim(app, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'gazetteer', build(tmp_path))
+
+    def offline(request):
+        raise AssertionError(f'unexpected request to {request.url}')
+
+    monkeypatch.setattr(upstream, 'fetch_json', offline)
+    client = app.app.test_client()
+
+    assert app.geocode('Mühlweg 12a') == (50.523, 8.815)
+    assert app.cached_coordinates('Hauptstraße 5') == pytest.approx((50.524467, 8.830667))
+    search = client.get('/api/geocode/search?q=Stadt-Apo').get_json()
+    assert search['results'][0]['name'] == 'Stadt-Apotheke'
+    reverse = client.get('/api/geocode/reverse?lat=50.5191&lon=8.8181').get_json()
+    assert reverse['address'] == 'Stadt-Apotheke, Lich'
@@ -0,0 +1,89 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import upstream
+from geocode_store import GeocodeStore, forward_key, reverse_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_survive_reopening_and_expire_after_ttl(tmp_path):
+    clock = Clock()
+    store = GeocodeStore(tmp_path / 'geocode.db', clock=clock)
+    store.set('forward', 'marktplatz 1, lich', (50.52, 8.82), ttl=60)
+    store.close()
+
+    store = GeocodeStore(tmp_path / 'geocode.db', clock=clock)
+    assert store.get('forward', 'marktplatz 1, lich') == ([50.52, 8.82], True)
+    assert store.get('reverse', 'marktplatz 1, lich') == (None, False)
+    clock.now += 61
+    assert store.get('forward', 'marktplatz 1, lich') == (None, False)
+    assert store.get('forward', 'marktplatz 1, lich', stale=True) == ([50.52, 8.82], True)
+    assert store.stats()['kinds'] == {'forward': {'entries': 1, 'expired': 1}}
+
+
+def test_size_limit_evicts_least_recently_used(tmp_path):
+    clock = Clock()
+    store = GeocodeStore(tmp_path / 'geocode.db', max_entries=10, clock=clock)
+    for number in range(10):
+        clock.now += 1
+        store.set('forward', f'addr {number}', number, ttl=3600)
+    clock.now += 7200
+    # a read long after the write marks the entry as recently used
+    assert store.get('forward', 'addr 0', stale=True) == (0, True)
+    store.set('forward', 'addr 10', 10, ttl=3600)
+
+    assert len(store) == 9
+    assert store.get('forward', 'addr 0', stale=True)[1]
+    assert not store.get('forward', 'addr 1', stale=True)[1]
+    assert not store.get('forward', 'addr 2', stale=True)[1]
+    assert store.get('forward', 'addr 10')[1]
+
+
+def test_warm_keeps_existing_answers(tmp_path):
+    store = GeocodeStore(tmp_path / 'geocode.db')
+    store.set('forward', 'wache', (1.0, 2.0), ttl=60)
+
+    added = store.warm([('forward', 'wache', (9.0, 9.0)), ('forward', 'hauptstr 2', (3.0, 4.0)), ('forward', None, (0, 0))], ttl=60)
+
+    assert added == 1
+    assert store.get('forward', 'wache')[0] == [1.0, 2.0]
+    assert store.get('forward', 'hauptstr 2')[0] == [3.0, 4.0]
+
+
+def test_app_warms_from_history_and_answers_offline(app, monkeypatch):
+    app.incidents = [{'id': 1, 'location': {'name': 'Marktplatz  1, Lich', 'lat': 50.52, 'lon': 8.82}}]
+    app.vehicles = {'RTW1': {'base': 'Rettungswache Lich', 'location': 'Rettungswache Lich', 'lat': 50.5, 'lon': 8.8}}
+
+    app.warm_geocode_store()
+
+    def offline(request):
+        raise OSError('network unreachable')
+
+    monkeypatch.setattr(upstream, 'fetch_json', offline)
+    assert app.geocode('marktplatz 1, lich') == (50.52, 8.82)
+    assert app.geocode('Rettungswache Lich') == (50.5, 8.8)
+    assert app.geocode('Unbekannte Straße') == (None, None)
+    assert forward_key(' Marktplatz  1, Lich ') == 'marktplatz 1, lich'
+
+
+def test_reverse_geocode_stores_the_nominatim_answer(app, monkeypatch):
+    fetched = []
+
+    def nominatim(request):
+        fetched.append(request.url)
+        return {'display_name': 'Marktplatz 1, 35423 Lich'}
+
+    monkeypatch.setattr(upstream, 'fetch_json', nominatim)
+    assert app.reverse_geocode(50.1, 8.1) == 'Marktplatz 1, 35423 Lich'
+    assert app.reverse_geocode(50.1, 8.1) == 'Marktplatz 1, 35423 Lich'
+    assert len(fetched) == 1
+    assert app.geocode_store.get('reverse', reverse_key(50.1, 8.1))[0] == 'Marktplatz 1, 35423 Lich'
@@ -0,0 +1,65 @@
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from test_events import Reader
+
+
+def setup_app(app, monkeypatch):
+    monkeypatch.setattr(app.persister, 'mark_dirty', lambda name: None)
+    app.geocode_worker.start()
+    app.pager_service.enqueue = lambda pager, unit=None: True
+    # lookups wait until the test lets them finish
+    release = threading.Event()
+
+    def geocode(address):
+        release.wait(5)
+        return {'Marktplatz 1, Lich': (50.52, 8.82)}.get(address, (None, None))
+
+    app.geocode = geocode
+    reader = Reader(app.broadcaster)
+    client = app.app.test_client()
+    app.save_vehicles()
+    client.get('/api/status')
+    reader.drain()
+    return client, reader, release
+
+
+def finish(app, release):
+    release.set()
+    app.geocode_worker.join()
+    app.geocode_worker.stop()
+
+
+def test_incident_is_created_before_its_coordinates_are_known(app, monkeypatch):
+    client, reader, release = setup_app(app, monkeypatch)
+
+    inc_id = client.post('/api/incidents', json={'keyword': 'Brand', 'location': 'Marktplatz 1, Lich'}).get_json()['id']
+    client.post(f'/api/incidents/{inc_id}/alert', json={'units': ['RTW1']})
+    created = reader.drain()[0]['data']['incident']
+    assert created['location'] == {'name': 'Marktplatz 1, Lich', 'lat': None, 'lon': None, 'pending': True}
+
+    finish(app, release)
+
+    events = {e['type']: e['data'] for e in reader.drain()}
+    assert sorted(events) == ['incident.updated', 'vehicle.updated']
+    assert events['incident.updated']['incident']['location'] == {'name': 'Marktplatz 1, Lich', 'lat': 50.52, 'lon': 8.82}
+    assert (events['vehicle.updated']['vehicle']['lat'], events['vehicle.updated']['vehicle']['lon']) == (50.52, 8.82)
+
+
+def test_coordinates_entered_while_pending_win(app, monkeypatch):
+    client, reader, release = setup_app(app, monkeypatch)
+
+    inc_id = client.post('/api/incidents', json={'location': 'Marktplatz 1, Lich'}).get_json()['id']
+    client.put(f'/api/incidents/{inc_id}', json={'lat': 50.1, 'lon': 8.1})
+    client.post('/api/dispatch', json={'unit': 'RTW2', 'status': 3, 'location': 'Unbekannt 7'})
+    assert app.vehicles['RTW2']['lat'] is None
+    reader.drain()
+
+    finish(app, release)
+
+    assert app.find_incident(inc_id)['location'] == {'name': 'Marktplatz 1, Lich', 'lat': 50.1, 'lon': 8.1}
+    assert app.vehicles['RTW2']['lat'] is None
+    assert reader.drain() == []
@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from factories import incident
+from incident_export import CSV_COLUMNS
+from storage import SqliteStorage
+
+
+def test_sqlite_archive_iterates_in_start_order_across_batches(tmp_path):
+    storage = SqliteStorage(tmp_path / 'alarmmonitor.db')
+    storage.archive_incidents([
+        incident(i, f'2024-0{1 + i % 3}-1{i}T10:00:00', active=False, units=['RTW1'] if i % 2 else ['NEF1'], alerted=True)
+        for i in range(1, 8)
+    ] + [incident(8, None, active=False)])
+
+    ids = [inc['id'] for inc in storage.iter_archived_incidents(batch_size=2)]
+    assert ids == [8, 3, 6, 1, 4, 7, 2, 5]
+    assert [inc['id'] for inc in storage.iter_archived_incidents(since='2024-02-01', unit='RTW1', batch_size=2)] == [1, 7, 5]
+
+
+def test_export_streams_loaded_and_archived_incidents(app):
+    storage = app.storage
+    storage.archive_incidents([
+        incident(1, '2024-01-05T08:00:00', active=False, units=['RTW1'], alerted=True),
+        incident(2, '2024-03-01T08:00:00', active=False, units=['NEF1', 'RTW1'], alerted=True),
+    ])
+    app.incidents = [incident(3, '2024-02-01T08:00:00', active=False, units=['RTW1'], alerted=True), incident(4, '2025-01-01T08:00:00')]
+    client = app.app.test_client()
+
+    response = client.get('/api/incidents/export?since=2024-01-01&unit=RTW1')
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    assert 'attachment' in response.headers['Content-Disposition']
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(inc['id'], inc.get('archived', False)) for inc in lines] == [(1, True), (3, False), (2, True)]
+
+    response = client.get('/api/incidents/export?format=csv&until=2024-12-31', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert tuple(rows[0]) == CSV_COLUMNS
+    assert [(row[0], row[-2]) for row in rows[1:]] == [('1', 'RTW1'), ('3', 'RTW1'), ('2', 'NEF1'), ('2', 'RTW1')]
+
+    assert client.get('/api/incidents/export?format=xml').status_code == 400
+
+
+def test_json_export_puts_undated_archived_incidents_first(app):
+    storage = app.storage
+    storage.archive_incidents([incident(1, '2024-01-05T08:00:00', active=False), incident(2, None, active=False)])
+    app.incidents = [incident(3, '2024-02-01T08:00:00', active=False)]
+    client = app.app.test_client()
+
+    lines = client.get('/api/incidents/export').get_data(as_text=True).splitlines()
+    assert [json.loads(line)['id'] for line in lines] == [2, 1, 3]
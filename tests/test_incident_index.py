@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from factories import incident
+from incident_index import IdSequence, IncidentIndex
+
+
+def test_index_tracks_bindings_incrementally():
+    first = incident(1, units=['RTW1', 'KTW1'])
+    second = incident(2, units=['NEF1'])
+    incidents = [first, second, incident(3, units=['RTW2'], active=False)]
+    index = IncidentIndex().sync(incidents)
+
+    assert index.active_incident_for_unit('RTW1') is first
+    assert not index.unit_is_bound('RTW2')
+    assert not index.unit_is_bound('RTW1', exclude=first)
+
+    first['vehicles'].remove('KTW1')
+    first['active'] = False
+    index.update(first)
+    assert not index.unit_is_bound('KTW1')
+    assert index.active_incidents() == [second]
+
+    index.remove(second)
+    incidents.remove(second)
+    assert index.sync(incidents).active_incidents() == []
+
+
+def test_index_rebuilds_when_the_list_changes_behind_its_back():
+    incidents = [incident(1, units=['RTW1'])]
+    index = IncidentIndex().sync(incidents)
+    incidents.append(incident(2, units=['KTW1']))
+    assert index.sync(incidents).unit_is_bound('KTW1')
+
+    replacement = [incident(5, units=['NEF1'])]
+    assert not index.sync(replacement).unit_is_bound('RTW1')
+    assert index.unit_is_bound('NEF1')
+
+
+def test_ending_and_deleting_incidents_release_their_units(app):
+    client = app.app.test_client()
+
+    inc_a = client.post('/api/incidents', json={'keyword': 'A', 'location': 'Loc', 'lat': 1, 'lon': 2}).get_json()['id']
+    inc_b = client.post('/api/incidents', json={'keyword': 'B', 'location': 'Loc', 'lat': 1, 'lon': 2}).get_json()['id']
+    client.post(f'/api/incidents/{inc_a}/alert', json={'units': ['RTW1']})
+    assert client.post(f'/api/incidents/{inc_b}/alert', json={'units': ['RTW1']}).get_json()['skipped'] == ['RTW1']
+
+    client.post(f'/api/incidents/{inc_a}/end')
+    assert client.post(f'/api/incidents/{inc_b}/alert', json={'units': ['RTW1']}).get_json()['alerted'] == ['RTW1']
+
+    client.delete(f'/api/incidents/{inc_b}')
+    assert not app.indexed_incidents().unit_is_bound('RTW1')
+    assert app.indexed_incidents().active_incidents() == []
+
+
+def test_deleted_ids_are_not_reused_and_the_sequence_is_persisted(app, tmp_path):
+    app.incident_sequence = IdSequence()
+    client = app.app.test_client()
+
+    payload = {'keyword': 'Test', 'location': 'Loc', 'lat': 1, 'lon': 2}
+    first = client.post('/api/incidents', json=payload).get_json()['id']
+    second = client.post('/api/incidents', json=payload).get_json()['id']
+    assert client.delete(f'/api/incidents/{second}').get_json()['ok']
+    third = client.post('/api/incidents', json=payload).get_json()['id']
+    assert (first, second, third) == (1, 2, 3)
+    assert app.find_incident(third)['id'] == 3
+    assert app.find_incident(second) is None
+
+    app.persister.flush()
+    assert json.loads((tmp_path / 'sequences.json').read_text(encoding='utf-8')) == {'incidents': 3}
+    assert app.load_incident_sequence().allocate() == 4
+
+
+def test_unit_log_state_follows_appended_entries():
+    inc = incident(1, units=['RTW1'])
+    inc['log'] = [{'time': '10:00', 'unit': 'RTW1', 'status': 'zugeteilt'}]
+    index = IncidentIndex().sync([inc])
+    assert not index.unit_state(inc, 'RTW1').alerted
+
+    inc['log'].append({'time': '10:01', 'unit': 'RTW1', 'status': 'alarmiert'})
+    inc['log'].append({'time': '10:05', 'unit': 'RTW1', 'status': 3})
+    inc['log'].append({'time': '10:09', 'unit': 'RTW1', 'status': 'alarmiert'})
+    state = index.unit_state(inc, 'RTW1')
+    assert state.alerted
+    assert state.first_alarm == '10:01'
+    assert state.last_status == 'alarmiert'
+    assert state.status_times == {'zugeteilt': '10:00', 'alarmiert': '10:09', '3': '10:05'}
+    assert index.unit_state(inc, 'KTW1') is None
+
+
+def test_incident_list_filters_and_pages_newest_first(app):
+    app.incidents = [
+        incident(i, f'2025-01-0{i}T10:00:00', active=i > 3, units=['RTW1'] if i % 2 else ['KTW1'], priority='R1' if i == 5 else 'R2')
+        for i in range(1, 6)
+    ]
+    client = app.app.test_client()
+
+    assert len(client.get('/api/incidents').get_json()) == 5
+
+    response = client.get('/api/incidents?limit=2')
+    assert [inc['id'] for inc in response.get_json()] == [5, 4]
+    cursor = response.headers['X-Next-Cursor']
+    response = client.get(f'/api/incidents?limit=2&cursor={cursor}')
+    assert [inc['id'] for inc in response.get_json()] == [3, 2]
+    response = client.get(f'/api/incidents?limit=2&cursor={response.headers["X-Next-Cursor"]}')
+    assert [inc['id'] for inc in response.get_json()] == [1]
+    assert 'X-Next-Cursor' not in response.headers
+
+    assert [inc['id'] for inc in client.get('/api/incidents?active=1').get_json()] == [5, 4]
+    assert [inc['id'] for inc in client.get('/api/incidents?active=0&unit=RTW1').get_json()] == [3, 1]
+    assert [inc['id'] for inc in client.get('/api/incidents?since=2025-01-02&until=2025-01-04').get_json()] == [3, 2]
+    assert [inc['id'] for inc in client.get('/api/incidents?priority=R1').get_json()] == [5]
+    assert client.get('/api/incidents?cursor=kaputt').status_code == 400
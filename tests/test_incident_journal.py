@@ -0,0 +1,129 @@
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from factories import incident
+from incident_journal import IncidentJournal
+
+
+def test_journal_replays_puts_and_deletes_on_top_of_snapshot(tmp_path):
+    snapshot = tmp_path / 'incidents.json'
+    snapshot.write_text(json.dumps([incident(1), incident(2)]), encoding='utf-8')
+    journal = IncidentJournal(snapshot)
+
+    journal.append([
+        IncidentJournal.put_record(incident(2, keyword='Geändert')),
+        IncidentJournal.put_record(incident(3)),
+        IncidentJournal.delete_record(1),
+    ])
+
+    loaded = journal.load()
+    assert [inc['id'] for inc in loaded] == [2, 3]
+    assert loaded[0]['keyword'] == 'Geändert'
+    assert journal.pending_records == 3
+    # the snapshot itself is untouched until compaction
+    assert len(json.loads(snapshot.read_text(encoding='utf-8'))) == 2
+
+
+def test_journal_writes_one_compact_line_per_record(tmp_path):
+    journal = IncidentJournal(tmp_path / 'incidents.json')
+    journal.append([IncidentJournal.put_record(incident(1))])
+    journal.append([IncidentJournal.put_record(incident(1, active=False))])
+
+    lines = journal.journal_path.read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 2
+    assert ': ' not in lines[0]
+    assert journal.load()[0]['active'] is False
+
+
+def test_journal_ignores_torn_last_line(tmp_path):
+    journal = IncidentJournal(tmp_path / 'incidents.json')
+    journal.append([IncidentJournal.put_record(incident(1))])
+    with open(journal.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"op":"put","incident":{"id":2')
+
+    assert [inc['id'] for inc in journal.load()] == [1]
+
+
+def test_append_after_restart_cuts_off_torn_last_line(tmp_path):
+    journal = IncidentJournal(tmp_path / 'incidents.json')
+    journal.append([IncidentJournal.put_record(incident(1))])
+    with open(journal.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"op":"put","incident":{"id":2')
+
+    restarted = IncidentJournal(tmp_path / 'incidents.json')
+    restarted.append([IncidentJournal.put_record(incident(3))])
+
+    assert [inc['id'] for inc in IncidentJournal(tmp_path / 'incidents.json').load()] == [1, 3]
+    assert restarted.pending_records == 2
+
+
+def test_compactor_waits_for_the_shared_snapshot_lock(tmp_path):
+    journal = IncidentJournal(tmp_path / 'incidents.json', compact_interval=0.01, compact_threshold=1)
+    lock = threading.Lock()
+    with lock:
+        journal.start(lambda: [], lock)
+        journal.append([IncidentJournal.put_record(incident(1))])
+        time.sleep(0.1)
+        assert journal.pending_records == 1
+    deadline = time.monotonic() + 5
+    while journal.pending_records and time.monotonic() < deadline:
+        time.sleep(0.01)
+    journal.stop()
+    assert journal.pending_records == 0
+
+
+def test_duplicate_snapshot_ids_are_renumbered_before_replay(tmp_path):
+    snapshot = tmp_path / 'incidents.json'
+    snapshot.write_text(json.dumps([incident(1), incident(1, keyword='Zweiter')]), encoding='utf-8')
+    journal = IncidentJournal(snapshot)
+    journal.append([IncidentJournal.put_record(incident(4))])
+
+    loaded = journal.load()
+    assert [(inc['id'], inc['keyword']) for inc in loaded] == [(1, 'Einsatz 1'), (5, 'Zweiter'), (4, 'Einsatz 4')]
+
+    journal.append([
+        IncidentJournal.put_record(dict(loaded[1], active=False)),
+        IncidentJournal.delete_record(1),
+    ])
+    replayed = IncidentJournal(snapshot).load()
+    assert [(inc['id'], inc['active']) for inc in replayed] == [(5, False), (4, True)]
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path):
+    snapshot = tmp_path / 'incidents.json'
+    journal = IncidentJournal(snapshot)
+    journal.append([IncidentJournal.put_record(incident(1))])
+
+    journal.compact(journal.load())
+
+    assert not journal.journal_path.exists()
+    assert journal.pending_records == 0
+    assert [inc['id'] for inc in json.loads(snapshot.read_text(encoding='utf-8'))] == [1]
+    assert [inc['id'] for inc in IncidentJournal(snapshot).load()] == [1]
+
+
+def test_incident_mutations_append_journal_records(app):
+    journal = app.storage.journal
+    client = app.app.test_client()
+
+    inc_id = client.post('/api/incidents', json={'keyword': 'Test', 'location': 'Loc', 'lat': 1, 'lon': 2}).get_json()['id']
+    app.persister.flush()
+    client.post(f'/api/incidents/{inc_id}/notes', json={'text': 'Lagemeldung'})
+    app.persister.flush()
+    client.post(f'/api/incidents/{inc_id}/alert', json={'units': ['RTW1']})
+    app.persister.flush()
+
+    lines = journal.journal_path.read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 3
+    replayed = journal.load()
+    assert replayed[0]['notes'][0]['text'] == 'Lagemeldung'
+    assert replayed[0]['vehicles'] == ['RTW1']
+
+    client.delete(f'/api/incidents/{inc_id}')
+    app.persister.flush()
+    assert journal.load() == []
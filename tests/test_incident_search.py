@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from factories import incident
+from incident_search import IncidentSearchIndex
+
+
+def test_prefix_search_ranks_keyword_matches_first():
+    index = IncidentSearchIndex()
+    index.add(incident(1, active=False, keyword='Verkehrsunfall', location='Hauptstraße 1', notes=['BMA ausgelöst']))
+    index.add(incident(2, '2024-06-01T10:00:00', active=False, keyword='BMA', location='Schulstraße 4'))
+    index.add(incident(3, '2024-09-01T10:00:00', active=False, keyword='BMA', location='Schulstraße 9'))
+
+    assert [inc_id for inc_id, _, _ in index.search('bma')] == [3, 2, 1]
+    assert [inc_id for inc_id, _, _ in index.search('BMA schulstr')] == [3, 2]
+    assert [inc_id for inc_id, _, _ in index.search('bma schulstrasse', since='2024-08-01')] == [3]
+    assert index.search('') == []
+
+    index.add(incident(3, active=False, keyword='Brand', location='Schulstraße 9'))
+    assert [inc_id for inc_id, _, _ in index.search('bma schul')] == [2]
+    index.discard(2)
+    assert index.search('schul bma') == []
+
+
+def test_search_endpoint_covers_loaded_and_archived_incidents(app):
+    app.storage.archive_incidents([incident(1, '2024-06-01T10:00:00', active=False, keyword='BMA', location='Schulstraße 4')])
+    app.incident_sequence = app.load_incident_sequence()
+    client = app.app.test_client()
+
+    inc_id = client.post('/api/incidents', json={'keyword': 'BMA', 'location': 'Schulstraße 7', 'lat': 1, 'lon': 2}).get_json()['id']
+    client.post(f'/api/incidents/{inc_id}/notes', json={'text': 'Rauchmelder im Keller'})
+
+    results = client.get('/api/incidents/search?q=bma schul').get_json()
+    assert [(inc['id'], inc.get('archived', False)) for inc in results] == [(inc_id, False), (1, True)]
+    assert [inc['id'] for inc in client.get('/api/incidents/search?q=rauch').get_json()] == [inc_id]
+
+    client.delete(f'/api/incidents/{inc_id}')
+    assert [inc['id'] for inc in client.get('/api/incidents/search?q=bma').get_json()] == [1]
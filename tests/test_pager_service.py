@@ -2,11 +2,11 @@ import os
 import sys
 import time
 from pathlib import Path
-from importlib import reload
+
+import pytest
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-import app as app_module
 from pager_service import PagerConfig, PagerService, pager_bcd, pager_payload
 
 
@@ -21,15 +21,10 @@ class ListLogger:
         self.messages.append(("error", args))
 
 
-def setup_app():
-    app = reload(app_module)
-    app.save_vehicles = lambda: None
-    app.save_incidents = lambda: None
-    app.save_announcements = lambda: None
-    app.vehicles = {k: v.copy() for k, v in app.DEFAULT_VEHICLES.items()}
-    app.incidents = []
+@pytest.fixture
+def client(app):
     app.announcements = []
-    return app, app.app.test_client()
+    return app.app.test_client()
 
 
 def test_pager_bcd_valid_numbers():
@@ -55,8 +50,7 @@ def test_pager_payload_bytes():
     assert pager_payload(30) == bytes([0x30, 0x00, 0x92, 0x02])
 
 
-def test_alert_vehicle_without_pager_does_not_enqueue():
-    app, client = setup_app()
+def test_alert_vehicle_without_pager_does_not_enqueue(app, client):
     enqueued = []
     app.pager_service.enqueue = lambda pager, unit=None: enqueued.append((pager, unit))
     inc_id = client.post('/api/incidents', json={'keyword': 'Test', 'location': 'Loc'}).get_json()['id']
@@ -65,8 +59,7 @@ def test_alert_vehicle_without_pager_does_not_enqueue():
     assert enqueued == [(None, 'RTW1')]
 
 
-def test_alert_vehicle_with_pager_enqueues_background_job():
-    app, client = setup_app()
+def test_alert_vehicle_with_pager_enqueues_background_job(app, client):
     app.vehicles['RTW1']['pager'] = 4
     enqueued = []
     app.pager_service.enqueue = lambda pager, unit=None: enqueued.append((pager, unit))
@@ -76,8 +69,7 @@ def test_alert_vehicle_with_pager_enqueues_background_job():
     assert enqueued == [(4, 'RTW1')]
 
 
-def test_alert_does_not_wait_for_radio_transmission():
-    app, client = setup_app()
+def test_alert_does_not_wait_for_radio_transmission(app, client):
     app.vehicles['RTW1']['pager'] = 4
 
     def slow_enqueue(pager, unit=None):
@@ -132,8 +124,7 @@ def test_pager_error_does_not_break_worker():
     assert any(level == 'error' for level, _ in logger.messages)
 
 
-def test_manual_pager_test_does_not_change_vehicle_status():
-    app, client = setup_app()
+def test_manual_pager_test_does_not_change_vehicle_status(app, client):
     app.vehicles['RTW1']['pager'] = 1
     app.vehicles['RTW1']['status'] = 2
     enqueued = []
@@ -194,8 +185,7 @@ def test_pager_special_power_off_command_is_valid():
     assert pager_payload(999) == bytes([0x99, 0x09, 0x92, 0x02])
 
 
-def test_power_off_endpoint_enqueues_special_pager():
-    app, client = setup_app()
+def test_power_off_endpoint_enqueues_special_pager(app, client):
     enqueued = []
     app.pager_service.enqueue = lambda pager, unit=None: enqueued.append((pager, unit)) or True
 
@@ -208,8 +198,7 @@ def test_power_off_endpoint_enqueues_special_pager():
     assert enqueued == [(999, 'Pager ausschalten')]
 
 
-def test_pager_settings_endpoint_updates_power_and_runtime_config():
-    app, client = setup_app()
+def test_pager_settings_endpoint_updates_power_and_runtime_config(app, client):
     app.settings = app.load_settings()
     stopped = []
 
@@ -238,8 +227,7 @@ def test_pager_settings_endpoint_updates_power_and_runtime_config():
     assert stopped == [True]
 
 
-def test_pager_settings_endpoint_rejects_invalid_power():
-    app, client = setup_app()
+def test_pager_settings_endpoint_rejects_invalid_power(app, client):
     app.settings = app.load_settings()
     app.save_settings = lambda: None
 
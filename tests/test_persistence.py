@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from persistence import WriteBehindPersister
+
+
+def test_burst_of_changes_costs_one_write_per_collection():
+    writes = []
+    flushes = []
+    persister = WriteBehindPersister(delay=0.05, on_flush=flushes.append)
+    persister.register('vehicles', lambda fsync=False: writes.append(('vehicles', fsync)))
+    persister.register('incidents', lambda fsync=False: writes.append(('incidents', fsync)))
+    persister.start()
+    try:
+        for _ in range(10):
+            persister.mark_dirty('vehicles')
+            persister.mark_dirty('incidents')
+        deadline = time.monotonic() + 2
+        while len(writes) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+    finally:
+        persister.stop()
+    assert sorted(writes) == [('incidents', False), ('vehicles', False)]
+    assert flushes == [{'incidents', 'vehicles'}]
+
+
+def test_stop_flushes_pending_changes_with_fsync():
+    writes = []
+    persister = WriteBehindPersister(delay=60)
+    persister.register('vehicles', lambda fsync=False: writes.append(fsync))
+    persister.mark_dirty('vehicles')
+    persister.stop()
+    assert writes == [True]
+    assert persister.dirty == set()
+
+
+def test_failed_write_stays_dirty():
+    attempts = []
+
+    def failing_writer(fsync=False):
+        attempts.append(fsync)
+        if len(attempts) == 1:
+            raise OSError('SD-Karte voll')
+
+    persister = WriteBehindPersister(delay=60)
+    persister.register('vehicles', failing_writer)
+    persister.mark_dirty('vehicles')
+    assert persister.flush() == set()
+    assert persister.dirty == {'vehicles'}
+    assert persister.flush() == {'vehicles'}
+
+
+def test_dispatch_writes_vehicles_behind_the_request(app, tmp_path):
+    client = app.app.test_client()
+
+    response = client.post('/api/dispatch', json={'unit': 'RTW1', 'status': 6})
+    assert response.status_code == 200
+    assert not (tmp_path / 'vehicles.json').exists()
+    assert app.persister.dirty == {'vehicles', 'incidents'}
+
+    app.persister.flush()
+    saved = json.loads((tmp_path / 'vehicles.json').read_text(encoding='utf-8'))
+    assert saved['RTW1']['status'] == 6
+    assert not list(tmp_path.glob('.*.tmp'))
@@ -0,0 +1,105 @@
+import http.client
+import os
+import sys
+import threading
+
+import pytest
+from flask import Flask, Response
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from server import ConcurrencyLimiter, ServerConfig, create_server
+
+
+def test_config_from_environment_reserves_connections_for_all_slots():
+    config = ServerConfig.from_env({'ALARMMONITOR_THREADS': '4', 'ALARMMONITOR_STREAM_THREADS': '80', 'ALARMMONITOR_KEEPALIVE': '2.5'})
+    assert (config.threads, config.stream_threads, config.keepalive) == (4, 80, 2.5)
+    assert config.connections == 84
+    with pytest.raises(ValueError):
+        ServerConfig.from_env({'ALARMMONITOR_THREADS': 'viele'})
+    with pytest.raises(ValueError):
+        ServerConfig.from_env({'ALARMMONITOR_STREAM_THREADS': '0'})
+
+
+def test_full_stream_budget_asks_clients_to_reconnect_and_keeps_api_slots():
+    app = Flask(__name__)
+    release = threading.Event()
+
+    @app.route('/events')
+    def events():
+        def stream():
+            yield 'retry: 3000\n\n'
+            release.wait(5)
+        return Response(stream(), mimetype='text/event-stream')
+
+    @app.route('/api/status')
+    def status():
+        return {'ok': True}
+
+    server = create_server(app, ServerConfig(host='127.0.0.1', port=0, threads=1, stream_threads=1, keepalive=2))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        kiosk = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+        kiosk.request('GET', '/events')
+        assert kiosk.getresponse().readline() == b'retry: 3000\n'
+
+        second = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+        second.request('GET', '/events')
+        rejected = second.getresponse()
+        assert rejected.status == 200 and rejected.read().startswith(b'retry: 10000')
+
+        # one keep-alive connection serves several API requests while the stream is open
+        api = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+        for _ in range(2):
+            api.request('GET', '/api/status')
+            response = api.getresponse()
+            assert response.status == 200 and response.read() == b'{"ok":true}\n'
+        limiter = app.extensions['concurrency_limiter']
+        assert limiter.stats()['streams'] == {'active': 1, 'limit': 1, 'rejected': 1}
+    finally:
+        release.set()
+        server.shutdown()
+        server.server_close()
+
+
+def test_limiter_answers_503_when_no_request_slot_frees_up():
+    limiter = ConcurrencyLimiter(lambda environ, start_response: [], threads=1, stream_threads=1, queue_timeout=0.01)
+    limiter._slots['requests'].acquire()
+    statuses = []
+    body = limiter({'PATH_INFO': '/api/status'}, lambda status, headers: statuses.append(status))
+    assert statuses == ['503 Service Unavailable'] and b'ausgelastet' in b''.join(body)
+
+
+def test_connection_limit_answers_503_and_keeps_shutdown_responsive():
+    app = Flask(__name__)
+    release = threading.Event()
+
+    @app.route('/events')
+    def events():
+        def stream():
+            yield 'retry: 3000\n\n'
+            release.wait(5)
+        return Response(stream(), mimetype='text/event-stream')
+
+    config = ServerConfig(host='127.0.0.1', port=0, threads=1, stream_threads=1, connections=1, accept_timeout=0.1)
+    server = create_server(app, config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        kiosk = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+        kiosk.request('GET', '/events')
+        assert kiosk.getresponse().readline() == b'retry: 3000\n'
+
+        second = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+        second.request('GET', '/api/status')
+        response = second.getresponse()
+        assert response.status == 503 and b'Verbindungen' in response.read()
+        assert server.rejected_connections == 1
+
+        server.shutdown()
+        thread.join(2)
+        assert not thread.is_alive()
+    finally:
+        release.set()
+        server.server_close()
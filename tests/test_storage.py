@@ -0,0 +1,133 @@
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from factories import incident
+from incident_journal import IncidentJournal
+from storage import JsonStorage, SqliteStorage, main, migrate_json_to_sqlite
+
+
+def test_sqlite_uses_wal_and_indexes(tmp_path):
+    storage = SqliteStorage(tmp_path / 'alarmmonitor.db')
+    storage.close()
+    conn = sqlite3.connect(tmp_path / 'alarmmonitor.db')
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    indexes = {row[1] for row in conn.execute("SELECT type, name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_incidents_active', 'idx_incidents_start', 'idx_incident_units_unit'} <= indexes
+
+
+def test_sqlite_collections_roundtrip_and_write_only_changed_rows(tmp_path):
+    storage = SqliteStorage(tmp_path / 'alarmmonitor.db')
+    assert storage.load_collection('vehicles') is None
+
+    vehicles = {'RTW1': {'status': 2}, 'KTW1': {'status': 1}}
+    storage.save_collection('vehicles', vehicles)
+    storage.save_collection('priorities', ['R1', 'R2'])
+    changes_before = storage._conn.total_changes
+    vehicles['KTW1']['status'] = 3
+    storage.save_collection('vehicles', vehicles)
+    # one row upsert plus the collection kind bookkeeping
+    assert storage._conn.total_changes - changes_before == 2
+
+    storage.save_collection('priorities', ['R1'])
+    reopened = SqliteStorage(tmp_path / 'alarmmonitor.db')
+    assert reopened.load_collection('vehicles') == {'RTW1': {'status': 2}, 'KTW1': {'status': 3}}
+    assert reopened.load_collection('priorities') == ['R1']
+
+
+def test_sqlite_incident_changes_and_history_query(tmp_path):
+    storage = SqliteStorage(tmp_path / 'alarmmonitor.db')
+    storage.save_incident_changes([
+        IncidentJournal.put_record(incident(1, '2025-01-01T10:00:00+01:00', active=False, units=['RTW1'])),
+        IncidentJournal.put_record(incident(2, '2025-02-01T10:00:00+01:00', log=[{'unit': 'KTW1', 'status': 'entfernt'}])),
+        IncidentJournal.put_record(incident(3, '2025-03-01T10:00:00+01:00', units=['RTW1'])),
+    ])
+    storage.save_incident_changes([IncidentJournal.delete_record(3)])
+
+    assert [inc['id'] for inc in storage.load_incidents()] == [1, 2]
+    assert [inc['id'] for inc in storage.query_incidents(active=True)] == [2]
+    assert [inc['id'] for inc in storage.query_incidents(unit='RTW1')] == [1]
+    assert [inc['id'] for inc in storage.query_incidents(unit='KTW1')] == [2]
+    assert [inc['id'] for inc in storage.query_incidents(since='2025-01-15')] == [2]
+    assert [inc['id'] for inc in storage.query_incidents(limit=1)] == [2]
+
+
+def test_migrate_json_files_into_sqlite(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'vehicles.json').write_text(json.dumps({'RTW1': {'status': 2}}), encoding='utf-8')
+    (data_dir / 'priorities.json').write_text(json.dumps(['R1']), encoding='utf-8')
+    (data_dir / 'incidents.json').write_text(
+        json.dumps([incident(1, '2025-01-01T10:00:00'), incident(1, '2025-01-02T10:00:00')]),
+        encoding='utf-8',
+    )
+    source = JsonStorage(lambda name: data_dir / f'{name}.json')
+    source.journal.append([IncidentJournal.put_record(incident(2, '2025-01-03T10:00:00'))])
+
+    target = SqliteStorage(data_dir / 'alarmmonitor.db')
+    counts = migrate_json_to_sqlite(source, target)
+
+    assert counts == {'vehicles': 1, 'priorities': 1, 'incidents': 3, 'archived': 0}
+    assert target.load_collection('vehicles') == {'RTW1': {'status': 2}}
+    assert target.load_collection('templates') is None
+    # the duplicated legacy id is renumbered instead of overwriting history
+    assert sorted(inc['id'] for inc in target.load_incidents()) == [1, 2, 3]
+    target.close()
+
+    assert main(['migrate', '--data-dir', str(data_dir), '--force']) == 0
+
+
+def test_migrate_copies_archive_partitions(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    source = JsonStorage(lambda name: data_dir / f'{name}.json')
+    old = [incident(1, '2024-11-05T10:00:00', active=False), incident(2, '2024-12-24T10:00:00', active=False)]
+    source.journal.append([IncidentJournal.put_record(inc) for inc in old])
+    source.journal.append([IncidentJournal.put_record(incident(3, '2025-01-03T10:00:00'))])
+    source.archive_incidents(old)
+    # archiving interrupted after the partition was written
+    source.archive.add([incident(3, '2025-01-03T10:00:00')])
+
+    target = SqliteStorage(data_dir / 'alarmmonitor.db')
+    counts = migrate_json_to_sqlite(source, target)
+
+    assert counts == {'incidents': 1, 'archived': 2}
+    assert [inc['id'] for inc in target.load_incidents()] == [3]
+    assert target.load_archived_incident(1)['start'] == '2024-11-05T10:00:00'
+    assert target.archived_max_id() == 2
+    assert [inc['id'] for inc in target.iter_archived_incidents()] == [1, 2]
+    target.close()
+
+
+def test_json_storage_renumbers_duplicate_ids_once_and_archives_them_apart(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'incidents.json').write_text(
+        json.dumps([
+            incident(1, '2025-01-01T10:00:00', active=False),
+            incident(1, '2025-01-02T10:00:00', active=False),
+            incident(2, '2025-01-03T10:00:00'),
+        ]),
+        encoding='utf-8',
+    )
+    (data_dir / 'sequences.json').write_text(json.dumps({'incidents': 5}), encoding='utf-8')
+    storage = JsonStorage(lambda name: data_dir / f'{name}.json')
+
+    loaded = storage.load_incidents()
+
+    assert [(inc['id'], inc['start']) for inc in loaded] == [
+        (1, '2025-01-01T10:00:00'),
+        (6, '2025-01-02T10:00:00'),
+        (2, '2025-01-03T10:00:00'),
+    ]
+    # the renumbering is written back instead of repeated on every start
+    assert [inc['id'] for inc in json.loads((data_dir / 'incidents.json').read_text(encoding='utf-8'))] == [1, 6, 2]
+
+    storage.archive_incidents(loaded[:2])
+    reloaded = JsonStorage(lambda name: data_dir / f'{name}.json')
+    assert [inc['id'] for inc in reloaded.load_incidents()] == [2]
+    assert reloaded.load_archived_incident(1)['start'] == '2025-01-01T10:00:00'
+    assert reloaded.load_archived_incident(6)['start'] == '2025-01-02T10:00:00'
@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import ttl_cache
+from ttl_cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_and_least_recently_used_are_evicted():
+    clock = Clock()
+    cache = TTLCache(2, ttl=10, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == (1, True)
+    cache.set('c', 3)
+
+    assert cache.get('b') == (None, False)
+    assert cache.get('a') == (1, True)
+    clock.now = 10
+    assert cache.get('a') == (None, False)
+    assert len(cache) == 1
+    assert cache.stats() == {'entries': 1, 'max_entries': 2, 'hits': 2, 'misses': 2, 'stale': 0, 'evictions': 1}
+
+
+def test_stale_entry_is_refreshed_by_one_caller():
+    clock = Clock()
+    cache = TTLCache(4, ttl=10, stale_ttl=60, clock=clock)
+    assert cache.get_stale('weather') == (None, False, True)
+    cache.set('weather', 'sunny')
+    assert cache.get_stale('weather') == ('sunny', True, False)
+
+    clock.now = 15
+    assert cache.get_stale('weather') == ('sunny', True, True)
+    assert cache.get_stale('weather') == ('sunny', True, False)
+    assert cache.get('weather') == (None, False)
+    clock.now += ttl_cache.REFRESH_TIMEOUT
+    # the refreshing caller never stored a result; the next one tries again
+    assert cache.get_stale('weather') == ('sunny', True, True)
+
+    cache.set('weather', 'rain')
+    assert cache.get_stale('weather') == ('rain', True, False)
+    clock.now = 200
+    assert cache.get_stale('weather') == (None, False, True)
+    assert cache.stats()['stale'] == 3
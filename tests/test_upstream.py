@@ -0,0 +1,108 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import upstream
+from upstream import TokenBucket, UpstreamClient, UpstreamError, UpstreamRequest
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_queues_requests_one_second_apart():
+    clock = Clock()
+    bucket = TokenBucket(1.0, clock=clock)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(2.0)
+    assert bucket.reserve(max_wait=2.5) is None
+    clock.now += 3
+    assert bucket.reserve() == pytest.approx(0.0)
+
+
+def test_concurrent_identical_requests_share_one_fetch(monkeypatch):
+    client = UpstreamClient('Test', rate=1000.0)
+    started = threading.Event()
+    release = threading.Event()
+    fetched = []
+
+    def fetch_json(request):
+        fetched.append(request.url)
+        started.set()
+        release.wait(5)
+        return [{'lat': '50.5'}]
+
+    monkeypatch.setattr(upstream, 'fetch_json', fetch_json)
+    results = []
+    leader = threading.Thread(target=lambda: results.append(client.fetch(UpstreamRequest('https://x/search?q=a'))))
+    leader.start()
+    started.wait(5)
+    followers = [
+        threading.Thread(target=lambda: results.append(client.fetch(UpstreamRequest('https://x/search?q=a'))))
+        for _ in range(3)
+    ]
+    for thread in followers:
+        thread.start()
+    for _ in range(500):
+        if client.stats()['coalesced'] == 3:
+            break
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert fetched == ['https://x/search?q=a']
+    assert results == [[{'lat': '50.5'}]] * 4
+    stats = client.stats()
+    assert (stats['requests'], stats['coalesced'], stats['in_flight']) == (1, 3, 0)
+
+    # finished requests are not cached here
+    fetched.clear()
+    monkeypatch.setattr(upstream, 'fetch_json', lambda request: fetched.append(request.url) or {})
+    client.fetch(UpstreamRequest('https://x/search?q=a'))
+    assert fetched == ['https://x/search?q=a']
+
+
+def test_async_callers_are_coalesced_and_rate_limited(monkeypatch):
+    client = UpstreamClient('Test', rate=20.0, max_wait=0.12)
+    calls = []
+
+    async def fetch_json_async(request):
+        calls.append(request.url)
+        await asyncio.sleep(0.01)
+        return {'url': request.url}
+
+    monkeypatch.setattr(upstream, 'fetch_json_async', fetch_json_async)
+
+    async def scenario():
+        same = [client.fetch_async(UpstreamRequest('https://x/reverse?lat=1')) for _ in range(3)]
+        other = [client.fetch_async(UpstreamRequest(f'https://x/search?q={n}')) for n in range(3)]
+        return await asyncio.gather(*same, *other, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert results[:3] == [{'url': 'https://x/reverse?lat=1'}] * 3
+    assert results[3:5] == [{'url': 'https://x/search?q=0'}, {'url': 'https://x/search?q=1'}]
+    # the fourth distinct request would have to wait 0.15 s for its slot
+    assert isinstance(results[5], UpstreamError)
+    stats = client.stats()
+    assert (stats['requests'], stats['coalesced'], stats['rejected'], stats['queued']) == (3, 2, 1, 2)
+    assert stats['wait_max'] == pytest.approx(0.1, abs=0.01)
+    assert len(calls) == 3
+
+
+def test_only_nominatim_requests_are_rate_limited():
+    assert upstream.client_for(UpstreamRequest('https://nominatim.openstreetmap.org/search?q=x')).name == 'Nominatim'
+    assert upstream.client_for(UpstreamRequest('https://api.open-meteo.com/v1/forecast')) is None
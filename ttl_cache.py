@@ -0,0 +1,116 @@
+"""In-memory LRU cache with per-entry expiry and hit/miss statistics."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+# A caller that claimed the refresh of a stale entry gets this long before
+# the next caller is asked to try again.
+REFRESH_TIMEOUT = 30.0
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire ``ttl`` seconds after ``set``.
+
+    Reads, writes and evictions are O(1): entries live in an ``OrderedDict``
+    in least-recently-used order. Expiry uses a monotonic clock, so it is not
+    affected by changes of the system time.
+
+    With ``stale_ttl`` an expired entry is kept that much longer for
+    :meth:`get_stale`: the first caller after expiry refreshes the value, all
+    others get the stale one meanwhile instead of waiting on the upstream.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 300.0, *, stale_ttl: float = 0.0, clock=time.monotonic) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        # key -> [value, expires, refresh claimed until]
+        self._entries: OrderedDict[Hashable, list] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _entry(self, key: Hashable, now: float) -> list | None:
+        # Called with the lock held; drops entries past their stale window.
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] + self.stale_ttl <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: Hashable, default=None):
+        """Return ``(value, found)`` for an entry that has not expired."""
+
+        with self._lock:
+            now = self.clock()
+            entry = self._entry(key, now)
+            if entry is None or entry[1] <= now:
+                self.misses += 1
+                return default, False
+            self.hits += 1
+            return entry[0], True
+
+    def get_stale(self, key: Hashable, default=None):
+        """Return ``(value, found, refresh)``.
+
+        ``refresh`` tells the caller to fetch a new value and :meth:`set` it.
+        It is true on a miss and for the first caller that sees an expired
+        entry; later callers get the stale value with ``refresh`` false until
+        the entry is replaced or the claim times out.
+        """
+
+        with self._lock:
+            now = self.clock()
+            entry = self._entry(key, now)
+            if entry is None:
+                self.misses += 1
+                return default, False, True
+            if entry[1] > now:
+                self.hits += 1
+                return entry[0], True, False
+            self.stale += 1
+            if entry[2] is not None and entry[2] > now:
+                return entry[0], True, False
+            entry[2] = now + REFRESH_TIMEOUT
+            return entry[0], True, True
+
+    def set(self, key: Hashable, value, ttl: float | None = None) -> None:
+        with self._lock:
+            expires = self.clock() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = [value, expires, None]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+            }
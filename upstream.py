@@ -0,0 +1,279 @@
+"""Upstream JSON lookups (Nominatim, Open-Meteo) for threaded and asyncio callers.
+
+A lookup is written once as a generator: it yields an :class:`UpstreamRequest`
+and receives the decoded JSON (or gets the fetch error thrown in), then
+returns its result. :func:`run_lookup` drives it with ``urllib`` on the
+calling thread, :func:`run_lookup_async` from the event loop, with the
+request and the lookup's own blocking work (cache and gazetteer access) in
+the loop's executor, so the WSGI and the ASGI entry points share the caching
+and parsing logic.
+
+Requests to hosts with a usage policy (Nominatim allows one request per
+second) go through an :class:`UpstreamClient`, which coalesces identical
+requests in flight and queues the rest behind a token bucket.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Generator
+from urllib import parse, request as urlrequest
+from urllib.error import HTTPError
+
+USER_AGENT = 'Alarmmonitor/1.0'
+DEFAULT_TIMEOUT = 5.0
+# A request that would wait longer than this for its slot fails instead;
+# the lookups fall back to cached answers.
+MAX_QUEUE_WAIT = 10.0
+# Nominatim and Open-Meteo answers are a few kilobytes.
+MAX_RESPONSE_BYTES = 2 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class UpstreamRequest:
+    url: str
+    headers: dict = field(default_factory=dict)
+    timeout: float = DEFAULT_TIMEOUT
+
+    def all_headers(self) -> dict:
+        return {'User-Agent': USER_AGENT, **self.headers}
+
+
+Lookup = Generator[UpstreamRequest, object, object]
+
+
+def fetch_json(upstream: UpstreamRequest):
+    req = urlrequest.Request(upstream.url, headers=upstream.all_headers())
+    host = parse.urlsplit(upstream.url).hostname
+    try:
+        resp = urlrequest.urlopen(req, timeout=upstream.timeout)
+    except HTTPError as exc:
+        raise UpstreamError(f'{host} antwortete mit {exc.code}') from exc
+    with resp:
+        body = resp.read(MAX_RESPONSE_BYTES + 1)
+    if len(body) > MAX_RESPONSE_BYTES:
+        raise UpstreamError(f'Antwort von {host} ist größer als {MAX_RESPONSE_BYTES} Bytes')
+    return json.loads(body.decode('utf-8'))
+
+
+async def fetch_json_async(upstream: UpstreamRequest):
+    """Like :func:`fetch_json` but awaitable; the request runs in the loop's executor."""
+
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(None, fetch_json, upstream), upstream.timeout)
+
+
+class TokenBucket:
+    """Allow ``rate`` requests per second with bursts of up to ``burst``.
+
+    :meth:`reserve` hands out tokens in order and returns how long the caller
+    has to wait for its token, so threads and coroutines share one queue.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, *, clock=time.monotonic) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float | None = None) -> float | None:
+        """Take a token; returns the wait in seconds or ``None`` if it exceeds ``max_wait``."""
+
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class UpstreamClient:
+    """Rate-limited, coalescing access to one upstream host.
+
+    Concurrent requests for the same URL share one fetch: the first caller
+    queues for a token and fetches, the others wait for its result. Threads
+    and coroutines are coalesced separately but share the rate limit.
+    """
+
+    def __init__(self, name: str, rate: float = 1.0, *, burst: int = 1, max_wait: float = MAX_QUEUE_WAIT, clock=time.monotonic) -> None:
+        self.name = name
+        self.bucket = TokenBucket(rate, burst, clock=clock)
+        self.max_wait = max_wait
+        self._calls: dict[tuple, _Call] = {}
+        self._tasks: dict[tuple, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'coalesced': 0, 'rejected': 0, 'queued': 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @staticmethod
+    def _key(upstream: UpstreamRequest) -> tuple:
+        return upstream.url, tuple(sorted(upstream.headers.items()))
+
+    def _reserve(self) -> float:
+        wait = self.bucket.reserve(self.max_wait)
+        with self._lock:
+            if wait is None:
+                self._stats['rejected'] += 1
+                raise UpstreamError(f'Zu viele Anfragen an {self.name}, bitte später erneut versuchen.')
+            self._stats['requests'] += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            if wait:
+                self._stats['queued'] += 1
+        if wait >= 1:
+            logger.info('Anfrage an %s wartete %.1f s auf einen freien Platz', self.name, wait)
+        return wait
+
+    def fetch(self, upstream: UpstreamRequest):
+        """Like :func:`fetch_json`, waiting for a slot on the calling thread."""
+
+        key = self._key(upstream)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._stats['coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            time.sleep(self._reserve())
+            call.result = fetch_json(upstream)
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def fetch_async(self, upstream: UpstreamRequest):
+        """Like :func:`fetch_json_async`, waiting for a slot without blocking the loop."""
+
+        key = self._key(upstream)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None and task.get_loop() is loop:
+                self._stats['coalesced'] += 1
+            else:
+                task = self._tasks[key] = loop.create_task(self._fetch_async(upstream))
+                task.add_done_callback(lambda done: self._forget(key, done))
+        # a cancelled caller must not cancel the fetch the others wait for
+        return await asyncio.shield(task)
+
+    async def _fetch_async(self, upstream: UpstreamRequest):
+        await asyncio.sleep(self._reserve())
+        return await fetch_json_async(upstream)
+
+    def _forget(self, key: tuple, task: asyncio.Task) -> None:
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an unawaited failure is not logged
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self._stats['requests']
+            return {
+                **self._stats,
+                'in_flight': len(self._calls) + len(self._tasks),
+                'wait_avg': round(self._wait_total / requests, 3) if requests else 0.0,
+                'wait_max': round(self._wait_max, 3),
+            }
+
+
+# Nominatim usage policy: at most one request per second.
+CLIENTS = {
+    'nominatim.openstreetmap.org': UpstreamClient('Nominatim', rate=1.0),
+}
+
+
+def client_for(upstream: UpstreamRequest) -> UpstreamClient | None:
+    return CLIENTS.get(parse.urlsplit(upstream.url).hostname)
+
+
+def fetch(upstream: UpstreamRequest):
+    client = client_for(upstream)
+    return client.fetch(upstream) if client else fetch_json(upstream)
+
+
+async def fetch_async(upstream: UpstreamRequest):
+    client = client_for(upstream)
+    return await (client.fetch_async(upstream) if client else fetch_json_async(upstream))
+
+
+def run_lookup(lookup: Lookup):
+    """Drive a lookup generator with blocking requests on the calling thread."""
+
+    try:
+        upstream = next(lookup)
+        while True:
+            try:
+                data = fetch(upstream)
+            except Exception as exc:
+                upstream = lookup.throw(exc)
+            else:
+                upstream = lookup.send(data)
+    except StopIteration as done:
+        return done.value
+
+
+def _resume(resume, value) -> tuple[bool, object]:
+    # StopIteration cannot travel through a future, so it is unpacked here.
+    try:
+        return False, resume(value)
+    except StopIteration as done:
+        return True, done.value
+
+
+async def run_lookup_async(lookup: Lookup):
+    """Drive a lookup generator from the running event loop.
+
+    Each step of the generator runs in the loop's executor: between two
+    requests the lookups read and write the SQLite geocode store and the
+    gazetteer, which must not stall the other streams on the loop.
+    """
+
+    loop = asyncio.get_running_loop()
+    finished, result = await loop.run_in_executor(None, _resume, lookup.send, None)
+    while not finished:
+        try:
+            data = await fetch_async(result)
+        except Exception as exc:
+            finished, result = await loop.run_in_executor(None, _resume, lookup.throw, exc)
+        else:
+            finished, result = await loop.run_in_executor(None, _resume, lookup.send, data)
+    return result